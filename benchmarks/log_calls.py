@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measure the cost of N log calls with the file and syslog handlers enabled.
+
+The "cached" mode uses the logger as it is built by the Log object. The
+"rebuild" mode resets the logger before every message, the same way the
+logger used to be rebuilt by every log call. The number of file opens,
+socket creations and connections is counted with the Python audit hooks.
+Run it under "strace -f -c" to get the full system call numbers.
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ocf_agent import constants  # noqa: E402
+from ocf_agent.agent import Agent  # noqa: E402
+
+COUNTERS = {}
+EVENTS = ['open', 'socket.__new__', 'socket.connect']
+
+
+def audit(event, arguments):
+    if event in COUNTERS:
+        COUNTERS[event] += 1
+
+
+class BenchmarkAgent(Agent):
+    NAME = 'benchmark'
+    LOG_HANDLERS = ['file']
+
+
+def open_descriptors():
+    try:
+        return len(os.listdir('/proc/self/fd'))
+    except OSError:
+        return None
+
+
+def run(mode, count):
+    agent = BenchmarkAgent()
+    log = agent.log
+    for event in EVENTS:
+        COUNTERS[event] = 0
+    descriptors = open_descriptors()
+    started = time.time()
+    for number in range(count):
+        if mode == 'rebuild':
+            log.reset()
+        log.info('benchmark message %d', number)
+        log.debug('skipped debug message %d', number)
+    elapsed = time.time() - started
+    leaked = open_descriptors()
+    log.reset()
+    if descriptors is not None and leaked is not None:
+        leaked -= descriptors
+    result = ['%-8s' % mode, 'calls=%d' % count,
+              'time=%.2fms' % (elapsed * 1000)]
+    for event in EVENTS:
+        result.append('%s=%d' % (event, COUNTERS[event]))
+    result.append('fds=%s' % leaked)
+    return ' '.join(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('-n', '--count', type=int, default=1000)
+    parser.add_argument(
+        '-s', '--syslog', action='store_true',
+        help='also enable the syslog handler',
+    )
+    arguments = parser.parse_args()
+    if arguments.syslog:
+        BenchmarkAgent.LOG_HANDLERS = ['file', 'syslog']
+    directory = tempfile.mkdtemp()
+    constants.LOG_FILE_DIRECTORY = directory
+    if hasattr(sys, 'addaudithook'):
+        sys.addaudithook(audit)
+    try:
+        for mode in ['rebuild', 'cached']:
+            print(run(mode, arguments.count))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compare the proc and psutil process backends.
+
+Every backend is measured by the import time of its module, the time of
+N "is_running" checks of the own process, N "find" calls and the stop of
+N child processes by "ensure_terminate". The import is measured in a new
+interpreter so the modules are not cached.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ocf_agent.agent import Agent  # noqa: E402
+
+IMPORTS = {
+    'proc': 'import ocf_agent.process_backends',
+    'psutil': 'import ocf_agent.process_backends, psutil',
+}
+
+
+class BenchmarkAgent(Agent):
+    NAME = 'benchmark'
+    LOG_HANDLERS = []
+
+
+def import_time(backend):
+    code = (
+        'import time; started = time.time(); %s; '
+        'print(time.time() - started)' % IMPORTS[backend]
+    )
+    output = subprocess.check_output(
+        [sys.executable, '-c', code],
+        cwd=os.path.join(os.path.dirname(__file__), '..'),
+    )
+    return float(output)
+
+
+def measure(function, count):
+    started = time.time()
+    for _ in range(count):
+        function()
+    return (time.time() - started) * 1000 / count
+
+
+def run(backend, count):
+    agent = BenchmarkAgent()
+    agent.PROCESS_BACKEND = backend
+    process = agent.process
+    pid = os.getpid()
+    result = ['%-7s' % backend]
+    result.append('import=%.2fms' % (import_time(backend) * 1000))
+    result.append(
+        'is_running=%.3fms' % measure(lambda: process.is_running(pid), count)
+    )
+    result.append(
+        'find=%.2fms' % measure(lambda: process.find('benchmark'), count)
+    )
+    children = [subprocess.Popen(['sleep', '60']) for _ in range(count)]
+    started = time.time()
+    for child in children:
+        process.ensure_terminate(child.pid)
+    result.append(
+        'ensure_terminate=%.2fms' % (
+            (time.time() - started) * 1000 / count
+        )
+    )
+    for child in children:
+        child.wait()
+    return ' '.join(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('-n', '--count', type=int, default=20)
+    arguments = parser.parse_args()
+    for backend in ['proc', 'psutil']:
+        print(run(backend, arguments.count))
+
+
+if __name__ == '__main__':
+    main()
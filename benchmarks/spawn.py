@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measure the command spawn latency at various parent RSS sizes.
+
+The parent grows its resident memory by the given number of megabytes and
+then starts N short commands by every method: Popen with a preexec function
+which forces fork, Popen without it which can use vfork, Popen without
+closing the descriptors which can use posix_spawn and the agent's 'run'
+method. The fork time grows with the parent's page tables, vfork and
+posix_spawn should not depend on the RSS.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ocf_agent.agent import Agent  # noqa: E402
+
+COMMAND = ['/bin/true']
+
+
+class BenchmarkAgent(Agent):
+    NAME = 'benchmark'
+    LOG_HANDLERS = []
+
+
+def rss():
+    with open('/proc/self/status', 'r') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) // 1024
+    return 0
+
+
+def popen(**kwargs):
+    def spawn():
+        with open(os.devnull, 'wb') as devnull:
+            subprocess.Popen(
+                COMMAND, stdin=devnull, stdout=devnull, stderr=devnull,
+                **kwargs
+            ).wait()
+    return spawn
+
+
+def measure(function, count):
+    started = time.time()
+    for _ in range(count):
+        function()
+    return (time.time() - started) * 1000 / count
+
+
+def run(size, count):
+    ballast = b'\x01' * (size * 1024 * 1024)
+    process = BenchmarkAgent().process
+    methods = [
+        ('fork', popen(preexec_fn=lambda: None)),
+        ('vfork', popen()),
+        ('posix_spawn', popen(close_fds=False)),
+        ('agent', lambda: process.run(*COMMAND)),
+    ]
+    result = ['rss=%dMiB' % rss()]
+    for name, function in methods:
+        result.append('%s=%.3fms' % (name, measure(function, count)))
+    del ballast
+    return ' '.join(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('-n', '--count', type=int, default=50)
+    parser.add_argument(
+        '-s', '--sizes', default='0,256,1024',
+        help='Comma separated ballast sizes in megabytes',
+    )
+    arguments = parser.parse_args()
+    for size in arguments.sizes.split(','):
+        print(run(int(size), arguments.count))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+import time
 from ocf_agent.agent import Agent
 from ocf_agent.parameter import StringParameter
 from ocf_agent.handler import Handler
@@ -62,44 +63,43 @@ class DummyOCF(Agent):
     ###########################################################################
 
     def handler_promote(self):
-        self.lock.create_file('master')
-        self.lock.create()
+        self.state.update({'role': 'master', 'promoted': int(time.time())})
         self.exit.success('The agent was promoted')
 
     def handler_demote(self):
-        self.lock.remove_file('master')
-        self.lock.create()
+        self.state.set('role', 'slave')
         self.exit.success('The agent was demoted')
 
     def handler_start(self):
-        self.lock.create()
+        self.state.update({'role': 'slave', 'started': int(time.time())})
         self.exit.success('The agent was started')
 
     def handler_stop(self):
-        self.lock.remove()
+        self.state.clear()
         self.exit.success('The agent was stopped')
 
     def handler_monitor(self):
-        if self.lock.file_is_present('master'):
+        role = self.state.get('role')
+        if role == 'master':
             self.exit.running_master('The agent is running in the master mode')
-        if self.lock.is_present:
+        if role is not None:
             self.exit.success('The agent is running')
         self.exit.not_running('The agent is not running')
 
     def handler_reload(self):
-        self.lock.create()
+        self.state.compare_and_set('role', None, 'slave')
         self.exit.success('The agent was reloaded')
 
     def handler_notify(self):
-        self.lock.create()
+        self.state.compare_and_set('role', None, 'slave')
         self.exit.success('The agent was notified')
 
     def handler_migrate_to(self):
-        self.lock.remove()
+        self.state.clear()
         self.exit.success('The agent will migrate to')
 
     def handler_migrate_from(self):
-        self.lock.create()
+        self.state.compare_and_set('role', None, 'slave')
         self.exit.success('The agent will migrate from')
 
 
@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 from ocf_agent.agent import Agent
+from ocf_agent.parameter import BooleanParameter
 from ocf_agent.parameter import StringParameter
 from ocf_agent.handler import Handler
 from ocf_agent.handler import MonitorHandler
@@ -21,6 +22,12 @@ class SleepOCF(Agent):
         LONGDESC = "How long the sleep process should work"
         SHORTDESC = "Sleep time"
 
+    class OCFParameter_metrics(BooleanParameter):
+        DEFAULT = 'false'
+        LONGDESC = "Collect the resource usage of the sleep process " \
+                   "on every monitor"
+        SHORTDESC = "Collect metrics"
+
     # HANDLERS #
 
     class OCFHandler_start(Handler):
@@ -42,10 +49,11 @@ class SleepOCF(Agent):
     ###########################################################################
 
     COMMAND = 'sleep'
+    REQUIRES_BINARIES = [COMMAND]
 
     @property
     def is_running(self):
-        return self.process.is_running(self.pid.number)
+        return self.pid.is_running
 
     def handler_start(self):
         if self.is_running:
@@ -57,10 +65,10 @@ class SleepOCF(Agent):
 
         process = self.process.daemonize(
             self.COMMAND,
-            self.param('time')
+            self.param('time'),
+            pid_file=True,
         )
-        pid = process.pid
-        self.pid.create(pid)
+        pid = process.main_pid
         self.exit.success(
             'Process started with pid: "%s" pid_file "%s"!' % (
                 pid,
@@ -106,6 +114,8 @@ class SleepOCF(Agent):
                 )
             )
 
+        if self.param('metrics'):
+            self.metrics.collect(self.pid.number)
         self.exit.success(
             'Process is running with pid: "%s"' % self.pid.number
         )
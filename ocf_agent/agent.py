@@ -1,14 +1,25 @@
 # -*- coding: utf-8 -*-
 
 import sys
+import time
 from ocf_agent import constants
 from ocf_agent.helpers import docstring_format
 from ocf_agent.helpers import memoization
+from ocf_agent.modules.binaries import Binaries
+from ocf_agent.modules.budget import Budget
+from ocf_agent.modules.cache import Cache
+from ocf_agent.modules.cgroup import Cgroup
 from ocf_agent.modules.environment import Environment
 from ocf_agent.modules.exit import Exit
 from ocf_agent.modules.handlers import Handlers
 from ocf_agent.modules.lock import Lock
+from ocf_agent.modules.metrics import Metrics
 from ocf_agent.modules.pid import Pid
+from ocf_agent.modules.pressure import Pressure
+from ocf_agent.modules.profile import Profile
+from ocf_agent.modules.recorder import Recorder
+from ocf_agent.modules.semaphore import Semaphore
+from ocf_agent.modules.state import State
 from ocf_agent.modules.process import Process
 from ocf_agent.modules.log import Log
 from ocf_agent.modules.metadata import MetaData
@@ -157,18 +168,27 @@ class Agent(object):
         :param action: Run with this action
         :type action: str
         """
+        self.recorder.start()
         if action:
             self.action = action
-        self.validate()
-        if self.action == 'validate-all':
-            self.exit.success('Validation successful')
-        if self.action == "meta-data":
-            self.metadata.show()
-            self.exit.success('Metadata output')
-        if self.action == 'usage':
-            self.usage()
-            self.exit.success('Usage output')
-        self.handlers.current()
+        try:
+            self.validate()
+            if self.action == 'validate-all':
+                self.exit.success('Validation successful')
+            if self.action == "meta-data":
+                self.metadata.show()
+                self.exit.success('Metadata output')
+            if self.action == 'usage':
+                self.usage()
+                self.exit.success('Usage output')
+            self.handlers.current()
+        except SystemExit as exception:
+            self.recorder.record(exception.code)
+            raise
+        except Exception:
+            self.recorder.record(constants.OCF_ERR_GENERIC)
+            raise
+        self.recorder.record(constants.OCF_SUCCESS)
 
     __call__ = call
 
@@ -190,6 +210,64 @@ class Agent(object):
 
         self.parameters.validate()
         self.handlers.validate()
+        self.binaries.validate()
+        self.profile.validate()
+
+    @property
+    @memoization
+    def started(self):
+        """
+        The time this agent invocation has started. It's the time of the
+        first access unless the agent is called.
+
+        :return: Unix time
+        :rtype: float
+        """
+        return time.time()
+
+    @property
+    @docstring_format(constants.DEFAULT_TIMEOUT)
+    def timeout(self):
+        """
+        The timeout of the current operation in seconds. It's the timeout
+        set by the cluster, the timeout of the current handler or the default
+        value **{0}**.
+
+        :return: Operation timeout
+        :rtype: float
+        """
+        if self.environment.meta_timeout:
+            return self.environment.meta_timeout
+        handler = self.handlers.get(
+            action=self.action,
+            check_level=self.environment.check_level,
+        )
+        if handler is not None and handler.timeout:
+            return float(handler.timeout)
+        return float(constants.DEFAULT_TIMEOUT)
+
+    @property
+    @docstring_format(constants.DEADLINE_MARGIN)
+    def deadline(self):
+        """
+        The time this operation should be finished by. It's **{0}** seconds
+        before the operation timeout expires so the agent has some time to
+        report the failure before it's killed by the cluster.
+
+        :return: Unix time
+        :rtype: float
+        """
+        return self.started + self.timeout - constants.DEADLINE_MARGIN
+
+    @property
+    def remaining(self):
+        """
+        The number of seconds left until the operation deadline.
+
+        :return: Remaining seconds
+        :rtype: float
+        """
+        return max(0.0, self.deadline - time.time())
 
     def usage(self):
         """
@@ -306,6 +384,90 @@ class Agent(object):
         """
         return Lock(self)
 
+    @property
+    @memoization
+    def budget(self):
+        """
+        The Budget object is a node-wide token bucket which spreads the deep
+        monitor checks of all resources over time.
+
+        :return: The budget object
+        :rtype: Budget
+        """
+        return Budget(self)
+
+    @property
+    @memoization
+    def pressure(self):
+        """
+        The Pressure object reads the node load. The readings are shared by
+        all agents on the node for a short time.
+
+        :return: The pressure object
+        :rtype: Pressure
+        """
+        return Pressure(self)
+
+    @property
+    @memoization
+    def metrics(self):
+        """
+        The Metrics object samples the resource usage of the managed
+        service and compares it with the configured limits.
+
+        :return: The metrics object
+        :rtype: Metrics
+        """
+        return Metrics(self)
+
+    @property
+    @memoization
+    def semaphore(self):
+        """
+        The Semaphore object limits the number of handlers of the same
+        concurrency class running on the node at the same time.
+
+        :return: The semaphore object
+        :rtype: Semaphore
+        """
+        return Semaphore(self)
+
+    @property
+    @memoization
+    def state(self):
+        """
+        The State object is a key/value store of this resource instance.
+        It's read once per invocation and updated atomically.
+
+        :return: The state object
+        :rtype: State
+        """
+        return State(self)
+
+    @property
+    @memoization
+    def cache(self):
+        """
+        The Cache object keeps values between the agent invocations.
+        Entries can expire by time or when their source file changes.
+
+        :return: The cache object
+        :rtype: Cache
+        """
+        return Cache(self)
+
+    @property
+    @memoization
+    def cgroup(self):
+        """
+        The Cgroup object manages the cgroup of this resource instance
+        the daemons can be started into.
+
+        :return: The cgroup object
+        :rtype: Cgroup
+        """
+        return Cgroup(self)
+
     @property
     @memoization
     def pid(self):
@@ -331,3 +493,39 @@ class Agent(object):
         :rtype: Process
         """
         return Process(self)
+
+    @property
+    @memoization
+    def profile(self):
+        """
+        The Profile object sets the CPU affinity, priorities and resource
+        limits of the started processes.
+
+        :return: The profile object
+        :rtype: Profile
+        """
+        return Profile(self)
+
+    @property
+    @memoization
+    def binaries(self):
+        """
+        The Binaries object resolves the executables required by this agent,
+        caches their paths and checks that they are installed.
+
+        :return: The binaries object
+        :rtype: Binaries
+        """
+        return Binaries(self)
+
+    @property
+    @memoization
+    def recorder(self):
+        """
+        The Recorder object can save this invocation's action, environment,
+        exit code and duration to be replayed later.
+
+        :return: The recorder object
+        :rtype: Recorder
+        """
+        return Recorder(self)
@@ -0,0 +1,613 @@
+# -*- coding: utf-8 -*-
+
+import os
+import select
+import signal
+import subprocess
+import sys
+import time
+from ocf_agent import constants
+
+# Popen can set the process group without the preexec function and so can
+# start the child by vfork instead of copying the parent's page tables
+PROCESS_GROUP_ARGUMENT = sys.version_info >= (3, 11)
+# Popen can start the new session without the preexec function
+NEW_SESSION_ARGUMENT = sys.version_info >= (3, 2)
+# Popen can keep the listed descriptors open in the child with close_fds
+PASS_FDS_ARGUMENT = sys.version_info >= (3, 2)
+# Popen raises these if the child cannot be started or its preexec
+# function has failed
+SPAWN_ERRORS = (
+    IOError, OSError, getattr(subprocess, 'SubprocessError', OSError),
+)
+
+
+class OutputBuffer(object):
+    """
+    The Output buffer keeps the beginning and the end of a command's output
+    in memory. The data between them is dropped and only counted so a
+    chatty command cannot use an unlimited amount of memory.
+    """
+
+    def __init__(self, head=constants.COMMAND_HEAD_SIZE,
+                 tail=constants.COMMAND_TAIL_SIZE):
+        """
+        :param head: Number of the first bytes to keep
+        :type head: int
+        :param tail: Number of the last bytes to keep
+        :type tail: int
+        """
+        self.head_size = head
+        self.tail_size = tail
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.size = 0
+
+    def append(self, data):
+        """
+        Add the data read from the command.
+
+        :param data: Output chunk
+        :type data: bytes
+        """
+        self.size += len(data)
+        room = self.head_size - len(self.head)
+        if room > 0:
+            self.head.extend(data[:room])
+            data = data[room:]
+        if data and self.tail_size > 0:
+            self.tail.extend(data)
+            if len(self.tail) > self.tail_size:
+                del self.tail[:len(self.tail) - self.tail_size]
+
+    @property
+    def dropped(self):
+        """
+        The number of bytes dropped between the head and the tail.
+
+        :rtype: int
+        """
+        return self.size - len(self.head) - len(self.tail)
+
+    @property
+    def value(self):
+        """
+        The kept output. The dropped part is replaced by a marker
+        with the number of dropped bytes.
+
+        :rtype: bytes
+        """
+        if not self.dropped:
+            return bytes(self.head + self.tail)
+        marker = constants.COMMAND_DROPPED_MARKER % self.dropped
+        return bytes(self.head) + marker.encode('utf-8') + bytes(self.tail)
+
+
+class Command(object):
+    """
+    The Command object runs an external command in its own process group
+    and reads its output as it arrives. The output is split to lines for
+    the callers and is kept in the bounded head and tail buffers. If the
+    command does not finish before its deadline its whole process group
+    is killed.
+    """
+    streams = ('stdout', 'stderr')
+
+    def __init__(self, args, shell=False, timeout=None,
+                 head=constants.COMMAND_HEAD_SIZE,
+                 tail=constants.COMMAND_TAIL_SIZE, **kwargs):
+        """
+        :param args: Command arguments or the shell command
+        :type args: list or str
+        :param shell: Run the command by the shell
+        :type shell: bool
+        :param timeout: Maximum run time in seconds
+        :type timeout: int or float or None
+        :param head: Number of the first output bytes to keep
+        :type head: int
+        :param tail: Number of the last output bytes to keep
+        :type tail: int
+        :param kwargs: Other Popen arguments. The *preexec_fn* function is
+        called after the process group is created.
+        """
+        self.args = args
+        self.shell = shell
+        self.timeout = timeout
+        self.kwargs = kwargs
+        self.process = None
+        self.started = None
+        self.finished = None
+        self.exited = False
+        self.timed_out = False
+        self.terminated = False
+        self.cancelled = False
+        self.error = None
+        self.watched = None
+        self.descriptors = {}
+        self.output = dict(
+            (stream, OutputBuffer(head, tail)) for stream in self.streams
+        )
+        self.partial = dict((stream, b'') for stream in self.streams)
+
+    @property
+    def name(self):
+        """
+        The command name used in the messages.
+
+        :rtype: str
+        """
+        if isinstance(self.args, (list, tuple)):
+            return ' '.join(str(arg) for arg in self.args)
+        return str(self.args)
+
+    @property
+    def deadline(self):
+        """
+        The time this command should be finished by.
+
+        :return: Unix time or None if there is no timeout
+        :rtype: float or None
+        """
+        if self.started is None or self.timeout is None:
+            return None
+        return self.started + self.timeout
+
+    @property
+    def failed(self):
+        """
+        Check if the finished command has failed. It has failed if it could
+        not be started, was killed by its deadline or has exited with
+        a non-zero code.
+
+        :rtype: bool
+        """
+        if self.error is not None or self.timed_out:
+            return True
+        return self.process is not None and self.process.returncode != 0
+
+    @property
+    def running(self):
+        """
+        Check if the command has been started and is not finished yet.
+
+        :rtype: bool
+        """
+        return self.process is not None and self.finished is None
+
+    def start(self):
+        """
+        Start the command in a new process group with the output pipes.
+        The standard input is /dev/null unless the *stdin* argument
+        is given. The *stdout* and *stderr* arguments replace the pipes,
+        for example with a file or *subprocess.STDOUT*, and only the
+        streams which are pipes are read. Unless the *preexec_fn* argument
+        is given the process group is set by Popen itself so the child is
+        started by vfork.
+
+        :return: This command
+        :rtype: Command
+        """
+        kwargs = dict(self.kwargs)
+        devnull = None
+        if 'stdin' not in kwargs:
+            devnull = open(os.devnull, 'rb')
+            kwargs['stdin'] = devnull
+        for stream in self.streams:
+            kwargs.setdefault(stream, subprocess.PIPE)
+        preexec = kwargs.get('preexec_fn')
+        if PROCESS_GROUP_ARGUMENT:
+            kwargs['process_group'] = 0
+        else:
+            def prepare():
+                os.setpgrp()
+                if preexec is not None:
+                    preexec()
+
+            kwargs['preexec_fn'] = prepare
+        self.started = time.time()
+        try:
+            self.process = subprocess.Popen(
+                self.args, shell=self.shell, **kwargs
+            )
+        finally:
+            if devnull is not None:
+                devnull.close()
+        for stream in self.streams:
+            pipe = getattr(self.process, stream)
+            if pipe is not None:
+                self.descriptors[pipe.fileno()] = stream
+        if hasattr(os, 'pidfd_open'):
+            try:
+                self.watched = os.pidfd_open(self.process.pid)
+            except OSError:
+                self.watched = None
+        return self
+
+    def read(self, descriptor):
+        """
+        Read the available output chunk from the descriptor and split it
+        to lines. The incomplete last line is kept until the rest of it
+        is read unless it's too long. The descriptor is closed when the
+        command closes it.
+
+        :param descriptor: Output pipe descriptor
+        :type descriptor: int
+        :return: List of the complete stream names and lines
+        :rtype: list
+        """
+        stream = self.descriptors[descriptor]
+        data = os.read(descriptor, constants.COMMAND_CHUNK_SIZE)
+        if not data:
+            del self.descriptors[descriptor]
+            getattr(self.process, stream).close()
+            lines = [self.partial[stream]] if self.partial[stream] else []
+            self.partial[stream] = b''
+        else:
+            self.output[stream].append(data)
+            lines = (self.partial[stream] + data).split(b'\n')
+            self.partial[stream] = lines.pop()
+            if len(self.partial[stream]) >= constants.COMMAND_LINE_SIZE:
+                lines.append(self.partial[stream])
+                self.partial[stream] = b''
+        return [
+            (stream, line.decode('utf-8', 'replace')) for line in lines
+        ]
+
+    def drain(self):
+        """
+        Read all output which is already available without waiting.
+        It's used after the command has exited because its children
+        can still keep the pipes open.
+
+        :return: List of the stream names and lines
+        :rtype: list
+        """
+        events = []
+        poller = select.poll()
+        for descriptor in self.descriptors:
+            poller.register(descriptor, select.POLLIN)
+        for _ in range(constants.COMMAND_DRAIN_CHUNKS):
+            ready = poller.poll(0)
+            if not ready:
+                break
+            for descriptor, event in ready:
+                if descriptor not in self.descriptors:
+                    continue
+                events.extend(self.read(descriptor))
+                if descriptor not in self.descriptors:
+                    poller.unregister(descriptor)
+        for stream in self.streams:
+            if self.partial[stream]:
+                events.append(
+                    (stream, self.partial[stream].decode('utf-8', 'replace'))
+                )
+                self.partial[stream] = b''
+        return events
+
+    def signal(self, number):
+        """
+        Send the signal to the command's process group.
+
+        :param number: Signal number
+        :type number: int
+        """
+        try:
+            os.killpg(self.process.pid, number)
+        except OSError:
+            pass
+
+    def kill(self):
+        """
+        Kill the command's process group.
+        """
+        self.signal(signal.SIGKILL)
+
+    def terminate(self, grace=constants.COMMAND_KILL_GRACE):
+        """
+        Ask the command's process group to terminate and kill it if the
+        command has not exited after the grace time. It's used when the
+        caller does not need the rest of the output.
+
+        :param grace: Time to wait before killing in seconds
+        :type grace: int or float
+        """
+        if not self.running:
+            return
+        self.terminated = True
+        self.signal(signal.SIGTERM)
+        deadline = time.time() + grace
+        interval = constants.COMMAND_POLL_MIN_INTERVAL
+        while self.process.poll() is None and time.time() < deadline:
+            time.sleep(interval)
+            interval = min(interval * 2, constants.COMMAND_POLL_MAX_INTERVAL)
+        self.kill()
+
+    def close(self):
+        """
+        Close the pipes and collect the exit status. The command should
+        have exited or been killed.
+        """
+        for descriptor, stream in list(self.descriptors.items()):
+            getattr(self.process, stream).close()
+        self.descriptors.clear()
+        if self.watched is not None:
+            os.close(self.watched)
+            self.watched = None
+        self.process.wait()
+        self.exited = True
+        self.finished = time.time()
+
+    @property
+    def duration(self):
+        """
+        The command's run time in seconds.
+
+        :rtype: float or None
+        """
+        if self.started is None:
+            return None
+        return (self.finished or time.time()) - self.started
+
+    @property
+    def result(self):
+        """
+        The result of the finished command. The output values are bytes
+        with the dropped middle part replaced by the marker.
+
+        :return: Output, exit code, timeout flag and run time
+        :rtype: dict
+        """
+        return {
+            'stdout': self.output['stdout'].value,
+            'stderr': self.output['stderr'].value,
+            'code': None if self.process is None else self.process.returncode,
+            'process': self.process,
+            'timeout': self.timed_out,
+            'cancelled': self.cancelled,
+            'error': self.error,
+            'duration': self.duration,
+        }
+
+    def lines(self):
+        """
+        Run the started command and yield its output lines as they arrive.
+        If the caller stops iterating before the command is finished the
+        command is terminated.
+
+        :return: Generator of the stream names and lines
+        :rtype: generator
+        """
+        poller = CommandPoller()
+        poller.add(self)
+        try:
+            while poller.commands:
+                for command, stream, line in poller.poll():
+                    yield stream, line
+        finally:
+            if self.running:
+                self.terminate()
+                poller.remove(self)
+
+
+class CommandPoller(object):
+    """
+    The Command poller waits for the output and the exits of several
+    running commands at once. Commands with the pid file descriptor wake
+    the poller when they exit, the others are checked with a growing
+    interval. Commands which have exited or have passed their deadline
+    are finished and removed.
+    """
+
+    def __init__(self):
+        self.poller = select.poll()
+        self.commands = []
+        self.owners = {}
+        self.interval = constants.COMMAND_POLL_MIN_INTERVAL
+
+    def add(self, command):
+        """
+        Start watching the started command.
+
+        :param command: The started command
+        :type command: Command
+        """
+        self.commands.append(command)
+        descriptors = list(command.descriptors)
+        if command.watched is not None:
+            descriptors.append(command.watched)
+        for descriptor in descriptors:
+            self.owners[descriptor] = command
+            self.poller.register(descriptor, select.POLLIN)
+
+    def forget(self, descriptor):
+        """
+        Stop watching the descriptor.
+
+        :param descriptor: Pipe or pid file descriptor
+        :type descriptor: int
+        """
+        if self.owners.pop(descriptor, None) is not None:
+            self.poller.unregister(descriptor)
+
+    def remove(self, command):
+        """
+        Stop watching the command and finish it. The descriptors closed by
+        the final drain are forgotten too.
+
+        :param command: The watched command
+        :type command: Command
+        """
+        for descriptor, owner in list(self.owners.items()):
+            if owner is command:
+                self.forget(descriptor)
+        if command in self.commands:
+            self.commands.remove(command)
+        command.close()
+
+    @property
+    def timeout(self):
+        """
+        The time to wait for the next event in seconds. It's limited by
+        the nearest deadline and by the check interval if some command
+        cannot be waited for by its pid file descriptor.
+
+        :return: Wait time or None to wait without limit
+        :rtype: float or None
+        """
+        timeout = None
+        deadlines = [
+            command.deadline for command in self.commands
+            if command.deadline is not None
+        ]
+        if deadlines:
+            timeout = max(0.0, min(deadlines) - time.time())
+        if any(command.watched is None for command in self.commands):
+            if timeout is None or timeout > self.interval:
+                timeout = self.interval
+            self.interval = min(
+                self.interval * 2, constants.COMMAND_POLL_MAX_INTERVAL
+            )
+        return timeout
+
+    def poll(self):
+        """
+        Wait for the next events of the watched commands.
+
+        :return: List of the commands, stream names and lines
+        :rtype: list
+        """
+        events = []
+        timeout = self.timeout
+        if timeout is None:
+            ready = self.poller.poll()
+        else:
+            ready = self.poller.poll(int(timeout * 1000) + 1)
+        for descriptor, event in ready:
+            command = self.owners.get(descriptor)
+            if command is None:
+                continue
+            if descriptor == command.watched:
+                self.forget(descriptor)
+                command.exited = True
+                continue
+            if descriptor not in command.descriptors:
+                self.forget(descriptor)
+                continue
+            for stream, line in command.read(descriptor):
+                events.append((command, stream, line))
+            if descriptor not in command.descriptors:
+                self.forget(descriptor)
+        if ready:
+            self.interval = constants.COMMAND_POLL_MIN_INTERVAL
+        now = time.time()
+        for command in list(self.commands):
+            if not command.exited and command.watched is None and \
+                    command.process.poll() is not None:
+                command.exited = True
+            if command.exited:
+                for stream, line in command.drain():
+                    events.append((command, stream, line))
+                self.remove(command)
+            elif command.deadline is not None and now >= command.deadline:
+                command.timed_out = True
+                command.kill()
+                self.remove(command)
+        return events
+
+
+class CommandBatch(object):
+    """
+    The Command batch runs several independent commands concurrently.
+    No more than the parallelism number of commands are running at once
+    and all of them share the batch deadline. If the batch should fail
+    fast the first failed command cancels the commands which are still
+    running or waiting.
+    """
+
+    def __init__(self, commands, parallel, timeout=None, fail_fast=False):
+        """
+        :param commands: The commands which are not started yet
+        :type commands: list
+        :param parallel: Maximum number of the running commands
+        :type parallel: int
+        :param timeout: Maximum run time of the whole batch in seconds
+        :type timeout: int or float or None
+        :param fail_fast: Cancel the other commands if one fails
+        :type fail_fast: bool
+        """
+        self.commands = list(commands)
+        self.parallel = max(1, int(parallel))
+        self.timeout = timeout
+        self.fail_fast = fail_fast
+        self.started = None
+        self.finished = None
+        self.failed = None
+
+    def start(self, command):
+        """
+        Start the command limiting its timeout by the batch deadline.
+        A command which cannot be started is finished with the error.
+
+        :param command: The waiting command
+        :type command: Command
+        :return: True if the command is running
+        :rtype: bool
+        """
+        if self.timeout is not None:
+            left = max(0.0, self.started + self.timeout - time.time())
+            if command.timeout is None or command.timeout > left:
+                command.timeout = left
+        try:
+            command.start()
+        except SPAWN_ERRORS as exception:
+            command.error = str(exception)
+            command.started = command.finished = time.time()
+            return False
+        return True
+
+    @staticmethod
+    def cancel(command):
+        """
+        Mark the command as cancelled.
+
+        :param command: The waiting or running command
+        :type command: Command
+        """
+        command.cancelled = True
+        if command.running:
+            command.terminate()
+
+    def run(self):
+        """
+        Run all commands and wait for them to finish.
+
+        :return: The commands in the submission order
+        :rtype: list
+        """
+        self.started = time.time()
+        waiting = list(self.commands)
+        poller = CommandPoller()
+        while waiting or poller.commands:
+            while waiting and len(poller.commands) < self.parallel and \
+                    self.failed is None:
+                command = waiting.pop(0)
+                if self.start(command):
+                    poller.add(command)
+                elif self.fail_fast:
+                    self.failed = command
+            if self.failed is None and poller.commands:
+                poller.poll()
+                if self.fail_fast:
+                    for command in self.commands:
+                        if command.finished is not None and command.failed:
+                            self.failed = command
+                            break
+            if self.failed is not None:
+                for command in list(poller.commands):
+                    self.cancel(command)
+                    poller.remove(command)
+                for command in waiting:
+                    self.cancel(command)
+                waiting = []
+        self.finished = time.time()
+        return self.commands
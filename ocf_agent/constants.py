@@ -19,6 +19,12 @@ OCF_NOT_RUNNING = 7
 OCF_RUNNING_MASTER = 8
 OCF_FAILED_MASTER = 9
 
+OCF_NORMAL_EXIT_CODES = [
+    OCF_SUCCESS,
+    OCF_NOT_RUNNING,
+    OCF_RUNNING_MASTER,
+]
+
 ENV_MANDATORY = [
     "OCF_ROOT",
     "OCF_RA_VERSION_MAJOR",
@@ -73,6 +79,7 @@ DEFAULT_VERSION = '1'
 DEFAULT_INTERVAL = '10'
 DEFAULT_TIMEOUT = '20'
 DEFAULT_DEPTH = '0'
+DEADLINE_MARGIN = 1
 DEFAULT_LOG_FACILITY = 'daemon'
 DEFAULT_OCF_ROOT = '/usr/lib/ocf'
 DEFAULT_CLUSTER_TYPE = 'corosync'
@@ -96,6 +103,8 @@ OCF_VAR_META_MASTER = 'OCF_RESKEY_CRM_meta_master'
 OCF_VAR_META_CLONE = 'OCF_RESKEY_CRM_meta_clone'
 OCF_VAR_META_MIGRATE_SOURCE = 'OCF_RESKEY_CRM_meta_migrate_source'
 OCF_VAR_META_MIGRATE_TARGET = 'OCF_RESKEY_CRM_meta_migrate_target'
+OCF_VAR_META_TIMEOUT = 'OCF_RESKEY_CRM_meta_timeout'
+OCF_VAR_RECORD = 'OCF_AGENT_RECORD'
 
 VALID_ROLES = [
     'Master',
@@ -125,11 +134,45 @@ VALUES_FALSE = frozenset(("0", "f", "false", "no", "n", 'off'))
 DEFAULT_LOCK_DIR = '/var/lock/pacemaker'
 CONST_LOCK_DIR = 'LOCK_DIR'
 CONST_LOCK_FILE = 'LOCK_FILE'
+LOCK_FILE_SUFFIX = '.lock'
+LOCK_MUTEX_SUFFIX = '.mutex'
+LOCK_POLL_MIN_INTERVAL = 0.01
+LOCK_POLL_MAX_INTERVAL = 0.2
+LOCK_WAIT_REPORT = 0.1
+
+# semaphore module
+CONST_CONCURRENCY_CLASS = 'CONCURRENCY_CLASS'
+CONST_CONCURRENCY_LIMIT = 'CONCURRENCY_LIMIT'
+CONST_CONCURRENCY_LIMITS = 'CONCURRENCY_LIMITS'
+DEFAULT_CONCURRENCY_LIMIT = 4
+SEMAPHORE_DIR_PREFIX = 'ocf_agent-semaphore-'
+SEMAPHORE_COUNTER_FILE = 'counter'
+SEMAPHORE_MUTEX_FILE = 'counter.mutex'
+SEMAPHORE_TICKET_SUFFIX = '.ticket'
+SEMAPHORE_TEMP_SUFFIX = '.tmp'
+
+# budget module
+CONST_MONITOR_RATES = 'MONITOR_RATES'
+DEFAULT_MONITOR_RATE = 0
+DEFAULT_MONITOR_BURST = 2
+CONST_MONITOR_BUDGET_WAIT = 'MONITOR_BUDGET_WAIT'
+DEFAULT_MONITOR_BUDGET_WAIT = 1
+BUDGET_FILE_PREFIX = 'ocf_agent-budget-'
+BUDGET_FILE_SUFFIX = '.json'
+MONITOR_RESULT_KEY = 'monitor_result_%d'
+MONITOR_RESULT_MAX_INTERVALS = 2
+MONITOR_REUSABLE_CODES = [OCF_SUCCESS, OCF_RUNNING_MASTER]
+
+# state module
+STATE_FILE_SUFFIX = '.state'
+STATE_LOCK_KEY = 'state'
 
 # pid module
 DEFAULT_PID_DIR = '/var/run/pacemaker'
 CONST_PID_DIR = 'PID_DIR'
 CONST_PID_FILE = 'PID_FILE'
+PID_FILE_SUFFIX = '.pid'
+PID_RECORD_FIELDS = ['starttime', 'exe']
 
 # log module
 HA_LOGD_SOCKET = '/var/lib/heartbeat/log_daemon'
@@ -137,7 +180,190 @@ SYSLOG_SOCKET = '/dev/log'
 LOG_FILE_DIRECTORY = '/var/log/corosync'
 DEFAULT_LOG_HANDLERS = ['console', 'syslog']
 CONST_HANDLERS = 'LOG_HANDLERS'
+CONST_LOG_QUEUE = 'LOG_QUEUE'
+CONST_LOG_QUEUE_SIZE = 'LOG_QUEUE_SIZE'
+CONST_LOG_QUEUE_POLICY = 'LOG_QUEUE_POLICY'
+CONST_LOG_FLUSH_TIMEOUT = 'LOG_FLUSH_TIMEOUT'
+DEFAULT_LOG_QUEUE = False
+DEFAULT_LOG_QUEUE_SIZE = 1000
+DEFAULT_LOG_QUEUE_POLICY = 'oldest'
+DEFAULT_LOG_FLUSH_TIMEOUT = 2
+LOG_QUEUE_POLICIES = ['drop', 'oldest']
+LOG_QUEUE_BATCH = 100
+CONST_LOG_RATE_WINDOW = 'LOG_RATE_WINDOW'
+CONST_LOG_RATE_LIMITS = 'LOG_RATE_LIMITS'
+DEFAULT_LOG_RATE_WINDOW = 0
+DEFAULT_LOG_RATE_LIMITS = {'DEBUG': 1, 'INFO': 1}
+LOG_RATE_STATE_SUFFIX = '.lograte'
+LOG_RATE_LOCK_KEY = 'lograte'
 
 # process module
-KILL_SIGNAL_RETRY = 5
-TERM_SIGNAL_RETRY = 5
+PROC_DIR = '/proc'
+PROC_STAT_PPID = 1
+PROC_STAT_PGID = 2
+PROC_STAT_STARTTIME = 19
+PROC_EXE_DELETED = ' (deleted)'
+PROC_COMM_LENGTH = 15
+PROC_STATUSES = {
+    'R': 'running',
+    'S': 'sleeping',
+    'D': 'disk-sleep',
+    'Z': 'zombie',
+    'T': 'stopped',
+    't': 'tracing-stop',
+    'X': 'dead',
+    'x': 'dead',
+    'K': 'wake-kill',
+    'W': 'waking',
+    'P': 'parked',
+    'I': 'idle',
+}
+PROCESS_DEAD_STATUSES = ['zombie', 'dead']
+PROCESS_ATTRIBUTES = [
+    'pid', 'ppid', 'pgid', 'name', 'exe', 'cmdline', 'uid', 'status',
+    'starttime',
+]
+CONST_PROCESS_BACKEND = 'PROCESS_BACKEND'
+PROCESS_SEARCH_FIELDS = ['name', 'exe', 'cmdline']
+PROCESS_BASE_ATTRIBUTES = ['pid', 'ppid']
+PROCESS_SNAPSHOT_ATTRIBUTES = [
+    'pid', 'ppid', 'name', 'exe', 'cmdline', 'uid', 'status',
+]
+PROCESS_SNAPSHOT_FILE = 'processes.json'
+CONST_PROCESS_SNAPSHOT_TTL = 'PROCESS_SNAPSHOT_TTL'
+DEFAULT_PROCESS_SNAPSHOT_TTL = 0
+CONST_STOP_SIGNALS = 'STOP_SIGNALS'
+DEFAULT_STOP_SIGNALS = [('SIGTERM', 0.8), ('SIGKILL', 1.0)]
+KILL_SIGNALS = [('SIGKILL', 1.0)]
+STOP_MIN_GRACE = 0.5
+CONST_DAEMON_READINESS = 'DAEMON_READINESS'
+DEFAULT_DAEMON_READINESS = None
+DAEMON_READINESS_TYPES = ['notify', 'fd']
+CONST_DAEMON_READY_FD = 'DAEMON_READY_FD'
+DEFAULT_DAEMON_READY_FD = 3
+DAEMON_NOTIFY_VARIABLE = 'NOTIFY_SOCKET'
+DAEMON_NOTIFY_PREFIX = 'ocf_agent-notify-'
+DAEMON_NOTIFY_SOCKET = 'notify'
+DAEMON_MESSAGE_SIZE = 4096
+DAEMON_STDERR_TAIL = 2048
+DAEMON_STDERR_PREFIX = 'ocf_agent-stderr-'
+DAEMON_POLL_MIN_INTERVAL = 0.01
+DAEMON_POLL_MAX_INTERVAL = 0.2
+CONST_DAEMON_OUTPUT = 'DAEMON_OUTPUT'
+DEFAULT_DAEMON_OUTPUT = False
+CONST_DAEMON_OUTPUT_DIR = 'DAEMON_OUTPUT_DIR'
+DEFAULT_DAEMON_OUTPUT_DIR = LOG_FILE_DIRECTORY
+CONST_DAEMON_OUTPUT_SIZE = 'DAEMON_OUTPUT_SIZE'
+DEFAULT_DAEMON_OUTPUT_SIZE = 10 * 1024 * 1024
+CONST_DAEMON_OUTPUT_ROTATIONS = 'DAEMON_OUTPUT_ROTATIONS'
+DEFAULT_DAEMON_OUTPUT_ROTATIONS = 3
+DAEMON_OUTPUT_SUFFIX = '.out'
+DAEMON_OUTPUT_LOCK_KEY = 'output'
+
+# commands module
+COMMAND_HEAD_SIZE = 64 * 1024
+COMMAND_TAIL_SIZE = 64 * 1024
+COMMAND_CHUNK_SIZE = 64 * 1024
+COMMAND_LINE_SIZE = 64 * 1024
+COMMAND_DRAIN_CHUNKS = 64
+COMMAND_DROPPED_MARKER = '\n... %d bytes dropped ...\n'
+COMMAND_KILL_GRACE = 0.5
+COMMAND_POLL_MIN_INTERVAL = 0.01
+COMMAND_POLL_MAX_INTERVAL = 0.1
+CONST_COMMAND_PARALLEL = 'COMMAND_PARALLEL'
+DEFAULT_COMMAND_PARALLEL = 4
+CONST_COMMAND_ENVIRONMENT = 'COMMAND_ENVIRONMENT'
+DEFAULT_COMMAND_ENVIRONMENT = [
+    'PATH', 'HOME', 'USER', 'LOGNAME', 'SHELL', 'TMPDIR', 'TZ',
+    'LANG', 'LANGUAGE', 'LC_ALL', 'LC_CTYPE', 'LC_MESSAGES',
+]
+COMMAND_ENVIRONMENT_PREFIXES = ['OCF_', 'HA_', 'PCMK_']
+COMMAND_DEFAULT_PATH = '/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:' \
+    '/sbin:/bin'
+
+# binaries module
+CONST_REQUIRES_BINARIES = 'REQUIRES_BINARIES'
+BINARIES_CACHE_FILE = 'binaries.json'
+BINARIES_SKIP_ACTIONS = ['meta-data', 'usage', 'stop']
+BINARIES_PARALLEL_ACTIONS = ['validate-all']
+BINARIES_PARALLEL_WORKERS = 8
+
+# cache directory
+CONST_CACHE_DIR = 'CACHE_DIR'
+DEFAULT_CACHE_DIR = '/dev/shm/ocf_agent'
+
+# cache module
+CONST_CACHE_SIZE = 'CACHE_SIZE'
+DEFAULT_CACHE_SIZE = 1048576
+CACHE_ENTRY_SUFFIX = '.entry'
+
+# pressure module
+PRESSURE_DIR = '/proc/pressure'
+PRESSURE_RESOURCES = ['cpu', 'io', 'memory']
+PRESSURE_AVERAGE = 'avg10'
+LOADAVG_FILE = '/proc/loadavg'
+PRESSURE_CACHE_FILE = 'pressure.json'
+PRESSURE_TTL = 2
+CONST_PRESSURE_LIMITS = 'PRESSURE_LIMITS'
+CONST_CRITICAL = 'CRITICAL'
+
+# cgroup module
+CONST_CGROUP = 'CGROUP'
+DEFAULT_CGROUP = False
+CONST_CGROUP_ROOT = 'CGROUP_ROOT'
+DEFAULT_CGROUP_ROOT = '/sys/fs/cgroup/ocf_agent'
+CGROUP_CONTROLLERS = ['cpu', 'memory']
+
+# profile module
+CONST_RESOURCE_PROFILE = 'RESOURCE_PROFILE'
+PROFILE_FIELDS = [
+    'cpu_affinity', 'nice', 'ionice_class', 'ionice_level', 'oom_score_adj',
+]
+PROFILE_RLIMITS = ['nofile', 'nproc', 'memlock', 'core']
+PROFILE_RLIMIT_PREFIX = 'limit_'
+PROFILE_VALIDATE_ACTIONS = ['validate-all', 'start']
+IONICE_CLASSES = {'none': 0, 'realtime': 1, 'best-effort': 2, 'idle': 3}
+IONICE_LEVEL_RANGE = (0, 7)
+DEFAULT_IONICE_LEVEL = 4
+IOPRIO_CLASS_SHIFT = 13
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_SET_SYSCALLS = {
+    'x86_64': 251,
+    'i386': 289,
+    'i686': 289,
+    'aarch64': 30,
+    'armv7l': 314,
+    'ppc64le': 273,
+    's390x': 282,
+}
+OOM_SCORE_ADJ_FILE = '/proc/self/oom_score_adj'
+OOM_SCORE_ADJ_RANGE = (-1000, 1000)
+NICE_RANGE = (-20, 19)
+
+# metrics module
+PROC_STAT_UTIME = 11
+PROC_STAT_STIME = 12
+PROC_STAT_THREADS = 17
+PROC_STAT_RSS = 21
+METRICS_IO_FIELDS = ['read_bytes', 'write_bytes']
+METRICS_COUNTERS = [
+    'cpu_time', 'rss', 'fds', 'threads', 'read_bytes', 'write_bytes',
+]
+METRICS_RATES = {
+    'cpu_percent': 'cpu_time',
+    'rss_rate': 'rss',
+    'read_rate': 'read_bytes',
+    'write_rate': 'write_bytes',
+}
+METRICS_CUMULATIVE = ['cpu_time', 'read_bytes', 'write_bytes']
+METRICS_STATE_KEY = 'metrics'
+METRICS_PREFIX = 'ocf_agent_'
+METRICS_FILE_SUFFIX = '.prom'
+CONST_METRICS_DIR = 'METRICS_DIR'
+DEFAULT_METRICS_DIR = None
+CONST_METRICS_TREE = 'METRICS_TREE'
+DEFAULT_METRICS_TREE = False
+CONST_METRICS_LIMITS = 'METRICS_LIMITS'
+
+# recorder module
+RECORD_PERCENTILES = [50, 90, 99]
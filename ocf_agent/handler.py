@@ -1,3 +1,4 @@
+import time
 from ocf_agent import constants
 from ocf_agent.helpers import docstring_format
 from ocf_agent.helpers import memoization
@@ -185,7 +186,14 @@ class Handler(object):
         exit with error message.
         """
         if self.method is not None and hasattr(self.method, '__call__'):
-            self.method()
+            if self.concurrency_class is None:
+                self.method()
+                return
+            with self.agent.semaphore.acquired(
+                self.concurrency_class,
+                self.concurrency_limit,
+            ):
+                self.method()
         else:
             self.agent.exit.error_unimplemented(
                 "Agent does not have method: '%s'" % self.method_name
@@ -193,6 +201,43 @@ class Handler(object):
 
     __call__ = call
 
+    @property
+    @docstring_format(constants.CONST_CONCURRENCY_CLASS)
+    def concurrency_class(self):
+        """
+        The node-wide concurrency class of this handler. Handlers of the same
+        class are run by a limited number of processes at the same time
+        across all resources on the node. Can be set by the *{0}* constant
+        and will default to **None** which means no limit.
+
+        :return: Concurrency class name
+        :rtype: str or None
+        """
+        return getattr(
+            self,
+            constants.CONST_CONCURRENCY_CLASS,
+            None
+        )
+
+    @property
+    @docstring_format(constants.CONST_CONCURRENCY_LIMIT)
+    def concurrency_limit(self):
+        """
+        The number of processes of this handler's concurrency class which
+        can run at the same time. Can be set by the *{0}* constant or will be
+        taken from the agent's concurrency class limits.
+
+        :return: The class limit
+        :rtype: int or None
+        """
+        return string_to_integer(
+            getattr(
+                self,
+                constants.CONST_CONCURRENCY_LIMIT,
+                None
+            )
+        )
+
     @property
     @memoization
     @docstring_format(constants.CONST_TIMEOUT, constants.DEFAULT_TIMEOUT)
@@ -329,3 +374,184 @@ class MonitorHandler(Handler):
         if self.depth is not None and self.depth != 0:
             full_name += '_' + str(self.depth)
         return full_name
+
+    @property
+    def result_key(self):
+        """
+        The state key of the last result of this monitor.
+
+        :return: State key
+        :rtype: str
+        """
+        return constants.MONITOR_RESULT_KEY % self.depth
+
+    def save_result(self, code):
+        """
+        Save the exit code of the monitor to the state. Failure to save it
+        is not an error and never changes the monitor's exit code.
+
+        :param code: The exit code
+        :type code: int
+        """
+        try:
+            if not self.agent.state.save(self.result_key, [code, time.time()]):
+                self.agent.log.debug(
+                    "Could not save the monitor result: the state is locked"
+                )
+        except (IOError, OSError) as exception:
+            self.agent.log.debug(
+                "Could not save the monitor result: %s", exception
+            )
+
+    def run(self):
+        """
+        Run the monitor and save the exit code of a deep monitor to the
+        state so it can be reused if the next check is degraded. The result
+        is not saved if the monitor has failed with an exception.
+        """
+        if not self.depth:
+            super(MonitorHandler, self).call()
+            return
+        try:
+            super(MonitorHandler, self).call()
+        except SystemExit as exception:
+            self.save_result(exception.code)
+            raise
+        self.save_result(constants.OCF_SUCCESS)
+
+    @property
+    def shallow(self):
+        """
+        The monitor handler with a smaller depth which can be run instead of
+        this one. Returns None if there is no such handler.
+
+        :return: Shallow monitor handler
+        :rtype: MonitorHandler or None
+        """
+        handler = self.handlers.get(action=self.action, check_level=0)
+        if handler is None or handler is self or \
+                not isinstance(handler, MonitorHandler) or \
+                (handler.depth or 0) >= (self.depth or 0):
+            return None
+        return handler
+
+    @property
+    @docstring_format(constants.CONST_PRESSURE_LIMITS)
+    def pressure_limits(self):
+        """
+        The node load limits above which this deep monitor is degraded.
+        The keys are cpu, io and memory pressure percentages and the load
+        average per CPU. The pressure limits are ignored if the kernel has
+        no pressure stall information, the load limit can be used there.
+        Can be set by the *{0}* constant in the handler or in the Agent
+        class and will default to **None** which means the node load is
+        not checked.
+
+        :return: Resource names and their limits
+        :rtype: dict or None
+        """
+        return getattr(
+            self,
+            constants.CONST_PRESSURE_LIMITS,
+            getattr(self.agent, constants.CONST_PRESSURE_LIMITS, None)
+        )
+
+    @property
+    @docstring_format(constants.CONST_CRITICAL)
+    def critical(self):
+        """
+        Critical monitors are never degraded because of the node load.
+        Can be set by the *{0}* constant.
+
+        :rtype: bool
+        """
+        return bool(getattr(self, constants.CONST_CRITICAL, False))
+
+    @property
+    def overload(self):
+        """
+        The description of the node load limits this monitor has exceeded.
+        Shallow and critical monitors are never checked.
+
+        :return: The exceeded limits or None
+        :rtype: str or None
+        """
+        if not self.depth or self.critical or not self.pressure_limits:
+            return None
+        exceeded = self.agent.pressure.exceeded(self.pressure_limits)
+        if not exceeded:
+            return None
+        return 'the node is overloaded: ' + ', '.join(
+            '%s %.2f > %.2f' % limit for limit in exceeded
+        )
+
+    @docstring_format(
+        constants.MONITOR_RESULT_MAX_INTERVALS,
+        constants.MONITOR_REUSABLE_CODES,
+    )
+    def degrade(self, reason):
+        """
+        Replace the deep check when it should not be run. The shallow
+        monitor is run if it's defined, otherwise the last result of this
+        monitor is reused if it's not older than **{0}** intervals and
+        its exit code is one of: {1}. Failures are never reused so the
+        recovery and the new failures are noticed at once. The deep check
+        is run if there is no recent successful result.
+
+        :param reason: Why the check is degraded
+        :type reason: str
+        """
+        shallow = self.shallow
+        if shallow is not None:
+            self.agent.log.warning(
+                "Monitor depth %d is degraded to depth %d: %s",
+                self.depth, shallow.depth or 0, reason,
+            )
+            shallow.call()
+            return
+        result = self.agent.state.get(self.result_key)
+        if isinstance(result, list) and len(result) == 2:
+            code, checked = result
+            age = time.time() - checked
+            recent = age <= \
+                self.interval * constants.MONITOR_RESULT_MAX_INTERVALS
+            if recent and code in constants.MONITOR_REUSABLE_CODES:
+                self.agent.log.warning(
+                    "Monitor depth %d is degraded to its result from %.1f "
+                    "seconds ago: %s",
+                    self.depth, age, reason,
+                )
+                self.agent.exit.code(
+                    code,
+                    'Reused monitor depth %d result' % self.depth,
+                )
+                return
+        self.agent.log.warning(
+            "Monitor depth %d is run although %s: "
+            "there is no recent successful result to reuse",
+            self.depth, reason,
+        )
+        self.run()
+
+    def call(self):
+        """
+        Deep monitors are degraded if the node is overloaded. Otherwise they
+        take a token from the node-wide budget of their depth before running
+        and are degraded if there is no token. If the daemon output is
+        captured its file is rotated first so it stays bounded while the
+        daemon is running.
+        """
+        if self.agent.process.output:
+            self.agent.process.rotate_output()
+        if not self.depth:
+            self.run()
+            return
+        overload = self.overload
+        if overload is not None:
+            self.degrade(overload)
+        elif self.agent.budget.take(self.depth):
+            self.run()
+        else:
+            self.degrade('the node budget is exhausted')
+
+    __call__ = call
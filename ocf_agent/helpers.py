@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 
+import os
+import tempfile
 from ocf_agent import constants
 
 
@@ -135,3 +137,67 @@ def docstring_format(*values):
         return function
 
     return _decorator_
+
+
+def read_file(path):
+    """
+    Read the file as text. The file is read as bytes and on Python 3 the
+    bytes which are not UTF-8 are decoded as surrogate escapes so any
+    file content can be read.
+
+    :param path: File path
+    :type path: str
+    :return: File content or None if it cannot be read
+    :rtype: str or None
+    """
+    try:
+        with open(path, 'rb') as text_file:
+            content = text_file.read()
+    except (IOError, OSError):
+        return None
+    if not isinstance(content, str):
+        content = content.decode('utf-8', 'surrogateescape')
+    return content
+
+
+def atomic_write(path, content, mode=0o600):
+    """
+    Write the content to a file atomically. The content is written to a
+    temporary file in the same directory which is then renamed over the
+    target file so readers never see a partially written file.
+    The directory is created if it's missing.
+
+    :param path: File path
+    :type path: str
+    :param content: File content
+    :type content: str or bytes
+    :param mode: Permissions of the file
+    :type mode: int
+    """
+    directory = os.path.dirname(path) or '.'
+    if not os.path.isdir(directory):
+        try:
+            os.makedirs(directory, 0o700)
+        except OSError:
+            if not os.path.isdir(directory):
+                raise
+    if not isinstance(content, bytes):
+        content = content.encode('utf-8')
+    descriptor, temp_path = tempfile.mkstemp(
+        dir=directory,
+        prefix='.' + os.path.basename(path),
+    )
+    try:
+        try:
+            while content:
+                content = content[os.write(descriptor, content):]
+            os.fchmod(descriptor, mode)
+        finally:
+            os.close(descriptor)
+        os.rename(temp_path, path)
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,417 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from ocf_agent import constants
+from ocf_agent.helpers import atomic_write
+from ocf_agent.modules.lock import FileLock
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+class QueueHandler(logging.Handler):
+    """
+    The Queue handler puts the log records to a bounded queue and returns
+    immediately. The records are written by the QueueListener thread.
+    When the queue is full either the new record or the oldest queued
+    record is dropped depending on the policy.
+    """
+
+    def __init__(self, records, policy=constants.DEFAULT_LOG_QUEUE_POLICY):
+        """
+        :param records: The bounded records queue
+        :type records: Queue
+        :param policy: 'drop' to drop new records or 'oldest' to drop
+        the oldest queued record when the queue is full
+        :type policy: str
+        """
+        logging.Handler.__init__(self)
+        self.queue = records
+        self.policy = policy
+        self.dropped = 0
+
+    def prepare(self, record):
+        """
+        Merge the message arguments and the exception text into the record
+        so it can be formatted by the other thread later.
+
+        :param record: Log record
+        :type record: LogRecord
+        :return: Prepared record
+        :rtype: LogRecord
+        """
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info
+            )
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        """
+        Put the record to the queue without blocking applying the
+        overflow policy.
+
+        :param record: Log record
+        :type record: LogRecord
+        """
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+        self.dropped += 1
+        if self.policy != 'oldest':
+            return
+        try:
+            self.queue.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+    def emit(self, record):
+        try:
+            self.enqueue(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+
+class BatchFileHandler(logging.FileHandler):
+    """
+    The File handler which does not flush the stream after every record.
+    The QueueListener flushes it once after writing a batch of records.
+    """
+
+    def emit(self, record):
+        if self.stream is None:
+            self.stream = self._open()
+        try:
+            self.stream.write(self.format(record) + '\n')
+        except Exception:
+            self.handleError(record)
+
+
+class QueueListener(object):
+    """
+    The Queue listener runs a background thread which takes the records
+    from the queue in batches, passes them to the handlers and flushes
+    the handlers after every batch.
+    """
+    sentinel = None
+
+    def __init__(self, records, handlers, batch=constants.LOG_QUEUE_BATCH):
+        """
+        :param records: The records queue
+        :type records: Queue
+        :param handlers: List of the handlers to write the records to
+        :type handlers: list
+        :param batch: Maximum number of records in a batch
+        :type batch: int
+        """
+        self.queue = records
+        self.handlers = handlers
+        self.batch = batch
+        self.thread = None
+
+    def start(self):
+        """
+        Start the listener thread.
+        """
+        self.thread = threading.Thread(target=self.work)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def handle(self, record):
+        """
+        Pass the record to all handlers which accept its level.
+
+        :param record: Log record
+        :type record: LogRecord
+        """
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def flush(self):
+        """
+        Flush all handlers.
+        """
+        for handler in self.handlers:
+            handler.flush()
+
+    def work(self):
+        """
+        The listener thread loop. It waits for a record, takes all other
+        queued records up to the batch size without waiting, writes them
+        and flushes the handlers.
+        """
+        while True:
+            records = [self.queue.get()]
+            while len(records) < self.batch:
+                try:
+                    records.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            for record in records:
+                if record is self.sentinel:
+                    self.flush()
+                    return
+                self.handle(record)
+            self.flush()
+
+    def stop(self, timeout=None):
+        """
+        Ask the listener thread to write all queued records and stop.
+        Waits no longer than the timeout. Returns True if all records
+        were written.
+
+        :param timeout: Maximum wait time in seconds
+        :type timeout: int or float or None
+        :rtype: bool
+        """
+        if self.thread is None:
+            return True
+        deadline = None
+        if timeout is not None:
+            deadline = time.time() + timeout
+        try:
+            self.queue.put(self.sentinel, timeout=timeout)
+        except queue.Full:
+            return False
+        if deadline is not None:
+            timeout = max(0, deadline - time.time())
+        self.thread.join(timeout)
+        if self.thread.is_alive():
+            return False
+        self.thread = None
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    The Rate limit filter suppresses the repeated messages. Every level
+    has a budget of messages with the same template which can be logged
+    during the time window and the following repeats are suppressed.
+    The first message of the next window reports how many times it was
+    repeated. If the message does not come again, the repeats are reported
+    when the state is saved after its window has passed. Warnings and
+    errors are never suppressed.
+
+    The state is saved to a file so the repeats are counted across
+    the agent invocations. The counters are merged with the saved ones
+    under the lock so the concurrent invocations do not lose each other's
+    repeats.
+    """
+
+    def __init__(self, path, window, limits, lock_path=None):
+        """
+        :param path: The state file path
+        :type path: str
+        :param window: The time window in seconds
+        :type window: int or float
+        :param limits: Level names and their message budgets
+        :type limits: dict
+        :param lock_path: The file locked while the state is saved
+        :type lock_path: str or None
+        """
+        logging.Filter.__init__(self)
+        self.path = path
+        self.window = window
+        self.limits = limits
+        self.lock_path = lock_path
+        self._state = None
+        self.changes = {}
+
+    @property
+    def changed(self):
+        """
+        Check if there are counter changes which are not saved.
+
+        :rtype: bool
+        """
+        return bool(self.changes)
+
+    def read_file(self):
+        """
+        Read the counters from the state file.
+
+        :return: Message keys and their counters
+        :rtype: dict
+        """
+        try:
+            with open(self.path, 'r') as state_file:
+                state = json.load(state_file)
+        except (IOError, OSError, ValueError):
+            return {}
+        if not isinstance(state, dict):
+            return {}
+        return state
+
+    @property
+    def state(self):
+        """
+        The message counters loaded from the state file.
+
+        :return: Message keys and their counters
+        :rtype: dict
+        """
+        if self._state is None:
+            self._state = self.read_file()
+        return self._state
+
+    @staticmethod
+    def key(record):
+        """
+        The identity of the message used to find its repeats. It's the
+        level and the message template so the messages which differ only
+        by their arguments are counted together.
+
+        :param record: Log record
+        :type record: LogRecord
+        :return: Message key
+        :rtype: str
+        """
+        message = '%d %s' % (record.levelno, record.msg)
+        if not isinstance(message, bytes):
+            message = message.encode('utf-8')
+        return hashlib.sha1(message).hexdigest()[:16]
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        limit = self.limits.get(record.levelname)
+        if limit is None:
+            return True
+        key = self.key(record)
+        now = time.time()
+        counter = self.state.get(key)
+        if not isinstance(counter, dict) or \
+                now - counter.get('start', 0) >= self.window:
+            message = record.getMessage()
+            self.state[key] = {
+                'start': now,
+                'count': 1,
+                'suppressed': 0,
+                'level': record.levelno,
+                'message': message,
+            }
+            self.changes[key] = {'count': 1, 'suppressed': 0}
+            if isinstance(counter, dict) and counter.get('suppressed'):
+                record.msg = '%s (message repeated %d times)' % (
+                    message, counter['suppressed'],
+                )
+                record.args = None
+            return True
+        change = self.changes.setdefault(key, {'count': 0, 'suppressed': 0})
+        counter['count'] = counter.get('count', 0) + 1
+        change['count'] += 1
+        if counter['count'] <= limit:
+            return True
+        counter['suppressed'] = counter.get('suppressed', 0) + 1
+        change['suppressed'] += 1
+        return False
+
+    def merge(self, state):
+        """
+        Apply the changes of this invocation to the counters read from the
+        state file. The counter with the newer window wins and the
+        increments are added to the counter of the same window.
+
+        :param state: The saved message keys and their counters
+        :type state: dict
+        :return: The merged counters
+        :rtype: dict
+        """
+        for key, change in self.changes.items():
+            counter = self.state.get(key)
+            if not isinstance(counter, dict):
+                continue
+            saved = state.get(key)
+            if not isinstance(saved, dict) or \
+                    saved.get('start', 0) < counter['start']:
+                state[key] = counter
+            elif saved.get('start', 0) == counter['start']:
+                for name in ['count', 'suppressed']:
+                    saved[name] = saved.get(name, 0) + change[name]
+        return state
+
+    def expired(self, state, now):
+        """
+        Find the counters whose window has passed with suppressed repeats
+        which were not reported yet.
+
+        :param state: Message keys and their counters
+        :type state: dict
+        :param now: Current time
+        :type now: float
+        :return: Expired message keys
+        :rtype: list
+        """
+        return sorted(
+            key for key, counter in state.items()
+            if isinstance(counter, dict) and counter.get('suppressed') and
+            now - counter.get('start', 0) >= self.window
+        )
+
+    def save(self, timeout=constants.DEFAULT_LOG_FLUSH_TIMEOUT):
+        """
+        Merge the counters with the state file, dropping the outdated ones,
+        and save them. The repeats of the expired windows are marked as
+        reported and returned so the caller can log them. Failure to take
+        the lock in time or to save the state is ignored.
+
+        :param timeout: Maximum lock wait time in seconds
+        :type timeout: int or float or None
+        :return: Levels, messages and numbers of repeats to report
+        :rtype: list
+        """
+        if not self.changed and not self.expired(self.state, time.time()):
+            return []
+        lock = None
+        summaries = []
+        try:
+            if self.lock_path is not None:
+                directory = os.path.dirname(self.lock_path)
+                if directory and not os.path.isdir(directory):
+                    os.makedirs(directory)
+                lock = FileLock(self.lock_path)
+                if not lock.acquire(timeout):
+                    return []
+            now = time.time()
+            state = self.merge(self.read_file())
+            for key in self.expired(state, now):
+                counter = state[key]
+                if 'message' in counter:
+                    summaries.append((
+                        counter.get('level', logging.INFO),
+                        counter['message'],
+                        counter['suppressed'],
+                    ))
+                counter['suppressed'] = 0
+            state = dict(
+                (key, counter)
+                for key, counter in state.items()
+                if isinstance(counter, dict) and
+                now - counter.get('start', 0) < self.window * 2
+            )
+            atomic_write(self.path, json.dumps(state))
+        except (IOError, OSError):
+            return []
+        finally:
+            if lock is not None:
+                lock.release()
+        self._state = state
+        self.changes = {}
+        return summaries
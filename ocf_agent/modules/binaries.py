@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+from ocf_agent import constants
+from ocf_agent.helpers import atomic_write
+from ocf_agent.helpers import docstring_format
+from ocf_agent.helpers import memoization
+
+
+class Binaries(object):
+    """
+    The Binaries object resolves the executables required by the agent
+    against the PATH directories. Resolved paths are saved to the cache
+    file and reused by the next invocations until one of the PATH
+    directories is modified.
+    """
+
+    def __init__(self, agent):
+        """
+        The Binaries object should have the Agent object as the first argument.
+
+        :param agent: The parent Agent
+        :type agent: Agent
+        """
+        self.agent = agent
+
+    @property
+    @docstring_format(constants.CONST_REQUIRES_BINARIES)
+    def required(self):
+        """
+        The list of binaries this agent requires to work. They can be set by
+        the *{0}* constant in the Agent class either as names to be found in
+        the PATH directories or as absolute paths.
+
+        :return: List of binary names
+        :rtype: list
+        """
+        return list(
+            getattr(
+                self.agent,
+                constants.CONST_REQUIRES_BINARIES,
+                [],
+            )
+        )
+
+    @property
+    def directories(self):
+        """
+        The list of directories from the PATH environment variable.
+
+        :return: List of directories
+        :rtype: list
+        """
+        search_path = os.getenv('PATH', os.defpath)
+        return [
+            directory for directory in search_path.split(os.pathsep)
+            if directory
+        ]
+
+    @property
+    @docstring_format(constants.CONST_CACHE_DIR, constants.DEFAULT_CACHE_DIR)
+    def cache_directory(self):
+        """
+        The directory where the resolved binaries cache is saved.
+        Can be set by the *{0}* constant in the Agent class
+        and will default to **{1}**.
+
+        :return: Cache directory path
+        :rtype: str
+        """
+        return getattr(
+            self.agent,
+            constants.CONST_CACHE_DIR,
+            constants.DEFAULT_CACHE_DIR,
+        )
+
+    @property
+    def cache_file_path(self):
+        """
+        The full path to the resolved binaries cache file.
+
+        :return: Cache file path
+        :rtype: str
+        """
+        return os.path.join(
+            self.cache_directory,
+            constants.BINARIES_CACHE_FILE,
+        )
+
+    @property
+    @memoization
+    def directory_stamps(self):
+        """
+        The modification times of the PATH directories. A binary cannot be
+        added or removed without changing its directory's modification time
+        so they are used to detect the outdated cache.
+
+        :return: Directory paths and their modification times
+        :rtype: dict
+        """
+        stamps = {}
+        for directory in self.directories:
+            try:
+                stamps[directory] = os.stat(directory).st_mtime
+            except OSError:
+                stamps[directory] = None
+        return stamps
+
+    def load_cache(self):
+        """
+        Read the cached binary paths for the current PATH value. Returns an
+        empty dictionary if there is no cache or any of the PATH directories
+        have been changed since it was saved.
+
+        :return: Binary names and their paths
+        :rtype: dict
+        """
+        try:
+            with open(self.cache_file_path, 'r') as cache_file:
+                cache = json.load(cache_file)
+        except (IOError, OSError, ValueError):
+            return {}
+        if not isinstance(cache, dict):
+            return {}
+        if cache.get('directories') != self.directory_stamps:
+            return {}
+        binaries = cache.get('binaries')
+        if not isinstance(binaries, dict):
+            return {}
+        return binaries
+
+    def save_cache(self):
+        """
+        Atomically write the resolved binary paths to the cache file.
+        Failure to save the cache is not an error, the binaries will be
+        resolved again by the next invocation.
+        """
+        cache = {
+            'directories': self.directory_stamps,
+            'binaries': self.paths,
+        }
+        try:
+            atomic_write(self.cache_file_path, json.dumps(cache))
+        except (IOError, OSError) as exception:
+            self.agent.log.debug(
+                "Could not save the binaries cache: %s", exception
+            )
+
+    @property
+    @memoization
+    def paths(self):
+        """
+        The dictionary of already resolved binary names and their
+        absolute paths. Binaries that were not found have None values.
+
+        :return: Binary names and their paths
+        :rtype: dict
+        """
+        return self.load_cache()
+
+    @staticmethod
+    def is_executable(path):
+        """
+        Check if the path is an executable file.
+
+        :param path: File path
+        :type path: str
+        :rtype: bool
+        """
+        return os.path.isfile(path) and os.access(path, os.X_OK)
+
+    def lookup(self, name):
+        """
+        Find the binary by walking the PATH directories without using
+        the cache. Absolute and relative paths are only checked.
+
+        :param name: Binary name or path
+        :type name: str
+        :return: The absolute binary path or None if not found
+        :rtype: str or None
+        """
+        if os.sep in name:
+            if self.is_executable(name):
+                return os.path.abspath(name)
+            return None
+        for directory in self.directories:
+            path = os.path.join(directory, name)
+            if self.is_executable(path):
+                return os.path.abspath(path)
+        return None
+
+    def resolve(self, names, parallel=False):
+        """
+        Resolve the list of binaries using the cache. Binaries missing from
+        the cache are looked up, concurrently if requested, and the cache
+        is saved once for all of them.
+
+        :param names: List of binary names
+        :type names: list
+        :param parallel: Look up binaries concurrently
+        :type parallel: bool
+        :return: Binary names and their paths
+        :rtype: dict
+        """
+        unknown = [name for name in names if name not in self.paths]
+        if unknown:
+            if parallel and len(unknown) > 1:
+                from multiprocessing.pool import ThreadPool
+                pool = ThreadPool(
+                    min(len(unknown), constants.BINARIES_PARALLEL_WORKERS)
+                )
+                try:
+                    found = pool.map(self.lookup, unknown)
+                finally:
+                    pool.close()
+                    pool.join()
+            else:
+                found = [self.lookup(name) for name in unknown]
+            self.paths.update(zip(unknown, found))
+            self.save_cache()
+        return dict((name, self.paths[name]) for name in names)
+
+    def path(self, name):
+        """
+        Get the absolute path of a single binary.
+
+        :param name: Binary name or path
+        :type name: str
+        :return: The absolute binary path or None if not found
+        :rtype: str or None
+        """
+        return self.resolve([name])[name]
+
+    __getitem__ = path
+
+    @property
+    def missing(self):
+        """
+        The list of required binaries which are not found.
+        Lookups are done in parallel during the validate-all action.
+
+        :return: List of binary names
+        :rtype: list
+        """
+        parallel = self.agent.action in constants.BINARIES_PARALLEL_ACTIONS
+        paths = self.resolve(self.required, parallel=parallel)
+        return [name for name in self.required if paths[name] is None]
+
+    def validate(self):
+        """
+        Check that all required binaries are installed. The agent will exit
+        with the installation error if any of them are missing.
+        Actions that should work without the binaries are not checked.
+        """
+        if self.agent.action in constants.BINARIES_SKIP_ACTIONS:
+            return
+        missing = self.missing
+        if missing:
+            self.agent.exit.error_installation(
+                "Required binaries are not installed: %s" % ', '.join(missing)
+            )
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import time
+from ocf_agent import constants
+from ocf_agent.helpers import atomic_write
+from ocf_agent.helpers import docstring_format
+from ocf_agent.modules.lock import FileLock
+
+
+class Budget(object):
+    """
+    The Budget object is a node-wide token bucket for each monitor depth.
+    Deep monitors of all resources on the node take their tokens from the
+    same bucket file so the expensive checks are spread over time instead
+    of running all at once. Only the depths with a rate set by the agent
+    are limited.
+    """
+
+    def __init__(self, agent):
+        """
+        The Budget object should have the Agent object as the first argument.
+
+        :param agent: The parent Agent
+        :type agent: Agent
+        """
+        self.agent = agent
+
+    def path(self, depth):
+        """
+        The bucket file of this monitor depth. It's placed to the Lock
+        directory and is shared by all agents on the node.
+
+        :param depth: Monitor depth
+        :type depth: int
+        :return: Bucket file path
+        :rtype: str
+        """
+        return os.path.join(
+            self.agent.lock.directory,
+            '%s%d%s' % (
+                constants.BUDGET_FILE_PREFIX,
+                depth,
+                constants.BUDGET_FILE_SUFFIX,
+            ),
+        )
+
+    @docstring_format(
+        constants.CONST_MONITOR_RATES,
+        constants.DEFAULT_MONITOR_RATE,
+        constants.DEFAULT_MONITOR_BURST,
+    )
+    def rate(self, depth):
+        """
+        The number of checks of this depth per minute on the node and the
+        number of checks which can be run at once. Rates can be set by the
+        *{0}* dictionary in the Agent class with depths as keys and either
+        the rate number or the rate and burst pair as values. Zero rate
+        means no limit and the depths without a rate are not limited.
+        Rate defaults to **{1}** and burst to **{2}**.
+
+        :param depth: Monitor depth
+        :type depth: int
+        :return: Rate per minute and burst
+        :rtype: tuple
+        """
+        rates = getattr(self.agent, constants.CONST_MONITOR_RATES, {})
+        rate = rates.get(depth, rates.get(str(depth)))
+        if rate is None:
+            rate = constants.DEFAULT_MONITOR_RATE
+        if isinstance(rate, (list, tuple)):
+            rate, burst = rate
+        else:
+            burst = constants.DEFAULT_MONITOR_BURST
+        return float(rate), max(1.0, float(burst))
+
+    @property
+    @docstring_format(
+        constants.CONST_MONITOR_BUDGET_WAIT,
+        constants.DEFAULT_MONITOR_BUDGET_WAIT,
+    )
+    def wait(self):
+        """
+        The maximum number of seconds to wait for a token. Can be set by
+        the *{0}* constant in the Agent class and will default to **{1}**.
+        The wait is also limited by the remaining operation time.
+
+        :rtype: float
+        """
+        wait = float(
+            getattr(
+                self.agent,
+                constants.CONST_MONITOR_BUDGET_WAIT,
+                constants.DEFAULT_MONITOR_BUDGET_WAIT,
+            )
+        )
+        return min(wait, self.agent.remaining)
+
+    def refill(self, depth, take):
+        """
+        Add the tokens earned since the last update to the bucket and take
+        one token if requested and available. The bucket file is changed
+        under its lock.
+
+        :param depth: Monitor depth
+        :type depth: int
+        :param take: Take a token
+        :type take: bool
+        :return: Seconds until the next token is available, zero if taken,
+        or None if the bucket is not locked
+        :rtype: float or None
+        """
+        rate, burst = self.rate(depth)
+        per_second = rate / 60.0
+        path = self.path(depth)
+        self.agent.lock.make_directory()
+        lock = FileLock(path + constants.LOCK_MUTEX_SUFFIX)
+        if not lock.acquire(self.wait):
+            return None
+        try:
+            try:
+                with open(path, 'r') as bucket_file:
+                    bucket = json.load(bucket_file)
+                tokens = float(bucket['tokens'])
+                updated = float(bucket['updated'])
+            except (IOError, OSError, ValueError, KeyError, TypeError):
+                tokens = burst
+                updated = None
+            now = time.time()
+            if updated is not None:
+                tokens += max(0.0, now - updated) * per_second
+            tokens = min(burst, tokens)
+            delay = 0.0
+            if tokens < 1.0:
+                delay = (1.0 - tokens) / per_second
+            elif take:
+                tokens -= 1.0
+            atomic_write(
+                path,
+                json.dumps({'tokens': tokens, 'updated': now}),
+                mode=0o644,
+            )
+        finally:
+            lock.release()
+        return delay
+
+    def take(self, depth):
+        """
+        Take a token of this monitor depth waiting no longer than the
+        budget wait time. Returns True if the check can be run.
+        The check is not limited if the bucket file cannot be used.
+
+        :param depth: Monitor depth
+        :type depth: int
+        :rtype: bool
+        """
+        rate, burst = self.rate(depth)
+        if rate <= 0:
+            return True
+        deadline = time.time() + self.wait
+        while True:
+            try:
+                delay = self.refill(depth, True)
+            except (IOError, OSError) as exception:
+                self.agent.log.debug(
+                    "Could not use the monitor budget: %s", exception
+                )
+                return True
+            if delay is None:
+                return False
+            if delay == 0:
+                self.agent.log.debug(
+                    "Monitor depth %d token is taken", depth
+                )
+                return True
+            if time.time() + delay > deadline:
+                return False
+            time.sleep(delay)
@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import os
+import time
+from ocf_agent import constants
+from ocf_agent.helpers import atomic_write
+from ocf_agent.helpers import docstring_format
+
+
+class Cache(object):
+    """
+    The Cache object is a persistent cache of this resource instance which
+    keeps values between the agent invocations. Every entry is a small
+    file in the cache directory. Entries can expire after their TTL or
+    when the source file they were calculated from changes. The least
+    recently used entries are removed when the cache exceeds its size.
+    """
+
+    def __init__(self, agent):
+        """
+        The Cache object should have the Agent object as the first argument.
+
+        :param agent: The parent Agent
+        :type agent: Agent
+        """
+        self.agent = agent
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    @docstring_format(constants.CONST_CACHE_DIR, constants.DEFAULT_CACHE_DIR)
+    def directory(self):
+        """
+        The cache directory of this resource instance. It's located in the
+        directory set by the *{0}* constant in the Agent class which will
+        default to **{1}**. It should be on tmpfs.
+
+        :return: Cache directory path
+        :rtype: str
+        """
+        directory = self.agent.name
+        if self.agent.environment.res_instance is not None:
+            directory += '-' + self.agent.environment.res_instance
+        return os.path.join(
+            getattr(
+                self.agent,
+                constants.CONST_CACHE_DIR,
+                constants.DEFAULT_CACHE_DIR,
+            ),
+            directory,
+        )
+
+    @property
+    @docstring_format(constants.CONST_CACHE_SIZE, constants.DEFAULT_CACHE_SIZE)
+    def size(self):
+        """
+        The maximum size of all cache entries in bytes. Can be set by the
+        *{0}* constant in the Agent class and will default to **{1}**.
+
+        :rtype: int
+        """
+        return int(
+            getattr(
+                self.agent,
+                constants.CONST_CACHE_SIZE,
+                constants.DEFAULT_CACHE_SIZE,
+            )
+        )
+
+    def entry_path(self, key):
+        """
+        The path to the entry file of this key.
+
+        :param key: Entry key
+        :type key: str
+        :return: Entry file path
+        :rtype: str
+        """
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(
+            self.directory,
+            digest + constants.CACHE_ENTRY_SUFFIX,
+        )
+
+    @staticmethod
+    def stamp(path):
+        """
+        The identity of a source file. An entry depending on the file
+        becomes invalid when its modification time, inode or size changes.
+
+        :param path: Source file path
+        :type path: str
+        :return: Modification time, inode and size or None if missing
+        :rtype: list or None
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return [stat.st_mtime, stat.st_ino, stat.st_size]
+
+    def count(self, hit, key):
+        """
+        Update the hit and miss counters and report them to the debug log.
+
+        :param hit: The lookup was a hit
+        :type hit: bool
+        :param key: Entry key
+        :type key: str
+        """
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        self.agent.log.debug(
+            "Cache %s: '%s' (hits: %d, misses: %d)",
+            'hit' if hit else 'miss', key, self.hits, self.misses,
+        )
+
+    def lookup(self, key):
+        """
+        Find the valid entry of this key.
+
+        :param key: Entry key
+        :type key: str
+        :return: The entry or None if it's missing or invalid
+        :rtype: dict or None
+        """
+        path = self.entry_path(key)
+        try:
+            with open(path, 'r') as entry_file:
+                entry = json.load(entry_file)
+        except (IOError, OSError, ValueError):
+            return None
+        if not isinstance(entry, dict) or entry.get('key') != key:
+            return None
+        expires = entry.get('expires')
+        if expires is not None and expires <= time.time():
+            self.remove_file(path)
+            return None
+        source = entry.get('source')
+        if source is not None and \
+                self.stamp(source) != entry.get('source_stamp'):
+            self.remove_file(path)
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return entry
+
+    def get(self, key, default=None):
+        """
+        Get the cached value.
+
+        :param key: Entry key
+        :type key: str
+        :param default: Returned if there is no valid entry
+        :type default: object
+        :return: The cached value
+        :rtype: object
+        """
+        entry = self.lookup(key)
+        self.count(entry is not None, key)
+        if entry is None:
+            return default
+        return entry.get('value')
+
+    __getitem__ = get
+
+    def __contains__(self, key):
+        return self.lookup(key) is not None
+
+    def set(self, key, value, ttl=None, source=None, stamp=None):
+        """
+        Save the value to the cache. The value should be serializable to
+        JSON. Failure to save the value is not an error. The source file
+        should be stamped before the value is computed from it, otherwise
+        a change made in between is not noticed.
+
+        :param key: Entry key
+        :type key: str
+        :param value: The value
+        :type value: object
+        :param ttl: The entry expires after this number of seconds
+        :type ttl: int or float or None
+        :param source: The entry expires when this file changes
+        :type source: str or None
+        :param stamp: The stamp of the source taken before the value was
+        computed, the source is stamped now if it's not given
+        :type stamp: list or None
+        """
+        entry = {
+            'key': key,
+            'value': value,
+            'expires': None,
+            'source': source,
+            'source_stamp': None,
+        }
+        if ttl is not None:
+            entry['expires'] = time.time() + ttl
+        if source is not None:
+            if stamp is None:
+                stamp = self.stamp(source)
+            entry['source_stamp'] = stamp
+        try:
+            atomic_write(self.entry_path(key), json.dumps(entry))
+        except (IOError, OSError, TypeError, ValueError) as exception:
+            self.agent.log.debug(
+                "Could not cache '%s': %s", key, exception
+            )
+            return
+        self.evict()
+
+    __setitem__ = set
+
+    @staticmethod
+    def remove_file(path):
+        """
+        Remove the entry file ignoring the already removed ones.
+
+        :param path: Entry file path
+        :type path: str
+        """
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def delete(self, key):
+        """
+        Remove the cached value.
+
+        :param key: Entry key
+        :type key: str
+        """
+        self.remove_file(self.entry_path(key))
+
+    __delitem__ = delete
+
+    @property
+    def entries(self):
+        """
+        The list of entry files with their sizes and last use times
+        ordered from the least recently used one.
+
+        :return: List of use times, sizes and paths
+        :rtype: list
+        """
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for name in names:
+            if not name.endswith(constants.CACHE_ENTRY_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache
+        fits into its size.
+        """
+        entries = self.entries
+        total = sum(size for used, size, path in entries)
+        for used, size, path in entries:
+            if total <= self.size:
+                break
+            self.remove_file(path)
+            total -= size
+
+    def clear(self):
+        """
+        Remove all cached values of this resource instance.
+        """
+        for used, size, path in self.entries:
+            self.remove_file(path)
+
+
+def cached(ttl=None, source=None):
+    """
+    Method memoization decorator using the agent's persistent cache.
+
+    The decorated method's result is saved to the cache by the method name
+    and its arguments and is returned by the next calls, including the
+    calls from the next agent invocations, until the entry expires.
+    It can be used for the Agent methods or for the methods of any object
+    having the *agent* attribute.
+
+    :param ttl: The result expires after this number of seconds
+    :type ttl: int or float or None
+    :param source: The result expires when this file changes. Can be a
+    path or a function which receives the object and returns the path.
+    :type source: str or func or None
+    :return: Method decorator
+    :rtype: func
+    """
+    missing = object()
+
+    def _decorator_(function):
+        def _cached_(self, *args):
+            agent = getattr(self, 'agent', self)
+            key = '%s%r' % (function.__name__, args)
+            value = agent.cache.get(key, missing)
+            if value is not missing:
+                return value
+            source_path = source
+            if callable(source):
+                source_path = source(self)
+            stamp = None
+            if source_path is not None:
+                stamp = agent.cache.stamp(source_path)
+            value = function(self, *args)
+            if stamp is None and source_path is not None and \
+                    agent.cache.stamp(source_path) is not None:
+                # the source has appeared while the value was computed
+                return value
+            agent.cache.set(
+                key, value, ttl=ttl, source=source_path, stamp=stamp,
+            )
+            return value
+
+        _cached_.__name__ = function.__name__
+        _cached_.__doc__ = function.__doc__
+        return _cached_
+
+    return _decorator_
@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+
+import errno
+import os
+import signal
+from ocf_agent import constants
+from ocf_agent.helpers import docstring_format
+from ocf_agent.helpers import string_to_integer
+
+
+class Cgroup(object):
+    """
+    The Cgroup object manages the cgroup v2 control group of this resource
+    instance. A daemon started into its own cgroup can be found by reading
+    the *cgroup.procs* file instead of scanning the process table and the
+    whole cgroup can be killed as a unit. The memory and CPU usage of all
+    its processes are read from the cgroup's files.
+    """
+
+    def __init__(self, agent):
+        """
+        The Cgroup object should have the Agent object as the first argument.
+
+        :param agent: The parent Agent
+        :type agent: Agent
+        """
+        self.agent = agent
+
+    @property
+    @docstring_format(constants.CONST_CGROUP)
+    def enabled(self):
+        """
+        Start the daemons into the cgroup of this resource instance.
+        Can be enabled by the *{0}* constant in the Agent class.
+
+        :rtype: bool
+        """
+        return bool(
+            getattr(
+                self.agent,
+                constants.CONST_CGROUP,
+                constants.DEFAULT_CGROUP,
+            )
+        )
+
+    @property
+    @docstring_format(
+        constants.CONST_CGROUP_ROOT,
+        constants.DEFAULT_CGROUP_ROOT,
+    )
+    def root(self):
+        """
+        The parent cgroup of all resource instance cgroups. Can be set by
+        the *{0}* constant in the Agent class and will default to **{1}**.
+
+        :return: Cgroup directory path
+        :rtype: str
+        """
+        return getattr(
+            self.agent,
+            constants.CONST_CGROUP_ROOT,
+            constants.DEFAULT_CGROUP_ROOT,
+        )
+
+    @property
+    def path(self):
+        """
+        The cgroup directory of this resource instance.
+
+        :return: Cgroup directory path
+        :rtype: str
+        """
+        name = self.agent.name
+        if self.agent.environment.res_instance is not None:
+            name += '-' + self.agent.environment.res_instance
+        return os.path.join(self.root, name)
+
+    @property
+    def available(self):
+        """
+        Check if the unified cgroup v2 hierarchy is mounted
+        at the cgroup root or its parent.
+
+        :rtype: bool
+        """
+        for directory in (self.root, os.path.dirname(self.root)):
+            if os.path.isfile(os.path.join(directory, 'cgroup.controllers')):
+                return True
+        return False
+
+    @property
+    def exists(self):
+        """
+        Check if the cgroup of this resource instance is created.
+
+        :rtype: bool
+        """
+        return os.path.isdir(self.path)
+
+    def file_path(self, name):
+        """
+        The path to the cgroup's file.
+
+        :param name: File name
+        :type name: str
+        :return: File path
+        :rtype: str
+        """
+        return os.path.join(self.path, name)
+
+    def read(self, name):
+        """
+        Read the cgroup's file.
+
+        :param name: File name
+        :type name: str
+        :return: File content or None if it cannot be read
+        :rtype: str or None
+        """
+        try:
+            with open(self.file_path(name), 'r') as cgroup_file:
+                return cgroup_file.read()
+        except (IOError, OSError):
+            return None
+
+    def write(self, name, value, path=None):
+        """
+        Write the value to the cgroup's file.
+
+        :param name: File name
+        :type name: str
+        :param value: The value
+        :type value: str
+        :param path: Cgroup directory or this instance's cgroup
+        :type path: str or None
+        """
+        with open(os.path.join(path or self.path, name), 'a') as cgroup_file:
+            cgroup_file.write(value)
+
+    def create(self):
+        """
+        Create the cgroup of this resource instance. The CPU and memory
+        controllers are enabled for it if possible so its usage can be
+        read.
+        """
+        if self.exists:
+            return
+        if not os.path.isdir(self.root):
+            os.makedirs(self.root)
+        try:
+            self.write(
+                'cgroup.subtree_control',
+                ' '.join(
+                    '+' + controller
+                    for controller in constants.CGROUP_CONTROLLERS
+                ),
+                self.root,
+            )
+        except (IOError, OSError) as exception:
+            self.agent.log.debug(
+                "Could not enable the cgroup controllers: %s", exception
+            )
+        try:
+            os.mkdir(self.path)
+        except OSError as exception:
+            if exception.errno != errno.EEXIST:
+                raise
+
+    def remove(self):
+        """
+        Remove the cgroup if it has no processes left.
+
+        :return: True if the cgroup is removed
+        :rtype: bool
+        """
+        try:
+            os.rmdir(self.path)
+        except OSError as exception:
+            if exception.errno == errno.ENOENT:
+                return True
+            self.agent.log.debug(
+                "Could not remove the cgroup: %s", exception
+            )
+            return False
+        return True
+
+    def add(self, pid):
+        """
+        Move the process to the cgroup. Its future children will be
+        started in the cgroup too.
+
+        :param pid: Process pid
+        :type pid: int
+        """
+        self.write('cgroup.procs', '%d\n' % pid)
+
+    @property
+    def pids(self):
+        """
+        The pids of all processes in the cgroup.
+
+        :return: List of pids
+        :rtype: list
+        """
+        pids = []
+        for line in (self.read('cgroup.procs') or '').splitlines():
+            pid = string_to_integer(line)
+            if pid and pid not in pids:
+                pids.append(pid)
+        return pids
+
+    def stat(self, name):
+        """
+        Read the flat keyed cgroup file like *cpu.stat* or *memory.stat*.
+
+        :param name: File name
+        :type name: str
+        :return: Keys and integer values
+        :rtype: dict
+        """
+        values = {}
+        for line in (self.read(name) or '').splitlines():
+            fields = line.split()
+            if len(fields) == 2:
+                value = string_to_integer(fields[1])
+                if value is not None:
+                    values[fields[0]] = value
+        return values
+
+    @property
+    def populated(self):
+        """
+        Check if the cgroup or its descendants have any processes.
+        The *cgroup.events* file is used if it's available.
+
+        :rtype: bool
+        """
+        events = self.stat('cgroup.events')
+        if 'populated' in events:
+            return bool(events['populated'])
+        return bool(self.pids)
+
+    @property
+    def usage(self):
+        """
+        The aggregate usage of all processes in the cgroup: the current and
+        peak memory in bytes, the CPU time in seconds and the number of
+        processes. Values which are not available are None.
+
+        :return: Usage names and values
+        :rtype: dict
+        """
+        cpu = self.stat('cpu.stat')
+        usage = {
+            'processes': len(self.pids),
+            'memory': string_to_integer(self.read('memory.current')),
+            'memory_peak': string_to_integer(self.read('memory.peak')),
+        }
+        for name in ('usage', 'user', 'system'):
+            value = cpu.get(name + '_usec')
+            key = 'cpu_time' if name == 'usage' else 'cpu_' + name
+            usage[key] = None if value is None else value / 1000000.0
+        return usage
+
+    def kill(self):
+        """
+        Kill all processes of the cgroup. The *cgroup.kill* file is used if
+        it's available, it kills the processes forked during the kill too.
+        """
+        if os.path.isfile(self.file_path('cgroup.kill')):
+            try:
+                self.write('cgroup.kill', '1')
+                return
+            except (IOError, OSError):
+                pass
+        for pid in self.pids:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except OSError:
+                pass
@@ -181,6 +181,26 @@ class Environment(object):
             constants.DEFAULT_QUORUM_TYPE,
         )
 
+    @property
+    @memoization
+    def meta_timeout(self):
+        """
+        The timeout of the current operation set by the cluster. The cluster
+        passes it in milliseconds and it's returned in seconds.
+
+        :return: Operation timeout in seconds or None if not set
+        :rtype: float or None
+        """
+        timeout = string_to_integer(
+            os.getenv(
+                constants.OCF_VAR_META_TIMEOUT,
+                None
+            )
+        )
+        if timeout is None:
+            return None
+        return timeout / 1000.0
+
     @property
     @memoization
     def meta_master_max(self):
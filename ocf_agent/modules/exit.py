@@ -21,7 +21,11 @@ class Exit(object):
 
     def output(self, event, message, code):
         """
-        Output the exit message to the Agent's logger
+        Output the exit message to the Agent's logger. Normal exit codes
+        are logged with the info level and failures with the error level
+        so they are never suppressed by the log rate limiter. The event
+        and the message are part of the log template so the rate
+        limiter counts the different exit messages separately.
 
         :param event: Exit event name
         :type event: str
@@ -30,9 +34,40 @@ class Exit(object):
         :param code: Exit code
         :type code: int
         """
-        self.agent.log.info(
-            '%s: %s - exit code: %d' % (event, message, code)
+        if code in constants.OCF_NORMAL_EXIT_CODES:
+            log = self.agent.log.info
+        else:
+            log = self.agent.log.error
+        template = '%s: %s' % (event, message)
+        log(template.replace('%', '%%') + ' - exit code: %d', code)
+
+    def terminate(self, code):
+        """
+        Write all queued log messages, waiting no longer than the log flush
+        timeout, and exit the process with the given code.
+
+        :param code: Exit code
+        :type code: int
+        """
+        self.agent.log.flush()
+        sys.exit(code)
+
+    def code(self, code, message):
+        """
+        Exit with the given exit code. It can be used to repeat
+        a previously saved result.
+
+        :param code: Exit code
+        :type code: int
+        :param message: Event message
+        :type message: str
+        """
+        self.output(
+            'exit',
+            message,
+            code,
         )
+        self.terminate(code)
 
     @docstring_format(constants.OCF_SUCCESS)
     def success(self, message):
@@ -57,7 +92,7 @@ class Exit(object):
             message,
             constants.OCF_SUCCESS,
         )
-        sys.exit(constants.OCF_SUCCESS)
+        self.terminate(constants.OCF_SUCCESS)
 
     running = success
     running_slave = success
@@ -80,7 +115,7 @@ class Exit(object):
             message,
             constants.OCF_ERR_GENERIC,
         )
-        sys.exit(constants.OCF_ERR_GENERIC)
+        self.terminate(constants.OCF_ERR_GENERIC)
 
     @docstring_format(constants.OCF_ERR_ARGS)
     def error_arguments(self, message):
@@ -97,7 +132,7 @@ class Exit(object):
             message,
             constants.OCF_ERR_ARGS,
         )
-        sys.exit(constants.OCF_ERR_ARGS)
+        self.terminate(constants.OCF_ERR_ARGS)
 
     @docstring_format(constants.OCF_ERR_UNIMPLEMENTED)
     def error_unimplemented(self, message):
@@ -115,7 +150,7 @@ class Exit(object):
             message,
             constants.OCF_ERR_UNIMPLEMENTED,
         )
-        sys.exit(constants.OCF_ERR_UNIMPLEMENTED)
+        self.terminate(constants.OCF_ERR_UNIMPLEMENTED)
 
     @docstring_format(constants.OCF_ERR_PERM)
     def error_permissions(self, message):
@@ -135,7 +170,7 @@ class Exit(object):
             message,
             constants.OCF_ERR_PERM,
         )
-        sys.exit(constants.OCF_ERR_PERM)
+        self.terminate(constants.OCF_ERR_PERM)
 
     @docstring_format(constants.OCF_ERR_INSTALLED)
     def error_installation(self, message):
@@ -156,7 +191,7 @@ class Exit(object):
             message,
             constants.OCF_ERR_INSTALLED,
         )
-        sys.exit(constants.OCF_ERR_INSTALLED)
+        self.terminate(constants.OCF_ERR_INSTALLED)
 
     @docstring_format(constants.OCF_ERR_CONFIGURED)
     def error_configuration(self, message):
@@ -176,7 +211,7 @@ class Exit(object):
             message,
             constants.OCF_ERR_CONFIGURED,
         )
-        sys.exit(constants.OCF_ERR_CONFIGURED)
+        self.terminate(constants.OCF_ERR_CONFIGURED)
 
     @docstring_format(constants.OCF_NOT_RUNNING)
     def not_running(self, message):
@@ -197,7 +232,7 @@ class Exit(object):
             message,
             constants.OCF_NOT_RUNNING,
         )
-        sys.exit(constants.OCF_NOT_RUNNING)
+        self.terminate(constants.OCF_NOT_RUNNING)
 
     @docstring_format(constants.OCF_RUNNING_MASTER)
     def running_master(self, message):
@@ -215,7 +250,7 @@ class Exit(object):
             message,
             constants.OCF_RUNNING_MASTER,
         )
-        sys.exit(constants.OCF_RUNNING_MASTER)
+        self.terminate(constants.OCF_RUNNING_MASTER)
 
     @docstring_format(constants.OCF_FAILED_MASTER)
     def master_failed(self, message):
@@ -234,4 +269,4 @@ class Exit(object):
             message,
             constants.OCF_FAILED_MASTER,
         )
-        sys.exit(constants.OCF_FAILED_MASTER)
+        self.terminate(constants.OCF_FAILED_MASTER)
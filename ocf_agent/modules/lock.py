@@ -1,13 +1,157 @@
 # -*- coding: utf-8 -*-
 
+import errno
+import fcntl
 import os
+import time
+from contextlib import contextmanager
 from ocf_agent import constants
 from ocf_agent.helpers import docstring_format
 
 
+class FileLock(object):
+    """
+    The FileLock object is an advisory exclusive or shared lock of a file
+    taken by the *flock* system call. The lock is released when the file
+    is closed or the process dies. The exclusive lock owner writes its pid
+    to the file so the waiting processes can report who holds the lock.
+    """
+
+    def __init__(self, path, shared=False):
+        """
+        :param path: The lock file path
+        :type path: str
+        :param shared: Take the shared lock instead of the exclusive one
+        :type shared: bool
+        """
+        self.path = path
+        self.shared = shared
+        self.descriptor = None
+        self.waited = 0.0
+
+    @property
+    def is_locked(self):
+        """
+        Check if this object holds the lock.
+
+        :rtype: bool
+        """
+        return self.descriptor is not None
+
+    @property
+    def owner(self):
+        """
+        The pid of the last exclusive lock owner recorded in the file.
+
+        :return: Pid number or None if unknown
+        :rtype: int or None
+        """
+        try:
+            with open(self.path, 'r') as lock_file:
+                return int(lock_file.read().strip())
+        except (IOError, OSError, ValueError):
+            return None
+
+    @property
+    def owner_is_alive(self):
+        """
+        Check if the recorded lock owner process exists. A lock held by a
+        dead owner means the lock descriptor was inherited by a child.
+
+        :return: Boolean value or None if the owner is unknown
+        :rtype: bool or None
+        """
+        owner = self.owner
+        if owner is None:
+            return None
+        try:
+            os.kill(owner, 0)
+        except OSError as exception:
+            return exception.errno == errno.EPERM
+        return True
+
+    def try_lock(self):
+        """
+        Try to take the lock without waiting.
+
+        :return: True if the lock was taken
+        :rtype: bool
+        """
+        operation = fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX
+        try:
+            fcntl.flock(self.descriptor, operation | fcntl.LOCK_NB)
+        except (IOError, OSError) as exception:
+            if exception.errno in (errno.EAGAIN, errno.EACCES):
+                return False
+            raise
+        return True
+
+    def acquire(self, timeout=None):
+        """
+        Take the lock waiting no longer than the timeout. A zero timeout
+        means a single attempt and None means waiting forever.
+
+        :param timeout: Maximum wait time in seconds
+        :type timeout: int or float or None
+        :return: True if the lock was taken
+        :rtype: bool
+        """
+        if self.is_locked:
+            return True
+        started = time.time()
+        self.descriptor = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        interval = constants.LOCK_POLL_MIN_INTERVAL
+        try:
+            while not self.try_lock():
+                now = time.time()
+                if timeout is not None and now - started >= timeout:
+                    os.close(self.descriptor)
+                    self.descriptor = None
+                    self.waited = now - started
+                    return False
+                if timeout is not None:
+                    interval = min(interval, started + timeout - now)
+                time.sleep(interval)
+                interval = min(interval * 2, constants.LOCK_POLL_MAX_INTERVAL)
+        except BaseException:
+            if self.descriptor is not None:
+                os.close(self.descriptor)
+                self.descriptor = None
+            raise
+        self.waited = time.time() - started
+        if not self.shared:
+            try:
+                os.ftruncate(self.descriptor, 0)
+                os.write(self.descriptor, ('%d\n' % os.getpid()).encode())
+            except BaseException:
+                self.release()
+                raise
+        return True
+
+    def release(self):
+        """
+        Release the lock if it's held.
+        """
+        if not self.is_locked:
+            return
+        try:
+            fcntl.flock(self.descriptor, fcntl.LOCK_UN)
+        finally:
+            os.close(self.descriptor)
+            self.descriptor = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.release()
+
+
 class Lock(object):
     """
-    The Lock object can create, check and remove lock files.
+    The Lock object can create, check and remove lock files and
+    take advisory locks with timeouts.
     """
 
     def __init__(self, agent):
@@ -36,13 +180,15 @@ class Lock(object):
             constants.DEFAULT_LOCK_DIR,
         )
 
-    def file_name(self, key=None):
+    def file_name(self, key=None, suffix=constants.LOCK_FILE_SUFFIX):
         """
         The lock file name for this agent with the custom key if the key is
         provided.
 
         :param key: Custom lock file suffix
         :type key: str or None
+        :param suffix: File name extension
+        :type suffix: str
         :return: Lock file name
         :rtype: str
         """
@@ -51,7 +197,7 @@ class Lock(object):
             file_name += '-' + self.agent.environment.res_instance
         if key is not None:
             file_name += '-' + key
-        return file_name + '.lock'
+        return file_name + suffix
 
     @docstring_format(constants.CONST_LOCK_FILE)
     def file_path(self, key=None):
@@ -88,7 +234,11 @@ class Lock(object):
         Create the lock file directory if it's not present.
         """
         if not os.path.isdir(self.directory):
-            os.mkdir(self.directory)
+            try:
+                os.makedirs(self.directory)
+            except OSError:
+                if not os.path.isdir(self.directory):
+                    raise
 
     def file_is_present(self, key=None):
         """
@@ -121,7 +271,9 @@ class Lock(object):
         :type key: str or None
         """
         self.make_directory()
-        open(self.file_path(key), 'w').close()
+        os.close(
+            os.open(self.file_path(key), os.O_WRONLY | os.O_CREAT, 0o644)
+        )
 
     def create(self):
         """
@@ -144,3 +296,107 @@ class Lock(object):
         Alias for 'remove_file' for the default lock file.
         """
         self.remove_file()
+
+    def mutex_path(self, key=None):
+        """
+        The full path to the file used by the advisory lock. It's different
+        from the lock file so it's not affected by the lock file removal.
+
+        :param key: Custom lock file suffix
+        :type key: str or None
+        :return: Mutex file path
+        :rtype: str
+        """
+        return os.path.join(
+            self.directory,
+            self.file_name(key, constants.LOCK_MUTEX_SUFFIX),
+        )
+
+    def acquire(self, key=None, shared=False, timeout=None):
+        """
+        Take the advisory lock of this resource instance. The wait is
+        limited by the timeout or by the remaining operation time.
+        The wait time and the lock owner are reported to the log.
+
+        :param key: Custom lock name
+        :type key: str or None
+        :param shared: Take the shared lock instead of the exclusive one
+        :type shared: bool
+        :param timeout: Maximum wait time in seconds
+        :type timeout: int or float or None
+        :return: The taken lock or None if the timeout has expired
+        :rtype: FileLock or None
+        """
+        if timeout is None:
+            timeout = self.agent.remaining
+        self.make_directory()
+        lock = FileLock(self.mutex_path(key), shared=shared)
+        if lock.acquire(timeout):
+            if lock.waited >= constants.LOCK_WAIT_REPORT:
+                self.agent.log.info(
+                    "Lock '%s' was acquired after %.3f seconds",
+                    lock.path, lock.waited,
+                )
+            else:
+                self.agent.log.debug(
+                    "Lock '%s' was acquired after %.3f seconds",
+                    lock.path, lock.waited,
+                )
+            return lock
+        owner = lock.owner
+        if owner is not None and lock.owner_is_alive is False:
+            self.agent.log.warning(
+                "Lock '%s' is held but its owner pid %s does not exist. "
+                "The lock descriptor may be inherited by a child process.",
+                lock.path, owner,
+            )
+        self.agent.log.error(
+            "Lock '%s' was not acquired in %.3f seconds. Owner pid: %s",
+            lock.path, lock.waited, owner,
+        )
+        return None
+
+    @contextmanager
+    def locked(self, key=None, shared=False, timeout=None):
+        """
+        Hold the advisory lock while the block is run. The agent will exit
+        with the generic error if the lock cannot be acquired in time.
+
+        :param key: Custom lock name
+        :type key: str or None
+        :param shared: Take the shared lock instead of the exclusive one
+        :type shared: bool
+        :param timeout: Maximum wait time in seconds
+        :type timeout: int or float or None
+        """
+        lock = self.acquire(key, shared, timeout)
+        if lock is None:
+            self.agent.exit.error_generic(
+                "Could not acquire the lock: '%s'" % self.mutex_path(key)
+            )
+        try:
+            yield lock
+        finally:
+            lock.release()
+
+    def exclusive(self, key=None, timeout=None):
+        """
+        Alias for 'locked' with the exclusive lock.
+
+        :param key: Custom lock name
+        :type key: str or None
+        :param timeout: Maximum wait time in seconds
+        :type timeout: int or float or None
+        """
+        return self.locked(key, False, timeout)
+
+    def shared(self, key=None, timeout=None):
+        """
+        Alias for 'locked' with the shared lock.
+
+        :param key: Custom lock name
+        :type key: str or None
+        :param timeout: Maximum wait time in seconds
+        :type timeout: int or float or None
+        """
+        return self.locked(key, True, timeout)
@@ -1,9 +1,24 @@
 # -*- coding: utf-8 -*-
+import atexit
 import logging
 import os
 import sys
 from logging.handlers import SysLogHandler
 from ocf_agent import constants
+from ocf_agent.helpers import docstring_format
+from ocf_agent.helpers import memoization
+from ocf_agent.helpers import memoization_get
+from ocf_agent.helpers import memoization_set
+from ocf_agent.helpers import string_to_bool
+from ocf_agent.log_handlers import BatchFileHandler
+from ocf_agent.log_handlers import QueueHandler
+from ocf_agent.log_handlers import QueueListener
+from ocf_agent.log_handlers import RateLimitFilter
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 
 
 class Log(object):
@@ -19,26 +34,176 @@ class Log(object):
         :type agent: Agent
         """
         self.agent = agent
+        self._logger = None
+        self._logger_key = None
+        self._flush_registered = False
+
+    @property
+    def logger_key(self):
+        """
+        The logger configuration key. The logger is rebuilt only if the tag,
+        the level or the enabled handlers have changed since it was built.
+
+        :return: Tag, level, handler names and the queue mode
+        :rtype: tuple
+        """
+        return self.tag, self.level, tuple(self.enabled_handlers), self.queued
 
     @property
     def logger(self):
         """
         Returns the configured Logger class instance. It can be used by
-        logging methods or can be used directly.
+        logging methods or can be used directly. The logger and its handlers
+        are built once and reused by the following calls.
+        In the queue mode the logger has only the Queue handler and the
+        enabled handlers are used by the listener thread.
 
         :return: Logger object
         :rtype: Logger
         """
+        logger_key = self.logger_key
+        if self._logger is not None and self._logger_key == logger_key:
+            return self._logger
         logger = logging.getLogger(self.tag)
         logger.level = self.level
-        logger.handlers = []
+        if self.queued:
+            self.listener.handlers = self.handlers
+            logger.handlers = [self.handler_queue]
+        else:
+            logger.handlers = self.handlers
+        logger.filters = []
+        if self.rate_limit_window:
+            logger.filters.append(self.rate_limiter)
+        self._logger = logger
+        self._logger_key = logger_key
+        return logger
+
+    @property
+    def handlers(self):
+        """
+        The list of the enabled log handlers.
+
+        :return: List of handlers
+        :rtype: list
+        """
+        handlers = []
         if 'console' in self.enabled_handlers:
-            logger.handlers.append(self.handler_console)
+            handlers.append(self.handler_console)
         if 'syslog' in self.enabled_handlers:
-            logger.handlers.append(self.handler_syslog)
+            handlers.append(self.handler_syslog)
         if 'file' in self.enabled_handlers:
-            logger.handlers.append(self.handler_file)
-        return logger
+            handlers.append(self.handler_file)
+        return handlers
+
+    def reset(self):
+        """
+        Close all the created handlers and drop the configured logger.
+        The new logger and handlers will be created by the next log call.
+        """
+        self.stop_listener()
+        for name in ['handler_console', 'handler_file', 'handler_syslog']:
+            handler = memoization_get(self, name)
+            if handler is None:
+                continue
+            if self._logger is not None:
+                self._logger.removeHandler(handler)
+            handler.close()
+            memoization_set(self, name, None)
+        self._logger = None
+        self._logger_key = None
+
+    def stop_listener(self, timeout=None):
+        """
+        Stop the listener thread, if it's running, after it has written
+        all queued records or the timeout has passed. The dropped records
+        are reported. The logger will be rebuilt by the next log call.
+
+        :param timeout: Maximum wait time in seconds
+        :type timeout: int or float or None
+        :return: True if all queued records were written
+        :rtype: bool
+        """
+        listener = memoization_get(self, 'listener')
+        if listener is None:
+            return True
+        handler = memoization_get(self, 'handler_queue')
+        written = listener.stop(timeout)
+        if written and handler is not None and handler.dropped:
+            listener.handle(
+                logging.LogRecord(
+                    self.tag, logging.WARNING, __file__, 0,
+                    'Log queue overflow: %d messages were dropped' %
+                    handler.dropped, None, None,
+                )
+            )
+            listener.flush()
+        memoization_set(self, 'listener', None)
+        memoization_set(self, 'handler_queue', None)
+        self._logger = None
+        self._logger_key = None
+        return written
+
+    def flush(self, timeout=None):
+        """
+        Write all queued records, save the rate limiter state reporting
+        the repeats of its expired windows and flush the handlers. It's
+        done before the agent exits and will wait no longer than the flush
+        timeout.
+
+        :param timeout: Maximum wait time in seconds
+        :type timeout: int or float or None
+        :return: True if all queued records were written
+        :rtype: bool
+        """
+        if timeout is None:
+            timeout = self.flush_timeout
+        written = self.stop_listener(timeout)
+        rate_limiter = memoization_get(self, 'rate_limiter')
+        if rate_limiter is not None:
+            for level, message, repeated in rate_limiter.save(timeout):
+                self.report_repeats(level, message, repeated)
+        for name in ['handler_console', 'handler_file', 'handler_syslog']:
+            handler = memoization_get(self, name)
+            if handler is None:
+                continue
+            try:
+                handler.flush()
+            except (IOError, OSError, ValueError):
+                pass
+        return written
+
+    def report_repeats(self, level, message, repeated):
+        """
+        Write the number of the suppressed repeats of the message directly
+        to the handlers bypassing the rate limiter.
+
+        :param level: Message level
+        :type level: int
+        :param message: The first message of the window
+        :type message: str
+        :param repeated: The number of the suppressed repeats
+        :type repeated: int
+        """
+        if not self.is_enabled(level):
+            return
+        record = logging.LogRecord(
+            self.tag, level, __file__, 0,
+            '%s (message repeated %d times)', (message, repeated), None,
+        )
+        for handler in self.handlers:
+            if level >= handler.level:
+                handler.handle(record)
+
+    def is_enabled(self, level):
+        """
+        Check if the messages of this level will be logged. It is done before
+        any message formatting or logger configuration work.
+
+        :param level: Message level
+        :type level: int
+        :rtype: bool
+        """
+        return level >= self.level
 
     @property
     def enabled_handlers(self):
@@ -54,6 +219,161 @@ class Log(object):
             constants.DEFAULT_LOG_HANDLERS,
         )
 
+    @property
+    @docstring_format(constants.CONST_LOG_QUEUE, constants.DEFAULT_LOG_QUEUE)
+    def queued(self):
+        """
+        Use the queue mode. Log records are put to the queue and are
+        written to the handlers by a background thread so a slow syslog or
+        disk can't stall the agent. Can be enabled by the *{0}* constant
+        in the Agent class and will default to **{1}**.
+
+        :rtype: bool
+        """
+        return string_to_bool(
+            getattr(
+                self.agent,
+                constants.CONST_LOG_QUEUE,
+                constants.DEFAULT_LOG_QUEUE,
+            ),
+            False,
+        )
+
+    @property
+    @docstring_format(
+        constants.CONST_LOG_QUEUE_SIZE,
+        constants.DEFAULT_LOG_QUEUE_SIZE,
+        constants.CONST_LOG_QUEUE_POLICY,
+        constants.DEFAULT_LOG_QUEUE_POLICY,
+    )
+    def queue_options(self):
+        """
+        The queue size and the overflow policy. The size can be set by the
+        *{0}* constant and will default to **{1}**. The policy can be set
+        by the *{2}* constant to either 'drop' the new record or the
+        'oldest' queued one and will default to **{3}**.
+
+        :return: Size and policy
+        :rtype: tuple
+        """
+        size = getattr(
+            self.agent,
+            constants.CONST_LOG_QUEUE_SIZE,
+            constants.DEFAULT_LOG_QUEUE_SIZE,
+        )
+        policy = getattr(
+            self.agent,
+            constants.CONST_LOG_QUEUE_POLICY,
+            constants.DEFAULT_LOG_QUEUE_POLICY,
+        )
+        if policy not in constants.LOG_QUEUE_POLICIES:
+            policy = constants.DEFAULT_LOG_QUEUE_POLICY
+        return int(size), policy
+
+    @property
+    @docstring_format(
+        constants.CONST_LOG_FLUSH_TIMEOUT,
+        constants.DEFAULT_LOG_FLUSH_TIMEOUT,
+    )
+    def flush_timeout(self):
+        """
+        The maximum number of seconds to wait for the queued records to be
+        written before the agent exits. Can be set by the *{0}* constant
+        and will default to **{1}**.
+
+        :rtype: int or float
+        """
+        return getattr(
+            self.agent,
+            constants.CONST_LOG_FLUSH_TIMEOUT,
+            constants.DEFAULT_LOG_FLUSH_TIMEOUT,
+        )
+
+    @property
+    @docstring_format(
+        constants.CONST_LOG_RATE_WINDOW,
+        constants.DEFAULT_LOG_RATE_WINDOW,
+    )
+    def rate_limit_window(self):
+        """
+        The time window in seconds during which the repeated messages are
+        suppressed. Can be set by the *{0}* constant in the Agent class
+        and will default to **{1}** which disables the rate limiting.
+
+        :rtype: int or float
+        """
+        return getattr(
+            self.agent,
+            constants.CONST_LOG_RATE_WINDOW,
+            constants.DEFAULT_LOG_RATE_WINDOW,
+        )
+
+    @property
+    @docstring_format(
+        constants.CONST_LOG_RATE_LIMITS,
+        constants.DEFAULT_LOG_RATE_LIMITS,
+    )
+    def rate_limits(self):
+        """
+        The number of identical messages of each level that can be logged
+        during the rate limit window. Can be set by the *{0}* constant in
+        the Agent class and will default to **{1}**. Warnings and errors
+        are never suppressed.
+
+        :return: Level names and their budgets
+        :rtype: dict
+        """
+        limits = getattr(
+            self.agent,
+            constants.CONST_LOG_RATE_LIMITS,
+            constants.DEFAULT_LOG_RATE_LIMITS,
+        )
+        return dict(
+            (str(level).upper(), int(limit))
+            for level, limit in limits.items()
+        )
+
+    @property
+    def rate_limit_state_path(self):
+        """
+        The path to the rate limiter state file of this resource.
+        It's located in the agent's cache directory.
+
+        :return: State file path
+        :rtype: str
+        """
+        file_name = self.agent.name
+        if self.agent.environment.res_instance is not None:
+            file_name += '-' + self.agent.environment.res_instance
+        return os.path.join(
+            getattr(
+                self.agent,
+                constants.CONST_CACHE_DIR,
+                constants.DEFAULT_CACHE_DIR,
+            ),
+            file_name + constants.LOG_RATE_STATE_SUFFIX,
+        )
+
+    @property
+    @memoization
+    def rate_limiter(self):
+        """
+        The filter suppressing the repeated messages of this resource.
+        Its state is saved under the lock of this resource by the exit
+        flush which is registered when the filter is created.
+
+        :return: Rate limit filter
+        :rtype: RateLimitFilter
+        """
+        rate_limiter = RateLimitFilter(
+            self.rate_limit_state_path,
+            self.rate_limit_window,
+            self.rate_limits,
+            self.agent.lock.mutex_path(constants.LOG_RATE_LOCK_KEY),
+        )
+        self.register_flush()
+        return rate_limiter
+
     @property
     def level(self):
         """
@@ -127,6 +447,7 @@ class Log(object):
         return '%(name)s %(levelname)s %(message)s'
 
     @property
+    @memoization
     def formatter_file(self):
         """
         The formatter with the date prefix. Used for file and console logger.
@@ -143,6 +464,7 @@ class Log(object):
     formatter_console = formatter_file
 
     @property
+    @memoization
     def formatter_syslog(self):
         """
         The Syslog formatter does not send the date prefix.
@@ -155,6 +477,7 @@ class Log(object):
     # log handlers #
 
     @property
+    @memoization
     def handler_console(self):
         """
         The Console handler sends the messages to the standard error output.
@@ -169,21 +492,30 @@ class Log(object):
         return handler
 
     @property
+    @memoization
     def handler_file(self):
         """
         The File handler sends the messages directly to a log file.
+        The file is opened by the first message. In the queue mode the
+        file is flushed once per batch of messages.
 
         :return: File Handler
         :rtype: Handler
         """
-        handler = logging.FileHandler(
+        if self.queued:
+            file_handler_class = BatchFileHandler
+        else:
+            file_handler_class = logging.FileHandler
+        handler = file_handler_class(
             filename=self.log_file_path,
             encoding=self.agent.encoding,
+            delay=True,
         )
         handler.setFormatter(self.formatter_file)
         return handler
 
     @property
+    @memoization
     def handler_syslog(self):
         """
         The Syslog handler sends the messages to the syslog service.
@@ -198,34 +530,77 @@ class Log(object):
         handler.setFormatter(self.formatter_syslog)
         return handler
 
+    @property
+    @memoization
+    def listener(self):
+        """
+        The Queue listener thread writing the queued messages to the
+        handlers. It's started when created and will be stopped on the
+        agent's exit.
+
+        :return: Queue listener
+        :rtype: QueueListener
+        """
+        size, policy = self.queue_options
+        listener = QueueListener(queue.Queue(size), self.handlers)
+        listener.start()
+        self.register_flush()
+        return listener
+
+    def register_flush(self):
+        """
+        Register the flush to be run on the interpreter exit so the queued
+        records and the rate limiter state are not lost if the agent exits
+        without calling it. It's registered only once however many times
+        the listener or the rate limiter are rebuilt.
+        """
+        if self._flush_registered:
+            return
+        atexit.register(self.flush)
+        self._flush_registered = True
+
+    @property
+    @memoization
+    def handler_queue(self):
+        """
+        The Queue handler puts the messages to the listener's bounded queue.
+
+        :return: Queue Handler
+        :rtype: QueueHandler
+        """
+        size, policy = self.queue_options
+        return QueueHandler(self.listener.queue, policy)
+
     # logging methods #
 
     def log(self, level, msg, *args, **kwargs):
-        self.logger.log(level, msg, *args, **kwargs)
+        if self.is_enabled(level):
+            self.logger.log(level, msg, *args, **kwargs)
 
     def debug(self, msg, *args, **kwargs):
-        self.logger.debug(msg, *args, **kwargs)
+        self.log(logging.DEBUG, msg, *args, **kwargs)
 
     def info(self, msg, *args, **kwargs):
-        self.logger.info(msg, *args, **kwargs)
+        self.log(logging.INFO, msg, *args, **kwargs)
 
     def warning(self, msg, *args, **kwargs):
-        self.logger.warning(msg, *args, **kwargs)
+        self.log(logging.WARNING, msg, *args, **kwargs)
 
     warn = warning
 
     def error(self, msg, *args, **kwargs):
-        self.logger.error(msg, *args, **kwargs)
+        self.log(logging.ERROR, msg, *args, **kwargs)
 
     err = error
 
     def critical(self, msg, *args, **kwargs):
-        self.logger.critical(msg, *args, **kwargs)
+        self.log(logging.CRITICAL, msg, *args, **kwargs)
 
     crit = critical
 
     def exception(self, msg, *args, **kwargs):
-        self.logger.exception(msg, *args, **kwargs)
+        kwargs.setdefault('exc_info', True)
+        self.log(logging.ERROR, msg, *args, **kwargs)
 
     @staticmethod
     def output(msg):
@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+from ocf_agent import constants
+from ocf_agent.helpers import atomic_write
+from ocf_agent.helpers import docstring_format
+from ocf_agent.helpers import read_file
+
+
+class Metrics(object):
+    """
+    The Metrics object samples the resource usage of the managed service:
+    its CPU time, resident memory, open descriptors, threads and I/O bytes.
+    The counters are read from the proc filesystem of the service process
+    and optionally of all its descendants. The rates are calculated
+    against the previous sample saved in the resource state. The sample is
+    logged, can be written to a metrics file and can be compared with the
+    configured limits.
+    """
+
+    def __init__(self, agent):
+        """
+        The Metrics object should have the Agent object as the first argument.
+
+        :param agent: The parent Agent
+        :type agent: Agent
+        """
+        self.agent = agent
+        self.root = constants.PROC_DIR
+
+    @property
+    @docstring_format(constants.CONST_METRICS_TREE)
+    def tree(self):
+        """
+        Sample the descendants of the service process too. Can be enabled
+        by the *{0}* constant in the Agent class.
+
+        :rtype: bool
+        """
+        return bool(
+            getattr(
+                self.agent,
+                constants.CONST_METRICS_TREE,
+                constants.DEFAULT_METRICS_TREE,
+            )
+        )
+
+    @property
+    @docstring_format(constants.CONST_METRICS_LIMITS)
+    def limits(self):
+        """
+        The usage limits set by the *{0}* constant in the Agent class.
+        The keys are the counter or rate names, for example *rss* in bytes,
+        *fds* or *rss_rate* in bytes per second.
+
+        :return: Metric names and their limits
+        :rtype: dict
+        """
+        return dict(
+            getattr(self.agent, constants.CONST_METRICS_LIMITS, None) or {}
+        )
+
+    @property
+    @docstring_format(constants.CONST_METRICS_DIR)
+    def file_path(self):
+        """
+        The metrics file of this resource instance in the Prometheus text
+        format. It's written only if the directory is set by the *{0}*
+        constant in the Agent class, for example to the node exporter's
+        text file collector directory.
+
+        :return: Metrics file path or None
+        :rtype: str or None
+        """
+        directory = getattr(
+            self.agent,
+            constants.CONST_METRICS_DIR,
+            constants.DEFAULT_METRICS_DIR,
+        )
+        if not directory:
+            return None
+        return os.path.join(
+            directory,
+            self.instance + constants.METRICS_FILE_SUFFIX,
+        )
+
+    @property
+    def instance(self):
+        """
+        The resource instance name.
+
+        :rtype: str
+        """
+        instance = self.agent.name
+        if self.agent.environment.res_instance is not None:
+            instance += '-' + self.agent.environment.res_instance
+        return instance
+
+    def read(self, pid, name):
+        """
+        Read the file of the process directory.
+
+        :param pid: Process pid
+        :type pid: int
+        :param name: File name
+        :type name: str
+        :return: File content or None if it cannot be read
+        :rtype: str or None
+        """
+        return read_file(os.path.join(self.root, str(pid), name))
+
+    def read_process(self, pid):
+        """
+        Read the counters of a single process. The CPU time, threads and
+        resident memory are taken from the *stat* file, the I/O bytes from
+        the *io* file and the descriptors are counted in the *fd* directory.
+        The I/O and descriptor counters are None if they cannot be read.
+
+        :param pid: Process pid
+        :type pid: int
+        :return: Counter names and values or None if the process is missing
+        :rtype: dict or None
+        """
+        stat = self.read(pid, 'stat')
+        if stat is None:
+            return None
+        fields = stat[stat.rfind(')') + 2:].split()
+        try:
+            counters = {
+                'cpu_time': float(
+                    int(fields[constants.PROC_STAT_UTIME]) +
+                    int(fields[constants.PROC_STAT_STIME])
+                ) / os.sysconf('SC_CLK_TCK'),
+                'threads': int(fields[constants.PROC_STAT_THREADS]),
+                'rss': int(fields[constants.PROC_STAT_RSS]) *
+                os.sysconf('SC_PAGE_SIZE'),
+            }
+        except (IndexError, ValueError):
+            return None
+        io = {}
+        for line in (self.read(pid, 'io') or '').splitlines():
+            name, _, value = line.partition(':')
+            io[name.strip()] = value.strip()
+        for field in constants.METRICS_IO_FIELDS:
+            try:
+                counters[field] = int(io[field])
+            except (KeyError, ValueError):
+                counters[field] = None
+        try:
+            counters['fds'] = len(
+                os.listdir(os.path.join(self.root, str(pid), 'fd'))
+            )
+        except OSError:
+            counters['fds'] = None
+        return counters
+
+    def sample(self, pid, tree=None):
+        """
+        Read the counters of the process and sum them with the counters
+        of its descendants if the tree should be sampled.
+
+        :param pid: Process pid
+        :type pid: int
+        :param tree: Sample the descendants too or use the 'tree' default
+        :type tree: bool or None
+        :return: The sample or None if the process is missing
+        :rtype: dict or None
+        """
+        if tree is None:
+            tree = self.tree
+        pids = [pid]
+        if tree:
+            pids.extend(self.agent.process.descendants(pid))
+        sample = self.read_process(pid)
+        if sample is None:
+            return None
+        sample['processes'] = 1
+        for number in pids[1:]:
+            counters = self.read_process(number)
+            if counters is None:
+                continue
+            sample['processes'] += 1
+            for name in constants.METRICS_COUNTERS:
+                if sample[name] is None or counters[name] is None:
+                    sample[name] = None
+                else:
+                    sample[name] += counters[name]
+        sample['pid'] = pid
+        sample['time'] = time.time()
+        return sample
+
+    @staticmethod
+    def rates(sample, previous):
+        """
+        Calculate the rates of the counters against the previous sample of
+        the same process. The CPU rate is the percentage of one CPU and
+        the others are per second. A counter which has decreased, for
+        example because a sampled descendant has exited, has no rate.
+
+        :param sample: The current sample
+        :type sample: dict
+        :param previous: The previous sample
+        :type previous: dict or None
+        :return: Rate names and values
+        :rtype: dict
+        """
+        rates = dict((name, None) for name in constants.METRICS_RATES)
+        if not isinstance(previous, dict) or \
+                previous.get('pid') != sample['pid']:
+            return rates
+        try:
+            interval = sample['time'] - previous['time']
+        except (KeyError, TypeError):
+            return rates
+        if interval <= 0:
+            return rates
+        for rate, counter in constants.METRICS_RATES.items():
+            if sample.get(counter) is None or previous.get(counter) is None:
+                continue
+            value = (sample[counter] - previous[counter]) / interval
+            if value < 0 and counter in constants.METRICS_CUMULATIVE:
+                continue
+            if rate == 'cpu_percent':
+                value *= 100
+            rates[rate] = round(value, 3)
+        return rates
+
+    def exceeded(self, metrics):
+        """
+        Compare the metrics with the limits.
+
+        :param metrics: Metric names and values
+        :type metrics: dict
+        :return: List of metric names, their values and limits
+        :rtype: list
+        """
+        exceeded = []
+        limits = self.limits
+        for name in sorted(limits):
+            value = metrics.get(name)
+            if value is not None and limits[name] is not None and \
+                    value > limits[name]:
+                exceeded.append((name, value, limits[name]))
+        return exceeded
+
+    def format(self, metrics):
+        """
+        Format the metrics as the Prometheus text exposition.
+
+        :param metrics: Metric names and values
+        :type metrics: dict
+        :return: Metrics text
+        :rtype: str
+        """
+        labels = 'agent="%s",instance="%s"' % (
+            self.agent.name,
+            self.agent.environment.res_instance or self.agent.name,
+        )
+        lines = []
+        names = constants.METRICS_COUNTERS + sorted(constants.METRICS_RATES)
+        for name in ['processes'] + names:
+            if metrics.get(name) is None:
+                continue
+            lines.append('%s%s{%s} %s' % (
+                constants.METRICS_PREFIX, name, labels, metrics[name],
+            ))
+        return '\n'.join(lines) + '\n'
+
+    def write(self, metrics):
+        """
+        Write the metrics file if it's enabled. Failure to write the file
+        is not an error.
+
+        :param metrics: Metric names and values
+        :type metrics: dict
+        """
+        path = self.file_path
+        if path is None:
+            return
+        try:
+            atomic_write(path, self.format(metrics), 0o644)
+        except (IOError, OSError) as exception:
+            self.agent.log.debug(
+                "Could not write the metrics file: %s", exception
+            )
+
+    def collect(self, pid=None, tree=None):
+        """
+        Sample the service process, calculate the rates against the previous
+        sample, save the sample to the resource state, log the metrics and
+        write them to the metrics file. If any of the limits is exceeded
+        the agent exits with the generic error.
+
+        :param pid: Process pid or the pid from the default pid file
+        :type pid: int or str or None
+        :param tree: Sample the descendants too or use the 'tree' default
+        :type tree: bool or None
+        :return: Metric names and values or None if the process is missing
+        :rtype: dict or None
+        """
+        if pid is None:
+            pid = self.agent.pid.number
+        if pid is None:
+            return None
+        pid = int(pid)
+        sample = self.sample(pid, tree)
+        if sample is None:
+            return None
+        previous = self.agent.state.get(constants.METRICS_STATE_KEY)
+        metrics = dict(sample)
+        metrics.update(self.rates(sample, previous))
+        try:
+            if not self.agent.state.save(constants.METRICS_STATE_KEY, sample):
+                self.agent.log.debug(
+                    "Could not save the metrics sample: the state is locked"
+                )
+        except (IOError, OSError) as exception:
+            self.agent.log.debug(
+                "Could not save the metrics sample: %s", exception
+            )
+        self.agent.log.info(
+            "Resource usage of pid %s: %s", pid, ' '.join(
+                '%s=%s' % (name, metrics[name]) for name in
+                ['processes'] + constants.METRICS_COUNTERS +
+                sorted(constants.METRICS_RATES)
+                if metrics.get(name) is not None
+            ),
+        )
+        self.write(metrics)
+        exceeded = self.exceeded(metrics)
+        if exceeded:
+            self.agent.exit.error_generic(
+                'Resource usage limits exceeded: %s' % ', '.join(
+                    '%s %s > %s' % item for item in exceeded
+                )
+            )
+        return metrics
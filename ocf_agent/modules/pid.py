@@ -2,6 +2,7 @@
 
 import os
 from ocf_agent import constants
+from ocf_agent.helpers import atomic_write
 from ocf_agent.helpers import docstring_format
 from ocf_agent.helpers import string_to_integer
 
@@ -9,6 +10,9 @@ from ocf_agent.helpers import string_to_integer
 class Pid(object):
     """
     The Pid object can create, check, read and remove pid files.
+    The pid files created by the agent record the process start time and
+    executable after the pid number so the process identity can be verified.
+    Every pid file is read once per invocation.
     """
 
     def __init__(self, agent):
@@ -19,6 +23,7 @@ class Pid(object):
         :type agent: Agent
         """
         self.agent = agent
+        self.records = {}
 
     @property
     @docstring_format(constants.CONST_PID_DIR, constants.DEFAULT_PID_DIR)
@@ -52,7 +57,7 @@ class Pid(object):
             file_name += '-' + self.agent.environment.res_instance
         if key is not None:
             file_name += '-' + key
-        return file_name + '.pid'
+        return file_name + constants.PID_FILE_SUFFIX
 
     @docstring_format(constants.CONST_PID_FILE)
     def file_path(self, key=None):
@@ -92,7 +97,11 @@ class Pid(object):
         Create the pid file directory if it's not present.
         """
         if not os.path.isdir(self.directory):
-            os.mkdir(self.directory)
+            try:
+                os.makedirs(self.directory)
+            except OSError:
+                if not os.path.isdir(self.directory):
+                    raise
 
     def file_is_present(self, key=None):
         """
@@ -119,8 +128,9 @@ class Pid(object):
 
     def create_file(self, number, key=None):
         """
-        Create the specified pid file and
-        write the pid number to it.
+        Create the specified pid file and write the pid number, the process
+        start time and executable to it. The file is replaced atomically
+        so it's never seen partially written.
 
         :param number: Pid file number
         :type number: int
@@ -128,8 +138,15 @@ class Pid(object):
         :type key: str or None
         """
         self.make_directory()
-        with open(self.file_path(key), 'w') as pid_file:
-            pid_file.write("%d\n" % number)
+        record = {'pid': int(number)}
+        identity = self.agent.process.identity(number) or {}
+        lines = ['%d' % record['pid']]
+        for field in constants.PID_RECORD_FIELDS:
+            record[field] = identity.get(field)
+            if record[field] is not None:
+                lines.append('%s=%s' % (field, record[field]))
+        atomic_write(self.file_path(key), '\n'.join(lines) + '\n', 0o644)
+        self.records[key] = record
 
     def create(self, number):
         """
@@ -140,6 +157,65 @@ class Pid(object):
         """
         self.create_file(number)
 
+    @staticmethod
+    def parse(content):
+        """
+        Parse the pid file content. The first line is the pid number and the
+        next lines can have the start time and executable fields. Pid files
+        created by services have only the number.
+
+        :param content: Pid file content
+        :type content: str
+        :return: The pid record or None if there is no pid number
+        :rtype: dict or None
+        """
+        lines = content.splitlines()
+        if not lines:
+            return None
+        number = string_to_integer(lines[0])
+        if not number:
+            return None
+        record = dict((field, None) for field in constants.PID_RECORD_FIELDS)
+        record['pid'] = number
+        for line in lines[1:]:
+            field, _, value = line.partition('=')
+            field = field.strip()
+            if field == 'starttime':
+                record[field] = string_to_integer(value)
+            elif field in record:
+                record[field] = value.strip() or None
+        return record
+
+    def read_record(self, key=None):
+        """
+        Read the pid file record. The file is read only by the first
+        successful call until it's created or removed by this agent.
+        A missing file is read again so the agent can wait for the service
+        to write it.
+
+        :param key: Custom pid file suffix
+        :type key: str or None
+        :return: The pid record or None if the file cannot be read
+        :rtype: dict or None
+        """
+        if key in self.records:
+            return self.records[key]
+        try:
+            with open(self.file_path(key), 'r') as pid_file:
+                record = self.parse(pid_file.read())
+        except (IOError, OSError):
+            return None
+        if record is not None:
+            self.records[key] = record
+        return record
+
+    @property
+    def record(self):
+        """
+        Alias for 'read_record' for the default pid file.
+        """
+        return self.read_record()
+
     def read_file(self, key=None):
         """
         Read the pid file and return the recorded number or
@@ -150,11 +226,10 @@ class Pid(object):
         :return: The pid number
         :rtype: int or None
         """
-        if not self.file_is_present(key):
+        record = self.read_record(key)
+        if record is None:
             return None
-        with open(self.file_path(key), 'r') as pid_file:
-            number = pid_file.read()
-        return string_to_integer(number)
+        return record['pid']
 
     @property
     def read(self):
@@ -174,9 +249,37 @@ class Pid(object):
         """
         if self.file_is_present(key):
             os.remove(self.file_path(key))
+        self.records.pop(key, None)
 
     def remove(self):
         """
         Alias for 'remove_file' for the default pid file.
         """
         self.remove_file()
+
+    def file_is_running(self, key=None):
+        """
+        Check if the process recorded in the specified pid file is running.
+        The start time and executable are compared if they are recorded.
+
+        :param key: Custom pid file suffix
+        :type key: str or None
+        :rtype: bool
+        """
+        record = self.read_record(key)
+        if record is None:
+            return False
+        return self.agent.process.is_running(
+            record['pid'],
+            starttime=record.get('starttime'),
+            exe=record.get('exe'),
+        )
+
+    @property
+    def is_running(self):
+        """
+        Alias for 'file_is_running' for the default pid file.
+
+        :rtype: bool
+        """
+        return self.file_is_running()
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+
+import json
+import multiprocessing
+import os
+import time
+from ocf_agent import constants
+from ocf_agent.helpers import atomic_write
+from ocf_agent.helpers import docstring_format
+from ocf_agent.helpers import memoization
+
+
+class Pressure(object):
+    """
+    The Pressure object reads the node load: the pressure stall information
+    of CPU, IO and memory and the load average per CPU. The readings are
+    saved to a file in the cache directory and are shared by all agents on
+    the node for a short time so they are not read by every invocation.
+    """
+
+    def __init__(self, agent):
+        """
+        The Pressure object should have the Agent object as the first argument.
+
+        :param agent: The parent Agent
+        :type agent: Agent
+        """
+        self.agent = agent
+
+    @property
+    @docstring_format(constants.CONST_CACHE_DIR, constants.DEFAULT_CACHE_DIR)
+    def cache_file_path(self):
+        """
+        The node-wide readings file. It's located in the directory set by
+        the *{0}* constant in the Agent class which will default to **{1}**.
+
+        :return: Readings file path
+        :rtype: str
+        """
+        return os.path.join(
+            getattr(
+                self.agent,
+                constants.CONST_CACHE_DIR,
+                constants.DEFAULT_CACHE_DIR,
+            ),
+            constants.PRESSURE_CACHE_FILE,
+        )
+
+    @staticmethod
+    @docstring_format(constants.PRESSURE_AVERAGE)
+    def read_pressure(resource):
+        """
+        Read the pressure of the resource. It's the **{0}** percentage of the
+        time some tasks were stalled on it.
+
+        :param resource: cpu, io or memory
+        :type resource: str
+        :return: The pressure or None if it's not available
+        :rtype: float or None
+        """
+        path = os.path.join(constants.PRESSURE_DIR, resource)
+        try:
+            with open(path, 'r') as pressure_file:
+                lines = pressure_file.readlines()
+        except (IOError, OSError):
+            return None
+        for line in lines:
+            fields = line.split()
+            if not fields or fields[0] != 'some':
+                continue
+            for field in fields[1:]:
+                name, _, value = field.partition('=')
+                if name == constants.PRESSURE_AVERAGE:
+                    try:
+                        return float(value)
+                    except ValueError:
+                        return None
+        return None
+
+    @staticmethod
+    def read_load():
+        """
+        Read the one minute load average divided by the number of CPUs.
+
+        :return: The load or None if it's not available
+        :rtype: float or None
+        """
+        try:
+            with open(constants.LOADAVG_FILE, 'r') as loadavg_file:
+                load = float(loadavg_file.read().split()[0])
+        except (IOError, OSError, ValueError, IndexError):
+            return None
+        try:
+            cpus = multiprocessing.cpu_count()
+        except NotImplementedError:
+            cpus = 1
+        return load / cpus
+
+    def read(self):
+        """
+        Read the current node load. The load average is always read so it
+        can be limited if the pressure information is not available.
+
+        :return: Resource names and their load values
+        :rtype: dict
+        """
+        readings = {'load': self.read_load()}
+        for resource in constants.PRESSURE_RESOURCES:
+            readings[resource] = self.read_pressure(resource)
+        return readings
+
+    @property
+    @memoization
+    @docstring_format(constants.PRESSURE_TTL)
+    def readings(self):
+        """
+        The node load readings. They are taken from the shared file if it's
+        not older than **{0}** seconds or are read again and saved.
+
+        :return: Resource names and their load values
+        :rtype: dict
+        """
+        try:
+            with open(self.cache_file_path, 'r') as cache_file:
+                data = json.load(cache_file)
+            age = time.time() - data['time']
+            if 0 <= age < constants.PRESSURE_TTL and \
+                    isinstance(data['readings'], dict):
+                return data['readings']
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            pass
+        readings = self.read()
+        data = {'time': time.time(), 'readings': readings}
+        try:
+            atomic_write(self.cache_file_path, json.dumps(data), 0o644)
+        except (IOError, OSError) as exception:
+            self.agent.log.debug(
+                "Could not save the node pressure: %s", exception
+            )
+        return readings
+
+    def exceeded(self, limits):
+        """
+        Compare the readings with the limits. Readings which are not
+        available are not compared, so on kernels without the pressure
+        stall information the cpu, io and memory limits are ignored and
+        only the load limit is checked.
+
+        :param limits: Resource names (cpu, io, memory and load)
+        and their limits
+        :type limits: dict
+        :return: List of resource names, their values and limits
+        :rtype: list
+        """
+        exceeded = []
+        readings = self.readings
+        for resource in sorted(limits):
+            value = readings.get(resource)
+            limit = limits[resource]
+            if limit is None:
+                continue
+            if value is None:
+                self.agent.log.debug(
+                    "Node %s load is not available, its limit is not checked",
+                    resource,
+                )
+            elif value > limit:
+                exceeded.append((resource, value, limit))
+        return exceeded
@@ -1,7 +1,28 @@
-import psutil
+import errno
+import fcntl
+import json
+import os
+import re
+import select
+import shutil
+import signal
+import socket
+import subprocess
+import tempfile
+import time
+from ocf_agent.commands import Command
+from ocf_agent.commands import CommandBatch
+from ocf_agent.commands import NEW_SESSION_ARGUMENT
+from ocf_agent.commands import PASS_FDS_ARGUMENT
+from ocf_agent.commands import SPAWN_ERRORS
+from ocf_agent.helpers import atomic_write
+from ocf_agent.helpers import docstring_format
+from ocf_agent.helpers import memoization
+from ocf_agent.helpers import memoization_set
 from ocf_agent.helpers import string_to_integer
-from subprocess import PIPE
-from time import sleep
+from ocf_agent.modules.lock import FileLock
+from ocf_agent.process_backends import BACKENDS
+from ocf_agent.process_backends import default_backend
 from ocf_agent import constants
 
 
@@ -9,9 +30,37 @@ class Process(object):
     def __init__(self, agent):
         self.agent = agent
 
+    @property
+    @memoization
+    @docstring_format(constants.CONST_PROCESS_BACKEND)
+    def backend(self):
+        """
+        The backend used to read the process information. It can be set by
+        the *{0}* constant in the Agent class to 'proc' or 'psutil'. The proc
+        backend is used by default if the proc filesystem is available.
+
+        :return: The process backend
+        :rtype: ProcBackend or PsutilBackend
+        """
+        name = getattr(
+            self.agent,
+            constants.CONST_PROCESS_BACKEND,
+            None
+        ) or default_backend()
+        if name not in BACKENDS:
+            self.agent.exit.error_configuration(
+                "Unknown process backend: '%s'" % name
+            )
+        try:
+            return BACKENDS[name]()
+        except ImportError as exception:
+            self.agent.exit.error_installation(
+                "Process backend '%s' is not available: %s" % (name, exception)
+            )
+
     @property
     def iterator(self):
-        return psutil.process_iter()
+        return self.entries()
 
     @property
     def processes(self):
@@ -19,82 +68,1115 @@ class Process(object):
 
     all = processes
 
+    def entries(self, attributes=None):
+        """
+        Iterate over the running processes reading only the requested
+        attributes of every process once. The supported attributes are
+        pid, ppid, pgid, name, exe, cmdline, uid, status and starttime.
+        The attributes which cannot be read are None.
+
+        :param attributes: Attribute names, all of them if not set
+        :type attributes: list or None
+        :return: Generator of attribute dictionaries
+        :rtype: generator
+        """
+        return self.backend.entries(attributes)
+
+    @staticmethod
+    def matches(value, pattern, prefix=False):
+        """
+        Match the attribute value with the pattern. The pattern can be
+        a string which should be equal to the value, or be its prefix if
+        requested, or a compiled regular expression which is searched for.
+        The command line is matched as a string of space-separated arguments.
+
+        :param value: Attribute value
+        :type value: str or list or None
+        :param pattern: String or compiled regular expression
+        :type pattern: str or re.Pattern
+        :param prefix: Match the string pattern as a prefix
+        :type prefix: bool
+        :rtype: bool
+        """
+        if value is None:
+            return False
+        if isinstance(value, (list, tuple)):
+            value = ' '.join(value)
+        if hasattr(pattern, 'search'):
+            return pattern.search(value) is not None
+        if prefix:
+            return value.startswith(pattern)
+        return value == pattern
+
+    def search(self, name=None, exe=None, cmdline=None,
+               uid=None, ppid=None, prefix=False):
+        """
+        Find the running processes matching all given criteria. Only the
+        attributes used by the criteria are read. It's a generator so the
+        search can be stopped after the first match.
+
+        :param name: Process name pattern
+        :type name: str or re.Pattern or None
+        :param exe: Executable path pattern
+        :type exe: str or re.Pattern or None
+        :param cmdline: Command line pattern
+        :type cmdline: str or re.Pattern or None
+        :param uid: Real user id
+        :type uid: int or None
+        :param ppid: Parent pid
+        :type ppid: int or None
+        :param prefix: Match the string patterns as prefixes
+        :type prefix: bool
+        :return: Generator of attribute dictionaries
+        :rtype: generator
+        """
+        patterns = Process.patterns(name, exe, cmdline)
+        attributes = list(constants.PROCESS_BASE_ATTRIBUTES) + \
+            sorted(patterns)
+        if uid is not None:
+            attributes.append('uid')
+        for entry in self.select(
+            self.entries(attributes), patterns, uid, ppid, prefix,
+        ):
+            yield entry
+
+    @staticmethod
+    def patterns(name=None, exe=None, cmdline=None):
+        """
+        Collect the given attribute patterns.
+
+        :return: Attribute names and their patterns
+        :rtype: dict
+        """
+        return dict(
+            (field, pattern) for field, pattern in (
+                ('name', name), ('exe', exe), ('cmdline', cmdline),
+            ) if pattern is not None
+        )
+
+    @classmethod
+    def select(cls, entries, patterns, uid=None, ppid=None, prefix=False):
+        """
+        Filter the process entries by the search criteria.
+
+        :param entries: Attribute dictionaries
+        :type entries: iterable
+        :param patterns: Attribute names and their patterns
+        :type patterns: dict
+        :param uid: Real user id
+        :type uid: int or None
+        :param ppid: Parent pid
+        :type ppid: int or None
+        :param prefix: Match the string patterns as prefixes
+        :type prefix: bool
+        :return: Generator of the matching entries
+        :rtype: generator
+        """
+        for entry in entries:
+            if ppid is not None and entry['ppid'] != ppid:
+                continue
+            if uid is not None and entry['uid'] != uid:
+                continue
+            if all(
+                cls.matches(entry[field], pattern, prefix)
+                for field, pattern in patterns.items()
+            ):
+                yield entry
+
+    def find_first(self, **criteria):
+        """
+        Find the first running process matching the criteria of
+        the 'search' method.
+
+        :return: Attribute dictionary or None if not found
+        :rtype: dict or None
+        """
+        for entry in self.search(**criteria):
+            return entry
+        return None
+
     def find(self, name):
+        """
+        Find the running processes which have the string in their name
+        or command line.
+
+        :param name: The string to find
+        :type name: str
+        :return: List of attribute dictionaries
+        :rtype: list
+        """
+        pattern = re.compile(re.escape(name))
         return [
-            process for process in self.iterator
-            if name in process.name or name in ' '.join(process.cmdline)
-            ]
+            entry for entry in self.entries(
+                constants.PROCESS_BASE_ATTRIBUTES + ['name', 'cmdline']
+            )
+            if self.matches(entry['name'], pattern) or
+            self.matches(entry['cmdline'], pattern)
+        ]
+
+    @property
+    @docstring_format(
+        constants.CONST_PROCESS_SNAPSHOT_TTL,
+        constants.DEFAULT_PROCESS_SNAPSHOT_TTL,
+    )
+    def snapshot_ttl(self):
+        """
+        The number of seconds the process snapshot is shared by all agents
+        on the node. Can be set by the *{0}* constant in the Agent class and
+        will default to **{1}** which means the snapshot is not shared.
+
+        :rtype: float
+        """
+        return float(
+            getattr(
+                self.agent,
+                constants.CONST_PROCESS_SNAPSHOT_TTL,
+                constants.DEFAULT_PROCESS_SNAPSHOT_TTL,
+            )
+        )
+
+    @property
+    @docstring_format(constants.CONST_CACHE_DIR, constants.DEFAULT_CACHE_DIR)
+    def snapshot_path(self):
+        """
+        The node-wide process snapshot file. It's located in the directory
+        set by the *{0}* constant in the Agent class which will default
+        to **{1}**.
+
+        :return: Snapshot file path
+        :rtype: str
+        """
+        return os.path.join(
+            getattr(
+                self.agent,
+                constants.CONST_CACHE_DIR,
+                constants.DEFAULT_CACHE_DIR,
+            ),
+            constants.PROCESS_SNAPSHOT_FILE,
+        )
+
+    def load_snapshot(self):
+        """
+        Read the node-wide process snapshot if it's fresh enough.
+
+        :return: The snapshot or None if it's missing or outdated
+        :rtype: ProcessSnapshot or None
+        """
+        try:
+            with open(self.snapshot_path, 'r') as snapshot_file:
+                data = json.load(snapshot_file)
+            taken = float(data['time'])
+            entries = list(data['entries'])
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            return None
+        if not 0 <= time.time() - taken < self.snapshot_ttl:
+            return None
+        return ProcessSnapshot(entries, taken)
+
+    def save_snapshot(self, snapshot):
+        """
+        Publish the process snapshot to the other agents on the node.
+        Failure to save the snapshot is not an error.
+
+        :param snapshot: The snapshot
+        :type snapshot: ProcessSnapshot
+        """
+        data = json.dumps(
+            {'time': snapshot.time, 'entries': snapshot.entries},
+            separators=(',', ':'),
+        )
+        try:
+            atomic_write(self.snapshot_path, data, 0o644)
+        except (IOError, OSError) as exception:
+            self.agent.log.debug(
+                "Could not save the process snapshot: %s", exception
+            )
+
+    @property
+    @memoization
+    def snapshot(self):
+        """
+        The table of the running processes taken once and reused by this
+        invocation. If the snapshot sharing is enabled a fresh snapshot
+        published by another agent is used instead of scanning the
+        processes again.
+
+        :return: The process snapshot
+        :rtype: ProcessSnapshot
+        """
+        if self.snapshot_ttl > 0:
+            snapshot = self.load_snapshot()
+            if snapshot is not None:
+                return snapshot
+        snapshot = ProcessSnapshot(
+            list(self.entries(constants.PROCESS_SNAPSHOT_ATTRIBUTES)),
+            time.time(),
+        )
+        if self.snapshot_ttl > 0:
+            self.save_snapshot(snapshot)
+        return snapshot
+
+    def refresh(self):
+        """
+        Drop the process snapshot so the next access takes a new one.
+        """
+        memoization_set(self, 'snapshot', None)
+
+    def identity(self, pid):
+        """
+        Read the identity of the process: its status, start time in clock
+        ticks since boot and executable path. The start time does not change
+        during the process life so together with the executable it tells
+        a reused pid from the original process.
+
+        :param pid: Process pid
+        :type pid: int
+        :return: Process identity or None if there is no such process
+        :rtype: dict or None
+        """
+        pid = string_to_integer(pid)
+        if not pid:
+            return None
+        return self.backend.entry(pid, ['status', 'starttime', 'exe'])
+
+    def is_running(self, pid, starttime=None, exe=None):
+        """
+        Check if the process is running. Zombie processes are not running.
+        If the start time or the executable are given they should match
+        the running process so a reused pid is not taken for the original
+        process. The executable is not compared if it cannot be read.
+
+        :param pid: Process pid
+        :type pid: int
+        :param starttime: Expected start time
+        :type starttime: int or None
+        :param exe: Expected executable path
+        :type exe: str or None
+        :rtype: bool
+        """
+        if starttime is None and exe is None:
+            pid = string_to_integer(pid)
+            return bool(pid) and self.backend.exists(pid)
+        identity = self.identity(pid)
+        if identity is None:
+            return False
+        if identity['status'] in constants.PROCESS_DEAD_STATUSES:
+            return False
+        if starttime is not None and identity['starttime'] != starttime:
+            return False
+        if exe is not None and identity['exe'] is not None and \
+                identity['exe'] != exe:
+            return False
+        return True
+
+    def get(self, pid):
+        """
+        Read all attributes of the process.
+
+        :param pid: Process pid
+        :type pid: int
+        :return: Attribute dictionary or None if there is no such process
+        :rtype: dict or None
+        """
+        pid = string_to_integer(pid)
+        if not pid:
+            return None
+        return self.backend.entry(pid)
 
     @staticmethod
-    def is_running(pid):
+    def kill(pid):
         pid = string_to_integer(pid)
-        return psutil.pid_exists(pid)
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except (TypeError, OSError):
+            pass
 
     @staticmethod
-    def get(pid):
+    def terminate(pid):
         pid = string_to_integer(pid)
         try:
-            return psutil.Process(pid)
-        except (TypeError, psutil.NoSuchProcess):
+            os.kill(pid, signal.SIGTERM)
+        except (TypeError, OSError):
+            pass
+
+    @property
+    @docstring_format(constants.CONST_STOP_SIGNALS)
+    def stop_signals(self):
+        """
+        The signal sequence used to stop a process. Every stage is a signal
+        name or number and the share of the remaining stop time to wait
+        for the process to exit after the signal. The last stage waits for
+        all the remaining time. Can be set by the *{0}* constant in the
+        Agent class.
+
+        :return: List of signals and their time shares
+        :rtype: list
+        """
+        return list(
+            getattr(
+                self.agent,
+                constants.CONST_STOP_SIGNALS,
+                constants.DEFAULT_STOP_SIGNALS,
+            )
+        )
+
+    @staticmethod
+    def signal_number(name):
+        """
+        Convert the signal name to its number.
+
+        :param name: Signal name or number
+        :type name: str or int
+        :return: Signal number
+        :rtype: int
+        """
+        if isinstance(name, int):
+            return name
+        name = str(name).upper()
+        if not name.startswith('SIG'):
+            name = 'SIG' + name
+        return int(getattr(signal, name))
+
+    @staticmethod
+    def watch(pid):
+        """
+        Open the pid file descriptor of the process. It becomes readable when
+        the process exits and can be used to signal exactly this process
+        even if its pid is reused.
+
+        :param pid: Process pid
+        :type pid: int
+        :return: The descriptor or None if it's not supported
+        :rtype: int or None
+        """
+        if not hasattr(os, 'pidfd_open'):
+            return None
+        try:
+            return os.pidfd_open(pid)
+        except OSError as exception:
+            if exception.errno == errno.ESRCH:
+                raise
             return None
 
-    def kill(self, pid):
-        process = self.get(pid)
-        if process is not None:
-            process.kill()
+    @staticmethod
+    def reap(pid):
+        """
+        Collect the exit status of the process if it's a child of this
+        process so it does not remain a zombie.
 
-    def terminate(self, pid):
-        process = self.get(pid)
-        if process is None:
-            return
-        process.terminate()
+        :param pid: Process pid
+        :type pid: int
+        """
+        try:
+            os.waitpid(pid, os.WNOHANG)
+        except OSError:
+            pass
 
-    def ensure_terminate(self, pid):
-        process = self.get(pid)
-        if process is None:
+    def send_signal(self, pid, number, descriptor=None):
+        """
+        Send the signal to the process using its pid file descriptor
+        if it's open.
+
+        :param pid: Process pid
+        :type pid: int
+        :param number: Signal number
+        :type number: int
+        :param descriptor: The pid file descriptor
+        :type descriptor: int or None
+        """
+        if descriptor is not None and hasattr(signal, 'pidfd_send_signal'):
+            signal.pidfd_send_signal(descriptor, number)
+        else:
+            os.kill(pid, number)
+
+    def wait(self, watched, timeout):
+        """
+        Wait for all watched processes to exit at the same time. The pid
+        file descriptors are polled together, the processes without them
+        are waited for by the backend which reaps the child processes too.
+        Exited processes are removed from the dictionary.
+
+        :param watched: Pids and their pid file descriptors
+        :type watched: dict
+        :param timeout: Maximum wait time in seconds
+        :type timeout: int or float
+        :return: True if all processes have exited
+        :rtype: bool
+        """
+        deadline = time.time() + timeout
+        descriptors = dict(
+            (descriptor, pid) for pid, descriptor in watched.items()
+            if descriptor is not None
+        )
+        poller = select.poll()
+        for descriptor in descriptors:
+            poller.register(descriptor, select.POLLIN)
+        while descriptors:
+            left = deadline - time.time()
+            if left <= 0:
+                break
+            for descriptor, event in poller.poll(int(left * 1000) + 1):
+                pid = descriptors.pop(descriptor)
+                poller.unregister(descriptor)
+                self.reap(pid)
+                os.close(descriptor)
+                del watched[pid]
+        others = [pid for pid, descriptor in watched.items()
+                  if descriptor is None]
+        if others:
+            alive = set(
+                self.backend.wait(others, max(0.0, deadline - time.time()))
+            )
+            for pid in others:
+                if pid not in alive:
+                    del watched[pid]
+        return not watched
+
+    def stop_processes(self, pids, signals=None, timeout=None, rescan=None):
+        """
+        Stop the processes by sending the signals of the stop sequence one
+        by one. Every signal is sent once to all processes and their exits
+        are waited for together without polling. The stop time is limited
+        by the timeout or by the remaining operation time and every stage
+        duration is reported to the log.
+
+        :param pids: Process pids
+        :type pids: list
+        :param signals: The stop sequence, taken from the agent if not set
+        :type signals: list or None
+        :param timeout: Maximum stop time in seconds
+        :type timeout: int or float or None
+        :param rescan: Receives the running pids before every stage and
+        returns the new pids to stop too
+        :type rescan: func or None
+        :return: True if no processes are running
+        :rtype: bool
+        """
+        if signals is None:
+            signals = self.stop_signals
+        if timeout is None:
+            timeout = self.agent.remaining
+        deadline = time.time() + timeout
+        watched = {}
+
+        def watch(new_pids):
+            for pid in new_pids:
+                pid = string_to_integer(pid)
+                if not pid or pid in watched:
+                    continue
+                if not self.is_running(pid):
+                    self.reap(pid)
+                    continue
+                try:
+                    watched[pid] = self.watch(pid)
+                except OSError:
+                    continue
+
+        watch(pids)
+        try:
+            for stage, (name, share) in enumerate(signals):
+                if rescan is not None:
+                    watch(rescan(list(watched)))
+                if not watched:
+                    return True
+                started = time.time()
+                stopping = sorted(watched)
+                count = len(stopping)
+                grace = max(0.0, deadline - started)
+                if stage < len(signals) - 1:
+                    grace *= share
+                grace = max(grace, constants.STOP_MIN_GRACE)
+                number = self.signal_number(name)
+                for pid, descriptor in list(watched.items()):
+                    try:
+                        self.send_signal(pid, number, descriptor)
+                    except OSError as exception:
+                        if exception.errno != errno.ESRCH:
+                            raise
+                        self.reap(pid)
+                        if descriptor is not None:
+                            os.close(descriptor)
+                        del watched[pid]
+                self.wait(watched, grace)
+                self.agent.log.info(
+                    "Processes %s: %d of %d exited after %s in %.3f seconds",
+                    ', '.join(str(pid) for pid in stopping),
+                    count - len(watched), count,
+                    name, time.time() - started,
+                )
+            return not watched
+        finally:
+            for descriptor in watched.values():
+                if descriptor is not None:
+                    os.close(descriptor)
+
+    def stop(self, pid, signals=None, timeout=None):
+        """
+        Stop the single process with the stop sequence.
+
+        :param pid: Process pid
+        :type pid: int
+        :param signals: The stop sequence, taken from the agent if not set
+        :type signals: list or None
+        :param timeout: Maximum stop time in seconds
+        :type timeout: int or float or None
+        :return: True if the process is not running
+        :rtype: bool
+        """
+        return self.stop_processes([pid], signals, timeout)
+
+    def descendants(self, pid):
+        """
+        The pids of all children of the process and their children.
+
+        :param pid: Process pid
+        :type pid: int
+        :return: List of pids
+        :rtype: list
+        """
+        pid = string_to_integer(pid)
+        if not pid:
+            return []
+        return self.backend.descendants(pid)
+
+    def stop_tree(self, pid, signals=None, timeout=None):
+        """
+        Stop the process and all its descendants. They are taken once and
+        signalled together. Before every stage the running processes are
+        checked for new children, so children forked during the stop are
+        stopped too, and already found processes are followed even after
+        they are re-parented.
+
+        :param pid: Process pid
+        :type pid: int
+        :param signals: The stop sequence, taken from the agent if not set
+        :type signals: list or None
+        :param timeout: Maximum stop time in seconds
+        :type timeout: int or float or None
+        :return: True if no processes of the tree are running
+        :rtype: bool
+        """
+        pid = string_to_integer(pid)
+
+        def rescan(running):
+            found = []
+            for running_pid in running:
+                found.extend(self.descendants(running_pid))
+            return found
+
+        return self.stop_processes(
+            [pid] + self.descendants(pid), signals, timeout, rescan,
+        )
+
+    def group_members(self, pgid):
+        """
+        The pids of the running members of the process group. Zombies are
+        not included. The exited members which are children of this process
+        are reaped first.
+
+        :param pgid: Process group id
+        :type pgid: int
+        :return: List of pids
+        :rtype: list
+        """
+        try:
+            while os.waitpid(-pgid, os.WNOHANG)[0]:
+                pass
+        except OSError:
+            pass
+        members = []
+        for entry in self.entries(['pgid', 'status']):
+            if entry['pgid'] != pgid:
+                continue
+            if entry['status'] in constants.PROCESS_DEAD_STATUSES:
+                continue
+            members.append(entry['pid'])
+        return members
+
+    def group_is_running(self, pgid):
+        """
+        Check if the process group has any running members left.
+
+        :param pgid: Process group id
+        :type pgid: int
+        :rtype: bool
+        """
+        return bool(self.group_members(pgid))
+
+    def stop_group(self, pid, signals=None, timeout=None):
+        """
+        Stop the whole process group led by the process. Every signal is
+        sent to the group by a single call and the members found before
+        the signal are waited for together. The process tree is stopped
+        instead if the process shares the group with the agent.
+
+        :param pid: Process pid, the group leader
+        :type pid: int
+        :param signals: The stop sequence, taken from the agent if not set
+        :type signals: list or None
+        :param timeout: Maximum stop time in seconds
+        :type timeout: int or float or None
+        :return: True if no processes of the group are running
+        :rtype: bool
+        """
+        pid = string_to_integer(pid)
+        if not pid:
             return True
-        for i in range(constants.TERM_SIGNAL_RETRY):
-            if not process.is_running():
+        try:
+            pgid = os.getpgid(pid)
+        except OSError:
+            return True
+        if pgid == os.getpgrp():
+            self.agent.log.warning(
+                "Process %d is in the agent's process group. "
+                "Stopping the process tree instead.", pid,
+            )
+            return self.stop_tree(pid, signals, timeout)
+        if signals is None:
+            signals = self.stop_signals
+        if timeout is None:
+            timeout = self.agent.remaining
+        deadline = time.time() + timeout
+        for stage, (name, share) in enumerate(signals):
+            members = self.group_members(pgid)
+            if not members:
                 return True
+            started = time.time()
+            grace = max(0.0, deadline - started)
+            if stage < len(signals) - 1:
+                grace *= share
+            grace = max(grace, constants.STOP_MIN_GRACE)
+            watched = {}
+            for member in members:
+                try:
+                    watched[member] = self.watch(member)
+                except OSError:
+                    continue
             try:
-                process.terminate()
-            except psutil.NoSuchProcess:
+                try:
+                    os.killpg(pgid, self.signal_number(name))
+                except OSError as exception:
+                    if exception.errno != errno.ESRCH:
+                        raise
+                    return True
+                self.wait(watched, grace)
+            finally:
+                for descriptor in watched.values():
+                    if descriptor is not None:
+                        os.close(descriptor)
+            running = bool(watched) or self.group_is_running(pgid)
+            self.agent.log.info(
+                "Process group %d %s after %s in %.3f seconds",
+                pgid, 'is still running' if running else 'exited',
+                name, time.time() - started,
+            )
+            if not running:
                 return True
-            sleep(1)
-        return self.ensure_kill(pid)
+        return not self.group_is_running(pgid)
 
-    def ensure_kill(self, pid):
-        process = self.get(pid)
-        if process is None:
+    def cgroup_members(self):
+        """
+        The pids of all processes in the cgroup of this resource instance.
+
+        :return: List of pids
+        :rtype: list
+        """
+        return self.agent.cgroup.pids
+
+    def cgroup_is_running(self):
+        """
+        Check if the cgroup of this resource instance has any processes.
+
+        :rtype: bool
+        """
+        return self.agent.cgroup.populated
+
+    def stop_cgroup(self, signals=None, timeout=None):
+        """
+        Stop all processes of the cgroup of this resource instance with the
+        stop sequence. The cgroup is read again before every stage, so the
+        processes forked during the stop are stopped too. The remaining
+        processes are killed through the cgroup and the empty cgroup
+        is removed.
+
+        :param signals: The stop sequence, taken from the agent if not set
+        :type signals: list or None
+        :param timeout: Maximum stop time in seconds
+        :type timeout: int or float or None
+        :return: True if no processes of the cgroup are running
+        :rtype: bool
+        """
+        cgroup = self.agent.cgroup
+        if not cgroup.exists:
             return True
-        for i in range(constants.KILL_SIGNAL_RETRY):
-            if not process.is_running():
-                return True
-            try:
-                process.kill()
-            except psutil.NoSuchProcess:
-                return True
-            sleep(1)
-        return False
+        stopped = self.stop_processes(
+            cgroup.pids, signals, timeout,
+            lambda running: cgroup.pids,
+        )
+        if not stopped:
+            cgroup.kill()
+            stopped = self.stop_processes(
+                cgroup.pids, constants.KILL_SIGNALS,
+                constants.STOP_MIN_GRACE,
+            )
+        if stopped:
+            cgroup.remove()
+        return stopped
 
-    @staticmethod
-    def sub(*args, **kwargs):
-        process = psutil.Popen(args, stdout=PIPE, stderr=PIPE, **kwargs)
-        stdout, stderr = process.communicate()
-        process.wait()
-        return {
-            'stdout': stdout,
-            'stderr': stderr,
-            'code': process.returncode,
-            'process': process,
-        }
+    def ensure_terminate(self, pid):
+        """
+        Stop the process using the agent's stop sequence.
 
-    @staticmethod
-    def run(*args, **kwargs):
-        process = psutil.Popen(args, **kwargs)
-        process.communicate()
-        process.wait()
-        return process.returncode
+        :param pid: Process pid
+        :type pid: int
+        :return: True if the process is not running
+        :rtype: bool
+        """
+        return self.stop(pid)
+
+    def ensure_kill(self, pid):
+        """
+        Kill the process and wait for it to exit.
+
+        :param pid: Process pid
+        :type pid: int
+        :return: True if the process is not running
+        :rtype: bool
+        """
+        return self.stop(pid, constants.KILL_SIGNALS)
+
+    @docstring_format(constants.CONST_REQUIRES_BINARIES)
+    def command(self, args, shell=False):
+        """
+        Replace the binary name in the command arguments with its absolute
+        path resolved by the agent's Binaries object so the executable is
+        not searched for again on every spawn. Only the binaries declared
+        by the *{0}* constant are resolved, so other commands never update
+        the binaries cache. Shell commands, other binaries and the ones
+        which cannot be resolved are left unchanged.
+
+        :param args: Command arguments
+        :type args: tuple or list
+        :param shell: The command will be run by the shell
+        :type shell: bool
+        :return: Command arguments
+        :rtype: list
+        """
+        args = list(args)
+        if shell or not args or os.sep in str(args[0]) or \
+                str(args[0]) not in self.agent.binaries.required:
+            return args
+        path = self.agent.binaries.path(str(args[0]))
+        if path is not None:
+            args[0] = path
+        return args
+
+    @docstring_format(
+        constants.CONST_COMMAND_ENVIRONMENT,
+        constants.DEFAULT_COMMAND_ENVIRONMENT,
+        constants.COMMAND_ENVIRONMENT_PREFIXES,
+    )
+    def environment(self, values=None):
+        """
+        The minimal environment of the started commands. Only the variables
+        listed by the *{0}* constant in the Agent class and the ones with
+        the {2} prefixes are passed. The list will default to {1} and can
+        be set to None to pass the whole environment of the agent.
+
+        :param values: Additional variables
+        :type values: dict or None
+        :return: Variable names and values or None to inherit them
+        :rtype: dict or None
+        """
+        names = getattr(
+            self.agent,
+            constants.CONST_COMMAND_ENVIRONMENT,
+            constants.DEFAULT_COMMAND_ENVIRONMENT,
+        )
+        if names is None:
+            if not values:
+                return None
+            environment = dict(os.environ)
+        else:
+            names = set(names)
+            prefixes = tuple(constants.COMMAND_ENVIRONMENT_PREFIXES)
+            environment = dict(
+                (name, value) for name, value in os.environ.items()
+                if name in names or name.startswith(prefixes)
+            )
+            environment.setdefault('PATH', constants.COMMAND_DEFAULT_PATH)
+        environment.update(values or {})
+        return environment
+
+    def use_profile(self, kwargs):
+        """
+        Replace the *profile* argument of the command with the function
+        applying the resource profile in the child process. The profile can
+        be True to use the agent's profile or the profile settings.
+
+        :param kwargs: The command arguments
+        :type kwargs: dict
+        """
+        profile = kwargs.pop('profile', None)
+        if not profile:
+            return
+        apply_profile = self.agent.profile.prepare(
+            None if profile is True else profile
+        )
+        if apply_profile is not None:
+            kwargs['preexec_fn'] = apply_profile
+
+    def spawn(self, args, timeout=None, **kwargs):
+        """
+        Start the command in its own process group with its output read
+        through the pipes. The command is killed if it runs longer than
+        the timeout which will default to the operation's remaining time.
+        Unless the *env* argument is given the command gets only the
+        minimal environment, see 'environment', not the whole environment
+        of the agent.
+
+        :param args: Command arguments
+        :type args: tuple or list
+        :param timeout: Maximum run time in seconds
+        :type timeout: int or float or None
+        :param kwargs: Popen arguments, the *head* and *tail* sizes of the
+        kept output and the *profile* which can be True to apply the agent's
+        resource profile or the profile settings dictionary
+        :return: The started command
+        :rtype: Command
+        """
+        shell = kwargs.pop('shell', False)
+        self.use_profile(kwargs)
+        if 'env' not in kwargs:
+            kwargs['env'] = self.environment()
+        if timeout is None:
+            timeout = self.agent.remaining
+        command = Command(
+            self.command(args, shell),
+            shell=shell,
+            timeout=timeout,
+            **kwargs
+        )
+        try:
+            return command.start()
+        except SPAWN_ERRORS as exception:
+            self.agent.exit.error_generic(
+                "Could not start the command '%s': %s" % (
+                    command.name, exception,
+                )
+            )
+
+    def finish(self, command):
+        """
+        Report the finished command to the debug log and warn if it has
+        been killed by its deadline.
+
+        :param command: The finished command
+        :type command: Command
+        :return: The command's result
+        :rtype: dict
+        """
+        result = command.result
+        if result['cancelled']:
+            self.agent.log.debug(
+                "Command '%s' was cancelled after %.3f seconds",
+                command.name, result['duration'],
+            )
+            return result
+        if result['timeout']:
+            self.agent.log.warning(
+                "Command '%s' was killed after %.1f seconds timeout",
+                command.name, command.timeout,
+            )
+        self.agent.log.debug(
+            "Command '%s' has finished with code %s in %.3f seconds",
+            command.name, result['code'], result['duration'],
+        )
+        return result
+
+    def stream(self, *args, **kwargs):
+        """
+        Run the command and yield its output lines as they arrive without
+        the line endings. Only the standard output is yielded unless the
+        *include_stderr* argument is True. The *stdout* and *stderr*
+        arguments are passed to Popen like by 'spawn'. The command is
+        terminated if the caller stops iterating before it's finished.
+
+        :param args: Command arguments
+        :param kwargs: 'spawn' arguments and the *include_stderr* flag
+        :return: Generator of the output lines
+        :rtype: generator
+        """
+        include_stderr = kwargs.pop('include_stderr', False)
+        command = self.spawn(args, **kwargs)
+        lines = command.lines()
+        try:
+            for stream, line in lines:
+                if stream == 'stdout' or include_stderr:
+                    yield line
+        finally:
+            lines.close()
+            self.finish(command)
+
+    def execute(self, *args, **kwargs):
+        """
+        Run the command and wait for its result. The *callback* function is
+        called with the stream name and every output line. If it returns
+        True the rest of the output is not needed and the command is
+        terminated. The result has the kept output, the exit code, the
+        timeout flag and the run time.
+
+        :param args: Command arguments
+        :param kwargs: 'spawn' arguments and the *callback* function
+        :return: Command result
+        :rtype: dict
+        """
+        callback = kwargs.pop('callback', None)
+        command = self.spawn(args, **kwargs)
+        lines = command.lines()
+        try:
+            for stream, line in lines:
+                if callback is not None and callback(stream, line):
+                    break
+        finally:
+            lines.close()
+        return self.finish(command)
+
+    def match(self, pattern, *args, **kwargs):
+        """
+        Run the command until one of its output lines matches the regular
+        expression. The command is terminated as soon as the line is found.
+
+        :param pattern: Regular expression
+        :type pattern: str
+        :param args: Command arguments
+        :param kwargs: 'stream' arguments
+        :return: The match object or None if no line matched
+        :rtype: re.Match or None
+        """
+        expression = re.compile(pattern)
+        lines = self.stream(*args, **kwargs)
+        try:
+            for line in lines:
+                found = expression.search(line)
+                if found:
+                    return found
+        finally:
+            lines.close()
+        return None
+
+    @property
+    @docstring_format(
+        constants.CONST_COMMAND_PARALLEL,
+        constants.DEFAULT_COMMAND_PARALLEL,
+    )
+    def parallel(self):
+        """
+        The maximum number of concurrently running commands of a batch.
+        Can be set by the *{0}* constant in the Agent class and will
+        default to **{1}**.
+
+        :rtype: int
+        """
+        return int(
+            getattr(
+                self.agent,
+                constants.CONST_COMMAND_PARALLEL,
+                constants.DEFAULT_COMMAND_PARALLEL,
+            )
+        )
+
+    def batch(self, commands, parallel=None, timeout=None, fail_fast=False,
+              **kwargs):
+        """
+        Run several independent commands concurrently and return their
+        results in the submission order. Every command is a list of its
+        arguments or a string run by the shell. All commands share the
+        batch timeout which will default to the operation's remaining time.
+
+        If *fail_fast* is set the first command which cannot be started,
+        times out or exits with a non-zero code cancels the others. The
+        cancelled commands have the *cancelled* flag and the ones which
+        have not been started have no exit code. Every result has its
+        run time in the *duration* field. Like 'spawn' the commands get
+        the minimal environment unless the *env* argument is given.
+
+        :param commands: List of the commands
+        :type commands: list
+        :param parallel: Maximum number of the running commands
+        :type parallel: int or None
+        :param timeout: Maximum run time of the whole batch in seconds
+        :type timeout: int or float or None
+        :param fail_fast: Cancel the other commands if one fails
+        :type fail_fast: bool
+        :param kwargs: Popen arguments of all commands
+        :return: List of the command results
+        :rtype: list
+        """
+        if parallel is None:
+            parallel = self.parallel
+        if timeout is None:
+            timeout = self.agent.remaining
+        self.use_profile(kwargs)
+        kwargs.setdefault('env', self.environment())
+        prepared = []
+        for args in commands:
+            shell = not isinstance(args, (list, tuple))
+            if shell:
+                args = [args]
+            prepared.append(
+                Command(self.command(args, shell), shell=shell, **kwargs)
+            )
+        batch = CommandBatch(prepared, parallel, timeout, fail_fast)
+        batch.run()
+        results = []
+        for command in prepared:
+            if command.error is not None:
+                self.agent.log.warning(
+                    "Command '%s' could not be started: %s",
+                    command.name, command.error,
+                )
+                results.append(command.result)
+            elif command.process is None:
+                results.append(command.result)
+            else:
+                results.append(self.finish(command))
+        self.agent.log.debug(
+            "Batch of %d commands has finished in %.3f seconds%s",
+            len(prepared), batch.finished - batch.started,
+            '' if batch.failed is None else
+            ", cancelled after '%s' failed" % batch.failed.name,
+        )
+        return results
+
+    @docstring_format(constants.CONST_COMMAND_ENVIRONMENT)
+    def sub(self, *args, **kwargs):
+        """
+        Run the command and return its kept output, exit code, timeout flag
+        and run time. See 'execute'. The command gets the minimal
+        environment unless the *env* argument is given or the *{0}*
+        constant in the Agent class is None.
+
+        :param args: Command arguments
+        :param kwargs: 'execute' arguments
+        :return: Command result
+        :rtype: dict
+        """
+        return self.execute(*args, **kwargs)
+
+    @docstring_format(constants.CONST_COMMAND_ENVIRONMENT)
+    def run(self, *args, **kwargs):
+        """
+        Run the command and return its exit code. See 'execute'.
+        The command gets the minimal environment unless the *env* argument
+        is given or the *{0}* constant in the Agent class is None.
+
+        :param args: Command arguments
+        :param kwargs: 'execute' arguments
+        :return: Exit code
+        :rtype: int
+        """
+        return self.execute(*args, **kwargs)['code']
 
     def run_shell(self, command, **kwargs):
         return self.run(command, shell=True, **kwargs)
@@ -102,24 +1184,751 @@ class Process(object):
     def sub_shell(self, command, **kwargs):
         return self.sub(command, shell=True, **kwargs)
 
+    @property
+    @docstring_format(
+        constants.CONST_DAEMON_READINESS,
+        constants.DAEMON_READINESS_TYPES,
+    )
+    def readiness(self):
+        """
+        The default readiness signalling of the started daemons. Can be set
+        by the *{0}* constant in the Agent class to one of: {1}.
+        By default the daemons are not waited for.
+
+        :return: Readiness type
+        :rtype: str or None
+        """
+        return getattr(
+            self.agent,
+            constants.CONST_DAEMON_READINESS,
+            constants.DEFAULT_DAEMON_READINESS,
+        )
+
+    @property
+    @docstring_format(
+        constants.CONST_DAEMON_READY_FD,
+        constants.DEFAULT_DAEMON_READY_FD,
+    )
+    def ready_fd(self):
+        """
+        The descriptor number the daemon writes a newline to when it's
+        ready. Can be set by the *{0}* constant in the Agent class and
+        will default to **{1}**.
+
+        :rtype: int
+        """
+        return int(
+            getattr(
+                self.agent,
+                constants.CONST_DAEMON_READY_FD,
+                constants.DEFAULT_DAEMON_READY_FD,
+            )
+        )
+
+    @property
+    @docstring_format(constants.CONST_DAEMON_OUTPUT)
+    def output(self):
+        """
+        Redirect the output of the started daemons to the output file of
+        this resource instance. It's disabled by default and can be enabled
+        by the *{0}* constant in the Agent class. Otherwise the output is
+        discarded.
+
+        :rtype: bool
+        """
+        return bool(
+            getattr(
+                self.agent,
+                constants.CONST_DAEMON_OUTPUT,
+                constants.DEFAULT_DAEMON_OUTPUT,
+            )
+        )
+
+    @property
+    @docstring_format(
+        constants.CONST_DAEMON_OUTPUT_DIR,
+        constants.DEFAULT_DAEMON_OUTPUT_DIR,
+    )
+    def output_path(self):
+        """
+        The daemon output file of this resource instance. Its directory can
+        be set by the *{0}* constant in the Agent class and will default to
+        **{1}**.
+
+        :return: Output file path
+        :rtype: str
+        """
+        file_name = self.agent.name
+        if self.agent.environment.res_instance is not None:
+            file_name += '-' + self.agent.environment.res_instance
+        return os.path.join(
+            getattr(
+                self.agent,
+                constants.CONST_DAEMON_OUTPUT_DIR,
+                constants.DEFAULT_DAEMON_OUTPUT_DIR,
+            ),
+            file_name + constants.DAEMON_OUTPUT_SUFFIX,
+        )
+
+    @property
+    @docstring_format(
+        constants.CONST_DAEMON_OUTPUT_SIZE,
+        constants.DEFAULT_DAEMON_OUTPUT_SIZE,
+        constants.CONST_DAEMON_OUTPUT_ROTATIONS,
+        constants.DEFAULT_DAEMON_OUTPUT_ROTATIONS,
+    )
+    def output_rotation(self):
+        """
+        The size in bytes the output file is rotated at and the number of
+        rotated files to keep. They can be set by the *{0}* and *{2}*
+        constants in the Agent class and will default to **{1}** and
+        **{3}**.
+
+        :return: The size and the number of files
+        :rtype: tuple
+        """
+        return (
+            int(
+                getattr(
+                    self.agent,
+                    constants.CONST_DAEMON_OUTPUT_SIZE,
+                    constants.DEFAULT_DAEMON_OUTPUT_SIZE,
+                )
+            ),
+            int(
+                getattr(
+                    self.agent,
+                    constants.CONST_DAEMON_OUTPUT_ROTATIONS,
+                    constants.DEFAULT_DAEMON_OUTPUT_ROTATIONS,
+                )
+            ),
+        )
+
+    def rotate_output(self):
+        """
+        Rotate the output file if it's larger than the rotation size.
+        The daemon keeps its descriptor, so the file is copied to the first
+        rotated file and truncated in place. The daemon writes with
+        *O_APPEND* and continues at the new end of the file. The output
+        written between the copy and the truncation is lost. The rotation
+        is skipped if another action of this resource is rotating the file.
+        It's cheap if the file is small and is called by every monitor
+        when the output is enabled.
+
+        :return: True if the file has been rotated
+        :rtype: bool
+        """
+        path = self.output_path
+        size, rotations = self.output_rotation
+        try:
+            if os.path.getsize(path) <= size:
+                return False
+        except OSError:
+            return False
+        self.agent.lock.make_directory()
+        lock = FileLock(
+            self.agent.lock.mutex_path(constants.DAEMON_OUTPUT_LOCK_KEY)
+        )
+        if not lock.acquire(0):
+            return False
+        try:
+            if os.path.getsize(path) <= size:
+                return False
+            for number in range(rotations - 1, 0, -1):
+                rotated = '%s.%d' % (path, number)
+                if os.path.exists(rotated):
+                    os.rename(rotated, '%s.%d' % (path, number + 1))
+            if rotations > 0:
+                shutil.copyfile(path, path + '.1')
+            with open(path, 'r+b') as output_file:
+                output_file.truncate(0)
+        except (IOError, OSError) as exception:
+            self.agent.log.warning(
+                "Could not rotate the output file '%s': %s", path, exception
+            )
+            return False
+        finally:
+            lock.release()
+        self.agent.log.info("Output file '%s' has been rotated", path)
+        return True
+
+    def open_output(self):
+        """
+        Open the output file for appending. It's rotated first if it's too
+        large.
+
+        :return: The file and its size before the daemon writes to it
+        :rtype: tuple
+        """
+        path = self.output_path
+        self.rotate_output()
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        descriptor = os.open(
+            path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o640,
+        )
+        output_file = os.fdopen(descriptor, 'ab')
+        return output_file, os.fstat(descriptor).st_size
+
+    def output_tail(self, start=0):
+        """
+        Read the end of the output file but not before the start offset.
+        Only the tail of the file is read however large it is.
+
+        :param start: The offset the daemon started writing at
+        :type start: int
+        :return: The last lines of the output
+        :rtype: str
+        """
+        try:
+            with open(self.output_path, 'rb') as output_file:
+                return self.stderr_tail(output_file, start)
+        except (IOError, OSError):
+            return ''
+
     @staticmethod
-    def daemonize(*args, **kwargs):
-        """
-        :param args:
-        :param kwargs:
-        :return:
-        """
-        # TODO: need to fork twice to prevent children from becoming zombies
-        process = psutil.Popen(
-            args,
-            shell=False,
-            stdin=None,
-            stdout=None,
-            stderr=None,
-            close_fds=True,
-            cwd='/',
-            **kwargs
+    def notify_socket():
+        """
+        Create the datagram socket the daemon sends its notifications to.
+        It's bound in a new private directory.
+
+        :return: The bound socket
+        :rtype: socket.socket
+        """
+        directory = tempfile.mkdtemp(prefix=constants.DAEMON_NOTIFY_PREFIX)
+        path = os.path.join(directory, constants.DAEMON_NOTIFY_SOCKET)
+        notify = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            notify.bind(path)
+        except socket.error:
+            notify.close()
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+        return notify
+
+    @staticmethod
+    def close_notify_socket(notify):
+        """
+        Close the notification socket and remove its directory.
+
+        :param notify: The bound socket
+        :type notify: socket.socket
+        """
+        path = notify.getsockname()
+        notify.close()
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+    @staticmethod
+    def parse_notification(message):
+        """
+        Parse the sd_notify message. It's a list of the *KEY=VALUE* lines.
+
+        :param message: The received datagram
+        :type message: bytes
+        :return: Keys and values
+        :rtype: dict
+        """
+        fields = {}
+        for line in message.decode('utf-8', 'replace').splitlines():
+            key, separator, value = line.partition('=')
+            if separator:
+                fields[key.strip()] = value
+        return fields
+
+    def notified(self, notify, state):
+        """
+        Read all pending notifications from the socket. *READY=1* marks the
+        daemon ready, *MAINPID* replaces the recorded pid and *STATUS* is
+        logged.
+
+        :param notify: The bound socket
+        :type notify: socket.socket
+        :param state: The readiness state to update
+        :type state: dict
+        """
+        while True:
+            try:
+                message = notify.recv(constants.DAEMON_MESSAGE_SIZE)
+            except socket.error:
+                return
+            fields = self.parse_notification(message)
+            if 'STATUS' in fields:
+                self.agent.log.debug("Daemon status: %s", fields['STATUS'])
+            main_pid = string_to_integer(fields.get('MAINPID'))
+            if main_pid:
+                state['pid'] = main_pid
+            if fields.get('READY') == '1':
+                state['ready'] = True
+
+    @staticmethod
+    def startup_stderr():
+        """
+        Open the anonymous file capturing the error output of the daemon
+        during its startup. It's opened for appending so the daemon keeps
+        writing at the end after the file has been truncated.
+
+        :return: The capture file
+        :rtype: file
+        """
+        descriptor, path = tempfile.mkstemp(
+            prefix=constants.DAEMON_STDERR_PREFIX,
+        )
+        os.unlink(path)
+        flags = fcntl.fcntl(descriptor, fcntl.F_GETFL)
+        fcntl.fcntl(descriptor, fcntl.F_SETFL, flags | os.O_APPEND)
+        return os.fdopen(descriptor, 'w+b')
+
+    @staticmethod
+    def stderr_tail(stderr, start=0):
+        """
+        Read the end of the daemon's captured error output. If the file is
+        shorter than the start offset it has been truncated and is read
+        from the beginning.
+
+        :param stderr: The captured error output file
+        :type stderr: file or None
+        :param start: The offset the daemon started writing at
+        :type start: int
+        :return: The last lines of the output
+        :rtype: str
+        """
+        if stderr is None:
+            return ''
+        try:
+            stderr.seek(0, os.SEEK_END)
+            end = stderr.tell()
+            if end < start:
+                start = 0
+            stderr.seek(max(start, end - constants.DAEMON_STDERR_TAIL))
+            return stderr.read().decode('utf-8', 'replace').strip()
+        except (IOError, OSError, ValueError):
+            return ''
+
+    def wait_ready(self, process, timeout, notify=None, descriptor=None,
+                   probe=None):
+        """
+        Wait for the started daemon to become ready. The notification
+        socket, the readiness descriptor and the pid file descriptor of the
+        daemon are polled together so the wait ends as soon as the daemon
+        is ready or has exited. The probe is called with the process with
+        a growing interval until it returns True.
+
+        :param process: The started process
+        :type process: subprocess.Popen
+        :param timeout: Maximum wait time in seconds
+        :type timeout: int or float
+        :param notify: The notification socket
+        :type notify: socket.socket or None
+        :param descriptor: The read end of the readiness pipe
+        :type descriptor: int or None
+        :param probe: Readiness check function
+        :type probe: func or None
+        :return: Ready flag and the main pid of the daemon
+        :rtype: dict
+        """
+        state = {'ready': False, 'pid': process.pid}
+        deadline = time.time() + timeout
+        poller = select.poll()
+        watched = self.watch(process.pid)
+        if watched is not None:
+            poller.register(watched, select.POLLIN)
+        if notify is not None:
+            notify.setblocking(False)
+            poller.register(notify.fileno(), select.POLLIN)
+        if descriptor is not None:
+            poller.register(descriptor, select.POLLIN)
+        interval = constants.DAEMON_POLL_MIN_INTERVAL
+        try:
+            while True:
+                if probe is not None and probe(process):
+                    state['ready'] = True
+                if state['ready'] or process.poll() is not None:
+                    return state
+                left = deadline - time.time()
+                if left <= 0:
+                    return state
+                if probe is not None or watched is None:
+                    left = min(left, interval)
+                    interval = min(
+                        interval * 2, constants.DAEMON_POLL_MAX_INTERVAL
+                    )
+                for event_descriptor, event in poller.poll(
+                        int(left * 1000) + 1):
+                    if notify is not None and \
+                            event_descriptor == notify.fileno():
+                        self.notified(notify, state)
+                    elif event_descriptor == descriptor:
+                        data = os.read(descriptor, 1)
+                        if data == b'\n':
+                            state['ready'] = True
+                        elif not data:
+                            poller.unregister(descriptor)
+        finally:
+            if watched is not None:
+                os.close(watched)
+
+    def daemonize(self, *args, **kwargs):
+        """
+        Start the command in the background as a daemon. It's started in its
+        own session and process group, so it's detached from the cluster
+        manager and the whole group can be stopped by the 'stop_group'
+        method, with the standard input redirected to /dev/null and with
+        the minimal environment unless the *env* argument is given. Unless
+        the *stdout* and *stderr* arguments are given both outputs are
+        appended to the rotated output file of this resource instance if
+        the *output* argument or the agent's 'output' default is True.
+        Otherwise, or if the output file cannot be opened, they are
+        redirected to /dev/null, except for the error output of a daemon
+        which is waited for. It goes to an anonymous temporary file which
+        is truncated when the daemon becomes ready and stays open by the
+        daemon, so the daemons writing much to the error output should
+        use the output file.
+
+        The readiness of the daemon can be signalled by the *ready* argument
+        or by the agent's 'readiness' default:
+
+        * **notify** - the daemon sends *READY=1* to the socket in the
+          *NOTIFY_SOCKET* variable like to systemd
+        * **fd** - the daemon writes a newline to the inherited descriptor
+          'ready_fd' or the number in the *ready_fd* argument
+        * a function - the probe called with the process until it
+          returns True
+
+        The method returns as soon as the daemon is ready. If the daemon
+        exits during the startup the agent fails immediately with its exit
+        code and the end of its error output. If it does not become ready
+        in the *timeout* or the operation's remaining time it's stopped and
+        the agent fails too. Only the output written during this startup
+        is reported.
+
+        The *pid_file* argument can be True or the pid file key to write
+        the daemon's pid record when it has started. With the *cgroup*
+        argument or if the agent's cgroup is enabled the daemon is started
+        in the cgroup of this resource instance. The agent's resource
+        profile is applied to the daemon unless the *profile* argument is
+        False or is another profile settings dictionary.
+
+        :param args: Command arguments
+        :param kwargs: Popen arguments and the *session*, *ready*,
+        *ready_fd*, *timeout*, *pid_file*, *cgroup*, *profile* and *output*
+        options
+        :return: The started process with the *main_pid* attribute
+        :rtype: subprocess.Popen
+        """
+        session = kwargs.pop('session', True)
+        ready = kwargs.pop('ready', self.readiness)
+        ready_fd = kwargs.pop('ready_fd', self.ready_fd)
+        timeout = kwargs.pop('timeout', None)
+        pid_file = kwargs.pop('pid_file', None)
+        cgroup = kwargs.pop('cgroup', self.agent.cgroup.enabled)
+        profile = kwargs.pop('profile', True)
+        output = kwargs.pop('output', self.output)
+        if timeout is None:
+            timeout = self.agent.remaining
+        if ready is not None and not callable(ready) and \
+                ready not in constants.DAEMON_READINESS_TYPES:
+            self.agent.exit.error_configuration(
+                "Unknown daemon readiness: %s" % ready
+            )
+
+        handles = []
+        output_file = None
+        output_start = 0
+        stderr = None
+        if output:
+            try:
+                output_file, output_start = self.open_output()
+            except (IOError, OSError) as exception:
+                self.agent.log.warning(
+                    "Could not open the output file '%s', "
+                    "the output is discarded: %s",
+                    self.output_path, exception,
+                )
+        if output_file is not None:
+            handles.append(output_file)
+            kwargs.setdefault('stdout', output_file)
+            kwargs.setdefault('stderr', output_file)
+        elif ready is not None and 'stderr' not in kwargs:
+            stderr = self.startup_stderr()
+            handles.append(stderr)
+            kwargs['stderr'] = stderr
+        for name, mode in (
+                ('stdin', 'rb'), ('stdout', 'wb'), ('stderr', 'wb')):
+            if name not in kwargs:
+                kwargs[name] = open(os.devnull, mode)
+                handles.append(kwargs[name])
+        kwargs.setdefault('cwd', '/')
+
+        apply_profile = None
+        if profile:
+            apply_profile = self.agent.profile.prepare(
+                None if profile is True else profile
+            )
+
+        procs = None
+        if cgroup:
+            try:
+                self.agent.cgroup.create()
+            except (IOError, OSError) as exception:
+                self.agent.exit.error_configuration(
+                    "Could not create the cgroup '%s': %s" % (
+                        self.agent.cgroup.path, exception,
+                    )
+                )
+            procs = self.agent.cgroup.file_path('cgroup.procs')
+
+        notify = None
+        descriptor = None
+        writer = None
+        if ready == 'notify':
+            notify = self.notify_socket()
+            variables = {
+                constants.DAEMON_NOTIFY_VARIABLE: notify.getsockname(),
+            }
+            if kwargs.get('env') is None:
+                kwargs['env'] = self.environment(variables)
+            else:
+                kwargs['env'] = dict(kwargs['env'], **variables)
+        elif ready == 'fd':
+            descriptor, writer = os.pipe()
+            if PASS_FDS_ARGUMENT:
+                # the kept descriptors must be open in the agent, so the
+                # writer takes the readiness descriptor number if it's free
+                numbered = fcntl.fcntl(writer, fcntl.F_DUPFD, ready_fd)
+                if numbered == ready_fd:
+                    os.close(writer)
+                    writer = numbered
+                else:
+                    os.close(numbered)
+                kwargs['pass_fds'] = \
+                    tuple(kwargs.get('pass_fds', ())) + (ready_fd,)
+            elif writer == ready_fd:
+                # Python 2 closes the descriptors before the preexec
+                # function, so the writer must not take the readiness number
+                numbered = writer
+                writer = os.dup(numbered)
+                os.close(numbered)
+        duplicate = writer is not None and writer != ready_fd
+        if 'env' not in kwargs:
+            kwargs['env'] = self.environment()
+        setsid = session and not NEW_SESSION_ARGUMENT
+        if session and NEW_SESSION_ARGUMENT:
+            kwargs['start_new_session'] = True
+
+        def prepare():
+            if setsid:
+                os.setsid()
+            if procs is not None:
+                procs_descriptor = os.open(
+                    procs, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644,
+                )
+                try:
+                    os.write(
+                        procs_descriptor,
+                        ('%d\n' % os.getpid()).encode('ascii'),
+                    )
+                finally:
+                    os.close(procs_descriptor)
+            if duplicate:
+                os.dup2(writer, ready_fd)
+            if apply_profile is not None:
+                apply_profile()
+
+        # the daemon must not inherit the lock and state files of the agent
+        kwargs.setdefault('close_fds', True)
+        # without the preexec function Popen starts the daemon by vfork
+        if setsid or procs is not None or duplicate or \
+                apply_profile is not None:
+            kwargs['preexec_fn'] = prepare
+        spawned = time.time()
+        try:
+            try:
+                process = subprocess.Popen(
+                    self.command(args),
+                    shell=False,
+                    **kwargs
+                )
+            except SPAWN_ERRORS as exception:
+                self.agent.exit.error_generic(
+                    "Could not start the daemon '%s': %s" % (
+                        args[0], exception,
+                    )
+                )
+            if writer is not None:
+                os.close(writer)
+                writer = None
+            if ready is None:
+                state = {'ready': True, 'pid': process.pid}
+            else:
+                state = self.wait_ready(
+                    process,
+                    timeout,
+                    notify=notify,
+                    descriptor=descriptor,
+                    probe=ready if callable(ready) else None,
+                )
+            if not state['ready']:
+                code = process.poll()
+                if code is None:
+                    self.stop_group(process.pid)
+                    self.agent.exit.error_generic(
+                        "Daemon '%s' has not become ready in %.1f seconds" % (
+                            args[0], timeout,
+                        )
+                    )
+                if code < 0:
+                    reason = 'was killed by signal %d' % -code
+                else:
+                    reason = 'exited with code %d' % code
+                message = "Daemon '%s' %s during the startup" % (
+                    args[0], reason,
+                )
+                if output_file is not None and \
+                        kwargs['stderr'] is output_file:
+                    message += ': ' + self.output_tail(output_start)
+                elif stderr is not None:
+                    message += ': ' + self.stderr_tail(stderr)
+                self.agent.exit.error_generic(message)
+            if stderr is not None:
+                try:
+                    stderr.truncate(0)
+                except (IOError, OSError):
+                    pass
+        finally:
+            for handle in handles:
+                handle.close()
+            if notify is not None:
+                self.close_notify_socket(notify)
+            for pipe_descriptor in (descriptor, writer):
+                if pipe_descriptor is not None:
+                    os.close(pipe_descriptor)
+
+        process.main_pid = state['pid']
+        self.agent.log.debug(
+            "Daemon '%s' has started with pid: %d in %.3f seconds",
+            args[0], process.main_pid, time.time() - spawned,
         )
+        if pid_file is not None:
+            key = None if pid_file is True else pid_file
+            self.agent.pid.create_file(process.main_pid, key)
         return process
 
-# TODO: a method to kill a process and all of its children
+
+class ProcessSnapshot(object):
+    """
+    The ProcessSnapshot object is the table of the processes running at
+    the moment it was taken. It's indexed by pid, parent pid and name so
+    the repeated questions about the processes do not scan them again.
+    """
+
+    def __init__(self, entries, taken):
+        """
+        :param entries: Process attribute dictionaries
+        :type entries: list
+        :param taken: The time the snapshot was taken
+        :type taken: float
+        """
+        self.entries = entries
+        self.time = taken
+        self.pids = {}
+        self.names = {}
+        self.parents = {}
+        for entry in entries:
+            self.pids[entry['pid']] = entry
+            self.names.setdefault(entry.get('name'), []).append(entry)
+            self.parents.setdefault(entry.get('ppid'), []).append(entry)
+
+    @property
+    def age(self):
+        """
+        The number of seconds since the snapshot was taken.
+
+        :rtype: float
+        """
+        return time.time() - self.time
+
+    def get(self, pid):
+        """
+        Get the process entry by its pid.
+
+        :param pid: Process pid
+        :type pid: int
+        :return: Attribute dictionary or None if not found
+        :rtype: dict or None
+        """
+        return self.pids.get(string_to_integer(pid))
+
+    __getitem__ = get
+
+    def is_running(self, pid):
+        """
+        Check if the process was running when the snapshot was taken.
+        Zombies and dead processes are not running.
+
+        :param pid: Process pid
+        :type pid: int
+        :rtype: bool
+        """
+        entry = self.get(pid)
+        return entry is not None and \
+            entry.get('status') not in constants.PROCESS_DEAD_STATUSES
+
+    __contains__ = is_running
+
+    def children(self, pid):
+        """
+        The entries of the process children.
+
+        :param pid: Process pid
+        :type pid: int
+        :return: List of attribute dictionaries
+        :rtype: list
+        """
+        return list(self.parents.get(string_to_integer(pid), []))
+
+    def descendants(self, pid):
+        """
+        The entries of the process children and their children.
+
+        :param pid: Process pid
+        :type pid: int
+        :return: List of attribute dictionaries
+        :rtype: list
+        """
+        found = []
+        queue = self.children(pid)
+        while queue:
+            entry = queue.pop(0)
+            found.append(entry)
+            queue.extend(self.children(entry['pid']))
+        return found
+
+    def search(self, name=None, exe=None, cmdline=None,
+               uid=None, ppid=None, prefix=False):
+        """
+        Find the processes matching all criteria of the 'Process.search'
+        method. The exact name and parent pid are looked up by the index.
+
+        :return: Generator of attribute dictionaries
+        :rtype: generator
+        """
+        patterns = Process.patterns(name, exe, cmdline)
+        if isinstance(name, str) and not prefix:
+            candidates = self.names.get(name, [])
+        elif ppid is not None:
+            candidates = self.parents.get(ppid, [])
+        else:
+            candidates = self.entries
+        return Process.select(candidates, patterns, uid, ppid, prefix)
+
+    def find_first(self, **criteria):
+        """
+        Find the first process matching the criteria of the 'search' method.
+
+        :return: Attribute dictionary or None if not found
+        :rtype: dict or None
+        """
+        for entry in self.search(**criteria):
+            return entry
+        return None
@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+
+import os
+import platform
+import resource
+from ocf_agent import constants
+from ocf_agent.helpers import docstring_format
+
+
+class Profile(object):
+    """
+    The Profile object describes the resources of the processes started by
+    the agent: the CPU affinity, the nice value, the I/O scheduling class
+    and level, the resource limits and the OOM score adjustment. The
+    profile is parsed and checked in the agent and is applied in the
+    started child process just before the command is executed, so no
+    wrapper commands like *taskset* or *nice* are needed.
+    """
+
+    def __init__(self, agent):
+        """
+        The Profile object should have the Agent object as the first argument.
+
+        :param agent: The parent Agent
+        :type agent: Agent
+        """
+        self.agent = agent
+
+    @property
+    def names(self):
+        """
+        The names of all profile settings.
+
+        :return: List of setting names
+        :rtype: list
+        """
+        return constants.PROFILE_FIELDS + [
+            constants.PROFILE_RLIMIT_PREFIX + name
+            for name in constants.PROFILE_RLIMITS
+        ]
+
+    @property
+    @docstring_format(
+        constants.CONST_RESOURCE_PROFILE,
+        constants.PROFILE_FIELDS,
+        constants.PROFILE_RLIMIT_PREFIX,
+        constants.PROFILE_RLIMITS,
+    )
+    def settings(self):
+        """
+        The profile settings of the agent. They are set by the *{0}*
+        dictionary constant in the Agent class and by the agent parameters
+        with the same names, the parameters take precedence. The names are:
+        {1} and the resource limits with the *{2}* prefix: {3}.
+
+        :return: Setting names and their values
+        :rtype: dict
+        """
+        settings = dict(
+            getattr(self.agent, constants.CONST_RESOURCE_PROFILE, None) or {}
+        )
+        for name in self.names:
+            value = self.agent.parameters.value(name)
+            if value is not None and value != '':
+                settings[name] = value
+        return settings
+
+    @staticmethod
+    def parse_cpus(value):
+        """
+        Parse the CPU list like *0-3,8*.
+
+        :param value: CPU list or a list of CPU numbers
+        :type value: str or list
+        :return: Set of CPU numbers
+        :rtype: set
+        """
+        if not isinstance(value, str):
+            return set(int(cpu) for cpu in value)
+        cpus = set()
+        for part in value.split(','):
+            part = part.strip()
+            if not part:
+                continue
+            first, _, last = part.partition('-')
+            cpus.update(range(int(first), int(last or first) + 1))
+        if not cpus:
+            raise ValueError('empty CPU list')
+        return cpus
+
+    @staticmethod
+    def parse_integer(name, value, limits):
+        """
+        Parse the integer setting and check its range.
+
+        :param name: Setting name
+        :type name: str
+        :param value: Setting value
+        :type value: str or int
+        :param limits: The minimum and maximum values
+        :type limits: tuple
+        :return: The value
+        :rtype: int
+        """
+        value = int(value)
+        if not limits[0] <= value <= limits[1]:
+            raise ValueError(
+                '%s should be from %d to %d' % (name, limits[0], limits[1])
+            )
+        return value
+
+    @staticmethod
+    def parse_rlimit(name, value):
+        """
+        Parse the resource limit. It's a number, *unlimited* or the soft
+        and hard limits separated by a colon. If only the soft limit is
+        given the current hard limit is kept unless it's lower.
+
+        :param name: Limit name
+        :type name: str
+        :param value: Limit value
+        :type value: str or int
+        :return: The resource number and the soft and hard limits
+        :rtype: tuple
+        """
+        number = getattr(resource, 'RLIMIT_' + name.upper())
+
+        def convert(limit):
+            if str(limit).strip().lower() in ('unlimited', 'infinity'):
+                return resource.RLIM_INFINITY
+            limit = int(limit)
+            if limit < 0:
+                raise ValueError('limit %s cannot be negative' % name)
+            return limit
+
+        soft, separator, hard = str(value).partition(':')
+        soft = convert(soft)
+        if separator:
+            hard = convert(hard)
+        else:
+            hard = resource.getrlimit(number)[1]
+            if hard != resource.RLIM_INFINITY and \
+                    (soft == resource.RLIM_INFINITY or soft > hard):
+                hard = soft
+        if hard != resource.RLIM_INFINITY and \
+                (soft == resource.RLIM_INFINITY or soft > hard):
+            raise ValueError('soft limit %s is above the hard limit' % name)
+        return number, soft, hard
+
+    def parse(self, settings=None):
+        """
+        Parse the profile settings. Settings which are not set are not
+        changed in the child process.
+
+        :param settings: Setting names and values or the agent's settings
+        :type settings: dict or None
+        :return: The parsed profile
+        :rtype: dict
+        :raises ValueError: If any setting is not correct
+        """
+        if settings is None:
+            settings = self.settings
+        unknown = sorted(set(settings) - set(self.names))
+        if unknown:
+            raise ValueError('unknown settings: %s' % ', '.join(unknown))
+        profile = {}
+        try:
+            if settings.get('cpu_affinity') is not None:
+                profile['cpu_affinity'] = self.parse_cpus(
+                    settings['cpu_affinity']
+                )
+            if settings.get('nice') is not None:
+                profile['nice'] = self.parse_integer(
+                    'nice', settings['nice'], constants.NICE_RANGE,
+                )
+            if settings.get('oom_score_adj') is not None:
+                profile['oom_score_adj'] = self.parse_integer(
+                    'oom_score_adj', settings['oom_score_adj'],
+                    constants.OOM_SCORE_ADJ_RANGE,
+                )
+            if settings.get('ionice_class') is not None or \
+                    settings.get('ionice_level') is not None:
+                io_class = str(
+                    settings.get('ionice_class') or 'best-effort'
+                ).lower()
+                if io_class not in constants.IONICE_CLASSES:
+                    raise ValueError(
+                        'ionice_class should be one of: %s' % ', '.join(
+                            sorted(constants.IONICE_CLASSES)
+                        )
+                    )
+                level = settings.get('ionice_level')
+                if io_class == 'none':
+                    # the kernel accepts no level for the class none
+                    if level is not None and int(level) != 0:
+                        raise ValueError(
+                            'ionice_level cannot be set for the class none'
+                        )
+                    level = 0
+                elif level is None:
+                    level = constants.DEFAULT_IONICE_LEVEL
+                level = self.parse_integer(
+                    'ionice_level', level, constants.IONICE_LEVEL_RANGE,
+                )
+                profile['ionice'] = (
+                    constants.IONICE_CLASSES[io_class] <<
+                    constants.IOPRIO_CLASS_SHIFT
+                ) | level
+            for name in constants.PROFILE_RLIMITS:
+                value = settings.get(constants.PROFILE_RLIMIT_PREFIX + name)
+                if value is not None:
+                    profile.setdefault('rlimits', []).append(
+                        self.parse_rlimit(name, value)
+                    )
+        except (TypeError, ValueError) as exception:
+            raise ValueError(str(exception))
+        return profile
+
+    def check(self, profile):
+        """
+        Check that the parsed profile can be applied on this system.
+
+        :param profile: The parsed profile
+        :type profile: dict
+        :raises ValueError: If the profile cannot be applied
+        """
+        if 'cpu_affinity' in profile:
+            if not hasattr(os, 'sched_setaffinity'):
+                raise ValueError('CPU affinity is not supported')
+            missing = profile['cpu_affinity'] - os.sched_getaffinity(0)
+            if missing:
+                raise ValueError('CPUs are not available: %s' % ', '.join(
+                    str(cpu) for cpu in sorted(missing)
+                ))
+        if 'nice' in profile and not hasattr(os, 'setpriority'):
+            raise ValueError('nice is not supported')
+        if 'ionice' in profile and self.ioprio_set is None:
+            raise ValueError(
+                'ionice is not supported on %s' % platform.machine()
+            )
+        if 'oom_score_adj' in profile and \
+                not os.path.isfile(constants.OOM_SCORE_ADJ_FILE):
+            raise ValueError('oom_score_adj is not supported')
+
+    @property
+    def ioprio_set(self):
+        """
+        The *ioprio_set* system call function of the C library.
+
+        :return: The function or None if it's not available
+        :rtype: func or None
+        """
+        number = constants.IOPRIO_SET_SYSCALLS.get(platform.machine())
+        if number is None:
+            return None
+        try:
+            import ctypes
+            import ctypes.util
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        except (ImportError, OSError):
+            return None
+
+        def ioprio_set(value):
+            if libc.syscall(number, constants.IOPRIO_WHO_PROCESS, 0, value):
+                error = ctypes.get_errno()
+                raise OSError(error, os.strerror(error))
+
+        return ioprio_set
+
+    def validate(self):
+        """
+        Check the agent's profile during the actions which start the
+        services. The agent will exit with the configuration error if
+        the profile is not correct.
+        """
+        if self.agent.action not in constants.PROFILE_VALIDATE_ACTIONS:
+            return
+        try:
+            self.check(self.parse())
+        except ValueError as exception:
+            self.agent.exit.error_configuration(
+                'Resource profile is not correct: %s' % exception
+            )
+
+    def prepare(self, settings=None):
+        """
+        Parse the profile and make the function which applies it in the
+        child process before the command is executed. The limits are set
+        first and the priorities and affinity last.
+
+        :param settings: Setting names and values or the agent's settings
+        :type settings: dict or None
+        :return: The function or None if the profile is empty
+        :rtype: func or None
+        """
+        try:
+            profile = self.parse(settings)
+            self.check(profile)
+        except ValueError as exception:
+            self.agent.exit.error_configuration(
+                'Resource profile is not correct: %s' % exception
+            )
+        if not profile:
+            return None
+        ioprio_set = self.ioprio_set if 'ionice' in profile else None
+
+        def apply_profile():
+            for number, soft, hard in profile.get('rlimits', []):
+                resource.setrlimit(number, (soft, hard))
+            if 'oom_score_adj' in profile:
+                descriptor = os.open(
+                    constants.OOM_SCORE_ADJ_FILE, os.O_WRONLY,
+                )
+                try:
+                    os.write(
+                        descriptor,
+                        ('%d' % profile['oom_score_adj']).encode('ascii'),
+                    )
+                finally:
+                    os.close(descriptor)
+            if ioprio_set is not None:
+                ioprio_set(profile['ionice'])
+            if 'nice' in profile:
+                os.setpriority(os.PRIO_PROCESS, 0, profile['nice'])
+            if 'cpu_affinity' in profile:
+                os.sched_setaffinity(0, profile['cpu_affinity'])
+
+        return apply_profile
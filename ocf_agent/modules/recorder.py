@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import sys
+import time
+from ocf_agent import constants
+from ocf_agent.helpers import docstring_format
+
+
+class Recorder(object):
+    """
+    The Recorder object can save every agent invocation with its action,
+    arguments, cluster environment, exit code and duration to a log file.
+    The recorded invocations can be replayed later by the
+    *ocf_agent.replay* tool.
+    """
+
+    def __init__(self, agent):
+        """
+        The Recorder object should have the Agent object as the first argument.
+
+        :param agent: The parent Agent
+        :type agent: Agent
+        """
+        self.agent = agent
+        self.started = None
+
+    @property
+    @docstring_format(constants.OCF_VAR_RECORD)
+    def path(self):
+        """
+        The path to the record log file. Recording is enabled by setting
+        the *{0}* environment variable to the log file path.
+
+        :return: Record file path
+        :rtype: str or None
+        """
+        return os.getenv(constants.OCF_VAR_RECORD, None)
+
+    @property
+    def enabled(self):
+        """
+        Check if the invocations should be recorded.
+
+        :rtype: bool
+        """
+        return bool(self.path)
+
+    @property
+    def environment(self):
+        """
+        The cluster environment variables of this invocation without the
+        recorder's own variable.
+
+        :return: Environment variables and their values
+        :rtype: dict
+        """
+        environment = dict(self.agent.environment.environment)
+        environment.pop(constants.OCF_VAR_RECORD, None)
+        return environment
+
+    def start(self):
+        """
+        Remember the invocation start time.
+        """
+        if self.started is None:
+            self.started = self.agent.started
+
+    def entry(self, code):
+        """
+        Assemble the record of this invocation.
+
+        :param code: The exit code
+        :type code: int
+        :return: Record structure
+        :rtype: dict
+        """
+        now = time.time()
+        if self.started is None:
+            self.started = now
+        return {
+            'time': round(self.started, 3),
+            'agent': self.agent.name,
+            'action': self.agent.action,
+            'argv': list(sys.argv),
+            'env': self.environment,
+            'code': code,
+            'duration': round(now - self.started, 6),
+        }
+
+    def record(self, code):
+        """
+        Append the record of this invocation to the log file as a single
+        JSON line. Recording failures are ignored, they should never
+        change the result of the action.
+
+        :param code: The exit code
+        :type code: int
+        """
+        if not self.enabled:
+            return
+        if code is None:
+            code = constants.OCF_SUCCESS
+        line = json.dumps(
+            self.entry(code),
+            separators=(',', ':'),
+            sort_keys=True,
+        ) + '\n'
+        try:
+            descriptor = os.open(
+                self.path,
+                os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+                0o600,
+            )
+            try:
+                os.write(descriptor, line.encode('utf-8'))
+            finally:
+                os.close(descriptor)
+        except OSError as exception:
+            self.agent.log.debug(
+                "Could not record the invocation: %s", exception
+            )
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+
+import errno
+import fcntl
+import os
+import time
+from contextlib import contextmanager
+from ocf_agent import constants
+from ocf_agent.helpers import atomic_write
+from ocf_agent.helpers import docstring_format
+from ocf_agent.modules.lock import FileLock
+
+
+class Semaphore(object):
+    """
+    The Semaphore object is a node-wide counting semaphore shared by all
+    resources of the same concurrency class. Every waiter takes a numbered
+    ticket file in the class directory and holds its lock while waiting and
+    running. Waiters are admitted in the ticket order when there are fewer
+    live tickets before them than the class limit so they are served fairly.
+    Tickets of the dead processes are unlocked and are removed by the others.
+    """
+
+    def __init__(self, agent):
+        """
+        The Semaphore object should have the Agent object as the first
+        argument.
+
+        :param agent: The parent Agent
+        :type agent: Agent
+        """
+        self.agent = agent
+
+    def directory(self, name):
+        """
+        The directory of the concurrency class. It's placed to the Lock
+        directory and is shared by all agents on the node.
+
+        :param name: Concurrency class name
+        :type name: str
+        :return: Directory path
+        :rtype: str
+        """
+        return os.path.join(
+            self.agent.lock.directory,
+            constants.SEMAPHORE_DIR_PREFIX + name,
+        )
+
+    @docstring_format(
+        constants.CONST_CONCURRENCY_LIMITS,
+        constants.DEFAULT_CONCURRENCY_LIMIT,
+    )
+    def limit(self, name):
+        """
+        The number of processes of the concurrency class which can run at
+        the same time. Limits can be set by the *{0}* dictionary in the Agent
+        class and will default to **{1}**.
+
+        :param name: Concurrency class name
+        :type name: str
+        :return: The class limit
+        :rtype: int
+        """
+        limits = getattr(self.agent, constants.CONST_CONCURRENCY_LIMITS, {})
+        return max(
+            1,
+            int(limits.get(name, constants.DEFAULT_CONCURRENCY_LIMIT)),
+        )
+
+    def take_ticket(self, name, timeout=None):
+        """
+        Take the next ticket of the concurrency class. The ticket file is
+        locked before it's renamed to its final name so a visible ticket is
+        either locked by a live process or belongs to a dead one. If the
+        ticket cannot be locked or renamed its temporary file is not left
+        behind.
+
+        :param name: Concurrency class name
+        :type name: str
+        :param timeout: Maximum wait time for the counter in seconds
+        :type timeout: int or float or None
+        :return: The locked ticket or None if the counter or the ticket
+        was not locked
+        :rtype: FileLock or None
+        """
+        directory = self.directory(name)
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                if not os.path.isdir(directory):
+                    raise
+        mutex = FileLock(
+            os.path.join(directory, constants.SEMAPHORE_MUTEX_FILE)
+        )
+        if not mutex.acquire(timeout):
+            return None
+        try:
+            counter_path = os.path.join(
+                directory,
+                constants.SEMAPHORE_COUNTER_FILE,
+            )
+            try:
+                with open(counter_path, 'r') as counter_file:
+                    number = int(counter_file.read().strip()) + 1
+            except (IOError, OSError, ValueError):
+                number = 1
+            atomic_write(counter_path, str(number), mode=0o644)
+            path = os.path.join(
+                directory,
+                '%020d-%d%s' % (
+                    number, os.getpid(), constants.SEMAPHORE_TICKET_SUFFIX,
+                ),
+            )
+            ticket = FileLock(path + constants.SEMAPHORE_TEMP_SUFFIX)
+            if not ticket.acquire(0):
+                return None
+            try:
+                os.rename(ticket.path, path)
+            except BaseException:
+                self.release(ticket)
+                raise
+            ticket.path = path
+        finally:
+            mutex.release()
+        return ticket
+
+    @staticmethod
+    def is_alive(path):
+        """
+        Check if the ticket is still locked by its owner. The ticket is
+        opened read-only so it's never recreated. A missing ticket is dead
+        and an unlocked one is removed. The ticket which cannot be checked
+        is considered alive so its owner is not skipped.
+
+        :param path: Ticket file path
+        :type path: str
+        :rtype: bool
+        """
+        try:
+            descriptor = os.open(path, os.O_RDONLY)
+        except OSError as exception:
+            return exception.errno != errno.ENOENT
+        try:
+            try:
+                fcntl.flock(descriptor, fcntl.LOCK_SH | fcntl.LOCK_NB)
+            except (IOError, OSError):
+                return True
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return False
+        finally:
+            os.close(descriptor)
+
+    def queue(self, name):
+        """
+        The live tickets of the concurrency class in the service order.
+
+        :param name: Concurrency class name
+        :type name: str
+        :return: List of ticket paths
+        :rtype: list
+        """
+        directory = self.directory(name)
+        try:
+            names = sorted(os.listdir(directory))
+        except OSError:
+            return []
+        tickets = []
+        for file_name in names:
+            if not file_name.endswith(constants.SEMAPHORE_TICKET_SUFFIX):
+                continue
+            tickets.append(os.path.join(directory, file_name))
+        return tickets
+
+    def position(self, name, ticket):
+        """
+        The number of live tickets before this one.
+
+        :param name: Concurrency class name
+        :type name: str
+        :param ticket: Own ticket
+        :type ticket: FileLock
+        :return: Queue position starting from zero
+        :rtype: int
+        """
+        position = 0
+        for path in self.queue(name):
+            if path == ticket.path:
+                break
+            if self.is_alive(path):
+                position += 1
+        return position
+
+    def release(self, ticket):
+        """
+        Remove the ticket and release its lock.
+
+        :param ticket: Own ticket
+        :type ticket: FileLock
+        """
+        try:
+            os.remove(ticket.path)
+        except OSError:
+            pass
+        ticket.release()
+
+    def acquire(self, name, limit=None, timeout=None):
+        """
+        Wait until this process is admitted to the concurrency class.
+        The wait is limited by the timeout or by the remaining operation
+        time. The queue position and the wait time are reported to the log.
+
+        :param name: Concurrency class name
+        :type name: str
+        :param limit: The class limit, taken from the agent if not set
+        :type limit: int or None
+        :param timeout: Maximum wait time in seconds
+        :type timeout: int or float or None
+        :return: The ticket or None if the timeout has expired
+        :rtype: FileLock or None
+        """
+        if limit is None:
+            limit = self.limit(name)
+        if timeout is None:
+            timeout = self.agent.remaining
+        started = time.time()
+        ticket = self.take_ticket(name, timeout)
+        if ticket is None:
+            self.agent.log.error(
+                "Could not take a ticket of the concurrency class '%s'", name
+            )
+            return None
+        position = self.position(name, ticket)
+        first_position = position
+        if position >= limit:
+            self.agent.log.info(
+                "Waiting for the concurrency class '%s': "
+                "queue position %d, limit %d",
+                name, position + 1, limit,
+            )
+        interval = constants.LOCK_POLL_MIN_INTERVAL
+        while position >= limit:
+            now = time.time()
+            if now - started >= timeout:
+                self.release(ticket)
+                self.agent.log.error(
+                    "Concurrency class '%s' was not acquired in %.3f "
+                    "seconds: queue position %d, limit %d",
+                    name, now - started, position + 1, limit,
+                )
+                return None
+            time.sleep(min(interval, started + timeout - now))
+            interval = min(interval * 2, constants.LOCK_POLL_MAX_INTERVAL)
+            position = self.position(name, ticket)
+        waited = time.time() - started
+        if waited >= constants.LOCK_WAIT_REPORT:
+            log = self.agent.log.info
+        else:
+            log = self.agent.log.debug
+        log(
+            "Concurrency class '%s' was acquired after %.3f seconds: "
+            "queue position %d, limit %d",
+            name, waited, first_position + 1, limit,
+        )
+        return ticket
+
+    @contextmanager
+    def acquired(self, name, limit=None, timeout=None):
+        """
+        Run the block admitted to the concurrency class. The agent will exit
+        with the generic error if it's not admitted in time.
+
+        :param name: Concurrency class name
+        :type name: str
+        :param limit: The class limit, taken from the agent if not set
+        :type limit: int or None
+        :param timeout: Maximum wait time in seconds
+        :type timeout: int or float or None
+        """
+        ticket = self.acquire(name, limit, timeout)
+        if ticket is None:
+            self.agent.exit.error_generic(
+                "Concurrency class '%s' limit is reached" % name
+            )
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
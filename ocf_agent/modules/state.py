@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+from ocf_agent import constants
+from ocf_agent.helpers import atomic_write
+from ocf_agent.helpers import memoization
+from ocf_agent.helpers import memoization_set
+
+
+class State(object):
+    """
+    The State object is a small key/value store of this resource instance
+    saved in the lock directory. It's read once per invocation and every
+    update is done under an exclusive lock and saved by an atomic rename
+    so concurrent actions never see or produce a broken state file.
+    """
+
+    def __init__(self, agent):
+        """
+        The State object should have the Agent object as the first argument.
+
+        :param agent: The parent Agent
+        :type agent: Agent
+        """
+        self.agent = agent
+
+    @property
+    def file_name(self):
+        """
+        The state file name of this resource instance.
+
+        :return: State file name
+        :rtype: str
+        """
+        file_name = self.agent.name
+        if self.agent.environment.res_instance is not None:
+            file_name += '-' + self.agent.environment.res_instance
+        return file_name + constants.STATE_FILE_SUFFIX
+
+    @property
+    def path(self):
+        """
+        The full path to the state file. It's placed to the Lock directory.
+
+        :return: State file path
+        :rtype: str
+        """
+        return os.path.join(self.agent.lock.directory, self.file_name)
+
+    def read_file(self):
+        """
+        Read the state file. Returns an empty dictionary if the file is
+        missing or cannot be parsed.
+
+        :return: The stored values
+        :rtype: dict
+        """
+        try:
+            with open(self.path, 'r') as state_file:
+                data = json.load(state_file)
+        except (IOError, OSError, ValueError):
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        return data
+
+    @property
+    @memoization
+    def data(self):
+        """
+        The stored values. The state file is read only by the first access.
+
+        :return: The stored values
+        :rtype: dict
+        """
+        return self.read_file()
+
+    all = data
+
+    def get(self, key, default=None):
+        """
+        Get the stored value by its key.
+
+        :param key: Value key
+        :type key: str
+        :param default: Returned if the key is not stored
+        :type default: object
+        :return: The stored value
+        :rtype: object
+        """
+        return self.data.get(key, default)
+
+    __getitem__ = get
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def locked(self):
+        """
+        Hold the exclusive lock of the state while the block is run.
+        """
+        return self.agent.lock.exclusive(constants.STATE_LOCK_KEY)
+
+    def modify(self, function):
+        """
+        Run the function with the current stored values under the exclusive
+        lock and save the values if the function returns True. The values
+        are read again so the changes made by other processes are not lost.
+
+        :param function: Receives the values dictionary and can change it
+        :type function: func
+        :return: The function's result
+        :rtype: bool
+        """
+        with self.locked():
+            data = self.read_file()
+            changed = function(data)
+            if changed:
+                atomic_write(self.path, json.dumps(data, sort_keys=True))
+        memoization_set(self, 'data', data)
+        return changed
+
+    def update(self, values):
+        """
+        Store several values at once.
+
+        :param values: Keys and values
+        :type values: dict
+        """
+        def function(data):
+            data.update(values)
+            return True
+
+        self.modify(function)
+
+    def set(self, key, value):
+        """
+        Store the value by its key.
+
+        :param key: Value key
+        :type key: str
+        :param value: The value. It should be serializable to JSON.
+        :type value: object
+        """
+        self.update({key: value})
+
+    __setitem__ = set
+
+    def save(self, key, value, timeout=None):
+        """
+        Store the value if the state lock can be taken in time. Unlike
+        'set' it never exits the agent so it can be used while the agent
+        is exiting with another code.
+
+        :param key: Value key
+        :type key: str
+        :param value: The value. It should be serializable to JSON.
+        :type value: object
+        :param timeout: Maximum lock wait time or the remaining time
+        :type timeout: int or float or None
+        :return: True if the value has been stored
+        :rtype: bool
+        """
+        lock = self.agent.lock.acquire(
+            constants.STATE_LOCK_KEY, timeout=timeout,
+        )
+        if lock is None:
+            return False
+        try:
+            data = self.read_file()
+            data[key] = value
+            atomic_write(self.path, json.dumps(data, sort_keys=True))
+        finally:
+            lock.release()
+        memoization_set(self, 'data', data)
+        return True
+
+    def compare_and_set(self, key, expected, value):
+        """
+        Store the value only if the currently stored value is equal to the
+        expected one. A missing key is compared as None. Returns True if
+        the value has been stored.
+
+        :param key: Value key
+        :type key: str
+        :param expected: The expected current value
+        :type expected: object
+        :param value: The new value
+        :type value: object
+        :rtype: bool
+        """
+        def function(data):
+            if data.get(key) != expected:
+                return False
+            data[key] = value
+            return True
+
+        return self.modify(function)
+
+    def delete(self, key):
+        """
+        Remove the stored value.
+
+        :param key: Value key
+        :type key: str
+        """
+        def function(data):
+            if key not in data:
+                return False
+            del data[key]
+            return True
+
+        self.modify(function)
+
+    __delitem__ = delete
+
+    def clear(self):
+        """
+        Remove all the stored values.
+        """
+        def function(data):
+            if not data:
+                return False
+            data.clear()
+            return True
+
+        self.modify(function)
@@ -0,0 +1,439 @@
+# -*- coding: utf-8 -*-
+
+import errno
+import os
+import time
+from ocf_agent import constants
+from ocf_agent.helpers import read_file
+
+
+class ProcBackend(object):
+    """
+    The Proc backend reads the process information directly from the proc
+    filesystem on Linux. It has no dependencies and reads only the files
+    needed for the requested attributes.
+    """
+    name = 'proc'
+
+    def __init__(self, root=None):
+        """
+        :param root: The proc filesystem path
+        :type root: str or None
+        """
+        self.root = root or constants.PROC_DIR
+
+    @staticmethod
+    def available():
+        """
+        Check if this backend can be used on this system.
+
+        :rtype: bool
+        """
+        return os.path.isfile(
+            os.path.join(constants.PROC_DIR, 'self', 'stat')
+        )
+
+    def pids(self):
+        """
+        The pids of all processes.
+
+        :return: List of pids
+        :rtype: list
+        """
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return []
+        return [int(name) for name in names if name.isdigit()]
+
+    def read(self, pid, name):
+        """
+        Read the file of the process directory.
+
+        :param pid: Process pid
+        :type pid: int
+        :param name: File name
+        :type name: str
+        :return: File content or None if it cannot be read
+        :rtype: str or None
+        """
+        return read_file(os.path.join(self.root, str(pid), name))
+
+    def read_exe(self, pid):
+        """
+        Read the executable path of the process.
+
+        :param pid: Process pid
+        :type pid: int
+        :return: Executable path or None if it cannot be read
+        :rtype: str or None
+        """
+        try:
+            exe = os.readlink(os.path.join(self.root, str(pid), 'exe'))
+        except OSError:
+            return None
+        if exe.endswith(constants.PROC_EXE_DELETED):
+            exe = exe[:-len(constants.PROC_EXE_DELETED)]
+        return exe
+
+    def read_cmdline(self, pid):
+        """
+        Read the command line arguments of the process.
+
+        :param pid: Process pid
+        :type pid: int
+        :return: List of arguments or None if it cannot be read
+        :rtype: list or None
+        """
+        cmdline = self.read(pid, 'cmdline')
+        if cmdline is None:
+            return None
+        arguments = cmdline.split('\0')
+        if arguments and arguments[-1] == '':
+            arguments.pop()
+        return arguments
+
+    def read_uid(self, pid):
+        """
+        Read the real user id of the process.
+
+        :param pid: Process pid
+        :type pid: int
+        :return: User id or None if it cannot be read
+        :rtype: int or None
+        """
+        status = self.read(pid, 'status')
+        if status is None:
+            return None
+        for line in status.splitlines():
+            if line.startswith('Uid:'):
+                return int(line.split()[1])
+        return None
+
+    def entry(self, pid, attributes=None):
+        """
+        Read the attributes of the process. The stat file is read only if
+        one of its attributes is requested and the other files only for
+        their attributes.
+
+        :param pid: Process pid
+        :type pid: int
+        :param attributes: Attribute names, all of them if not set
+        :type attributes: list or None
+        :return: Attribute dictionary or None if there is no such process
+        :rtype: dict or None
+        """
+        if attributes is None:
+            attributes = constants.PROCESS_ATTRIBUTES
+        entry = {'pid': pid}
+        stat = self.read(pid, 'stat')
+        if stat is None:
+            return None
+        comm = stat[stat.find('(') + 1:stat.rfind(')')]
+        fields = stat[stat.rfind(')') + 2:].split()
+        cmdline = None
+        if 'cmdline' in attributes or (
+                'name' in attributes and
+                len(comm) >= constants.PROC_COMM_LENGTH
+        ):
+            cmdline = self.read_cmdline(pid)
+        for attribute in attributes:
+            if attribute == 'ppid':
+                entry['ppid'] = int(fields[constants.PROC_STAT_PPID])
+            elif attribute == 'pgid':
+                entry['pgid'] = int(fields[constants.PROC_STAT_PGID])
+            elif attribute == 'starttime':
+                entry['starttime'] = int(
+                    fields[constants.PROC_STAT_STARTTIME]
+                )
+            elif attribute == 'status':
+                entry['status'] = constants.PROC_STATUSES.get(
+                    fields[0], fields[0]
+                )
+            elif attribute == 'name':
+                name = comm
+                if len(comm) >= constants.PROC_COMM_LENGTH and cmdline:
+                    command = os.path.basename(cmdline[0])
+                    if command.startswith(comm):
+                        name = command
+                entry['name'] = name
+            elif attribute == 'cmdline':
+                entry['cmdline'] = cmdline
+            elif attribute == 'exe':
+                entry['exe'] = self.read_exe(pid)
+            elif attribute == 'uid':
+                entry['uid'] = self.read_uid(pid)
+        return entry
+
+    def entries(self, attributes=None):
+        """
+        Iterate over the attributes of all processes.
+
+        :param attributes: Attribute names, all of them if not set
+        :type attributes: list or None
+        :return: Generator of attribute dictionaries
+        :rtype: generator
+        """
+        for pid in self.pids():
+            entry = self.entry(pid, attributes)
+            if entry is not None:
+                yield entry
+
+    def exists(self, pid):
+        """
+        Check if the process exists and is not a zombie.
+
+        :param pid: Process pid
+        :type pid: int
+        :rtype: bool
+        """
+        entry = self.entry(pid, ['status'])
+        return entry is not None and \
+            entry['status'] not in constants.PROCESS_DEAD_STATUSES
+
+    def descendants(self, pid):
+        """
+        The pids of all children of the process and their children
+        found by a single scan.
+
+        :param pid: Process pid
+        :type pid: int
+        :return: List of pids
+        :rtype: list
+        """
+        children = {}
+        for entry in self.entries(['ppid']):
+            children.setdefault(entry['ppid'], []).append(entry['pid'])
+        found = []
+        queue = list(children.get(pid, []))
+        while queue:
+            child = queue.pop(0)
+            found.append(child)
+            queue.extend(children.get(child, []))
+        return found
+
+    def wait(self, pids, timeout):
+        """
+        Wait for the processes to exit checking them with a growing interval.
+        Exited children of this process are reaped.
+
+        :param pids: Process pids
+        :type pids: list
+        :param timeout: Maximum wait time in seconds
+        :type timeout: int or float
+        :return: The pids of the processes which are still running
+        :rtype: list
+        """
+        deadline = time.time() + timeout
+        interval = constants.LOCK_POLL_MIN_INTERVAL
+        alive = list(pids)
+        while True:
+            for pid in alive:
+                try:
+                    os.waitpid(pid, os.WNOHANG)
+                except OSError as exception:
+                    if exception.errno != errno.ECHILD:
+                        raise
+            alive = [pid for pid in alive if self.exists(pid)]
+            left = deadline - time.time()
+            if not alive or left <= 0:
+                return alive
+            time.sleep(min(interval, left))
+            interval = min(interval * 2, constants.LOCK_POLL_MAX_INTERVAL)
+
+
+class PsutilBackend(object):
+    """
+    The Psutil backend uses the psutil library. It works on the systems
+    without the proc filesystem.
+    """
+    name = 'psutil'
+
+    def __init__(self):
+        import psutil
+        self.psutil = psutil
+
+    @staticmethod
+    def available():
+        """
+        Check if the psutil library is installed.
+
+        :rtype: bool
+        """
+        try:
+            import psutil  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    @property
+    def clock_ticks(self):
+        """
+        The number of clock ticks per second used by the start time.
+
+        :rtype: int
+        """
+        try:
+            return os.sysconf('SC_CLK_TCK')
+        except (ValueError, OSError, AttributeError):
+            return 100
+
+    def pids(self):
+        """
+        The pids of all processes.
+
+        :return: List of pids
+        :rtype: list
+        """
+        return self.psutil.pids()
+
+    def convert(self, info, process):
+        """
+        Convert the psutil attributes to the backend attributes.
+
+        :param info: The psutil attributes
+        :type info: dict
+        :param process: The psutil process
+        :type process: psutil.Process
+        :return: Attribute dictionary
+        :rtype: dict
+        """
+        entry = dict(info)
+        if 'uids' in entry:
+            uids = entry.pop('uids')
+            entry['uid'] = uids.real if uids is not None else None
+        if 'create_time' in entry:
+            created = entry.pop('create_time')
+            entry['starttime'] = None
+            if created is not None:
+                entry['starttime'] = int(round(
+                    (created - self.psutil.boot_time()) * self.clock_ticks
+                ))
+        if 'pgid' in entry:
+            try:
+                entry['pgid'] = os.getpgid(process.pid)
+            except OSError:
+                entry['pgid'] = None
+        return entry
+
+    @staticmethod
+    def names(attributes):
+        """
+        The psutil names of the attributes.
+
+        :param attributes: Attribute names
+        :type attributes: list
+        :return: List of psutil attribute names
+        :rtype: list
+        """
+        mapping = {'uid': 'uids', 'starttime': 'create_time', 'pgid': 'pid'}
+        return [mapping.get(attribute, attribute) for attribute in attributes]
+
+    def entry(self, pid, attributes=None):
+        """
+        Read the attributes of the process.
+
+        :param pid: Process pid
+        :type pid: int
+        :param attributes: Attribute names, all of them if not set
+        :type attributes: list or None
+        :return: Attribute dictionary or None if there is no such process
+        :rtype: dict or None
+        """
+        if attributes is None:
+            attributes = constants.PROCESS_ATTRIBUTES
+        try:
+            process = self.psutil.Process(pid)
+            info = process.as_dict(self.names(attributes), ad_value=None)
+        except self.psutil.NoSuchProcess:
+            return None
+        if 'pgid' in attributes:
+            info['pgid'] = None
+        info['pid'] = pid
+        return self.convert(info, process)
+
+    def entries(self, attributes=None):
+        """
+        Iterate over the attributes of all processes.
+
+        :param attributes: Attribute names, all of them if not set
+        :type attributes: list or None
+        :return: Generator of attribute dictionaries
+        :rtype: generator
+        """
+        if attributes is None:
+            attributes = constants.PROCESS_ATTRIBUTES
+        names = self.names(attributes)
+        for process in self.psutil.process_iter(attrs=names, ad_value=None):
+            info = dict(process.info)
+            if 'pgid' in attributes:
+                info['pgid'] = None
+            yield self.convert(info, process)
+
+    def exists(self, pid):
+        """
+        Check if the process exists and is not a zombie.
+
+        :param pid: Process pid
+        :type pid: int
+        :rtype: bool
+        """
+        try:
+            status = self.psutil.Process(pid).status()
+        except self.psutil.NoSuchProcess:
+            return False
+        return status not in constants.PROCESS_DEAD_STATUSES
+
+    def descendants(self, pid):
+        """
+        The pids of all children of the process and their children.
+
+        :param pid: Process pid
+        :type pid: int
+        :return: List of pids
+        :rtype: list
+        """
+        try:
+            process = self.psutil.Process(pid)
+            return [child.pid for child in process.children(recursive=True)]
+        except self.psutil.Error:
+            return []
+
+    def wait(self, pids, timeout):
+        """
+        Wait for the processes to exit. Child processes are reaped.
+
+        :param pids: Process pids
+        :type pids: list
+        :param timeout: Maximum wait time in seconds
+        :type timeout: int or float
+        :return: The pids of the processes which are still running
+        :rtype: list
+        """
+        processes = []
+        for pid in pids:
+            try:
+                processes.append(self.psutil.Process(pid))
+            except self.psutil.NoSuchProcess:
+                continue
+        gone, alive = self.psutil.wait_procs(processes, timeout)
+        return [process.pid for process in alive if self.exists(process.pid)]
+
+
+BACKENDS = {
+    ProcBackend.name: ProcBackend,
+    PsutilBackend.name: PsutilBackend,
+}
+
+
+def default_backend():
+    """
+    The name of the backend to use if it's not configured: the proc
+    backend if it's available or psutil otherwise.
+
+    :return: Backend name
+    :rtype: str
+    """
+    if ProcBackend.available():
+        return ProcBackend.name
+    return PsutilBackend.name
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+Replay the agent invocations saved by the Recorder and report their
+latency percentiles. It can be used to benchmark an agent with a realistic
+load profile captured on a production node::
+
+    OCF_AGENT_RECORD=/tmp/agent.record ./agent.py monitor
+    python -m ocf_agent.replay -c 4 /tmp/agent.record ./agent.py
+"""
+
+import argparse
+import json
+import math
+import os
+import shlex
+import subprocess
+import sys
+import time
+from ocf_agent import constants
+
+
+def read_records(path, action=None):
+    """
+    Read the recorded invocations from the record file.
+    Lines which cannot be parsed are skipped.
+
+    :param path: Record file path
+    :type path: str
+    :param action: Read only the records of this action
+    :type action: str or None
+    :return: List of records
+    :rtype: list
+    """
+    records = []
+    with open(path, 'r') as record_file:
+        for line in record_file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(record, dict):
+                continue
+            if action is not None and record.get('action') != action:
+                continue
+            records.append(record)
+    return records
+
+
+def replay_record(record, command):
+    """
+    Run the agent command with the recorded arguments and environment.
+
+    :param record: Recorded invocation
+    :type record: dict
+    :param command: The agent command
+    :type command: list
+    :return: The record, the new exit code and the duration
+    :rtype: tuple
+    """
+    environment = dict(record.get('env', {}))
+    environment.pop(constants.OCF_VAR_RECORD, None)
+    environment['PATH'] = os.getenv('PATH', os.defpath)
+    arguments = list(command) + list(record.get('argv', [])[1:])
+    started = time.time()
+    with open(os.devnull, 'w') as null:
+        code = subprocess.call(
+            arguments,
+            env=environment,
+            stdout=null,
+            stderr=null,
+        )
+    return record, code, time.time() - started
+
+
+def replay(records, command, concurrency=1):
+    """
+    Replay all records either serially or with the given concurrency.
+
+    :param records: List of records
+    :type records: list
+    :param command: The agent command
+    :type command: list
+    :param concurrency: Number of parallel invocations
+    :type concurrency: int
+    :return: List of the replay results in the records order
+    :rtype: list
+    """
+    if concurrency <= 1:
+        return [replay_record(record, command) for record in records]
+    from multiprocessing.pool import ThreadPool
+    pool = ThreadPool(concurrency)
+    try:
+        return pool.map(
+            lambda record: replay_record(record, command),
+            records,
+        )
+    finally:
+        pool.close()
+        pool.join()
+
+
+def percentile(values, percent):
+    """
+    Calculate the percentile of the values using the nearest rank method.
+
+    :param values: List of numbers
+    :type values: list
+    :param percent: Percentile
+    :type percent: int or float
+    :return: The percentile value or None for an empty list
+    :rtype: float or None
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    rank = int(math.ceil(percent / 100.0 * len(values))) - 1
+    return values[max(0, min(rank, len(values) - 1))]
+
+
+def report(results, percentiles=None):
+    """
+    Format the latency report grouped by action.
+
+    :param results: The replay results
+    :type results: list
+    :param percentiles: List of percentiles to report
+    :type percentiles: list
+    :return: Report text
+    :rtype: str
+    """
+    if percentiles is None:
+        percentiles = constants.RECORD_PERCENTILES
+    durations = {}
+    mismatches = {}
+    for record, code, duration in results:
+        action = record.get('action')
+        durations.setdefault(action, []).append(duration)
+        if code != record.get('code'):
+            mismatches[action] = mismatches.get(action, 0) + 1
+    lines = []
+    for action in sorted(durations, key=str):
+        values = durations[action]
+        columns = ['%s: count=%d' % (action, len(values))]
+        for percent in percentiles:
+            columns.append(
+                'p%s=%.1fms' % (percent, percentile(values, percent) * 1000)
+            )
+        columns.append('max=%.1fms' % (max(values) * 1000))
+        columns.append('code_mismatches=%d' % mismatches.get(action, 0))
+        lines.append(' '.join(columns))
+    return '\n'.join(lines) + '\n'
+
+
+def main(argv=None):
+    """
+    Parse the command line arguments and replay the record file.
+
+    :param argv: Command line arguments
+    :type argv: list
+    :return: Exit code
+    :rtype: int
+    """
+    parser = argparse.ArgumentParser(
+        description='Replay the recorded OCF agent invocations',
+    )
+    parser.add_argument('record', help='the record file')
+    parser.add_argument('agent', help='the agent command')
+    parser.add_argument(
+        '-c', '--concurrency', type=int, default=1,
+        help='number of parallel invocations',
+    )
+    parser.add_argument(
+        '-a', '--action', default=None,
+        help='replay only this action',
+    )
+    parser.add_argument(
+        '-r', '--repeat', type=int, default=1,
+        help='replay the records this many times',
+    )
+    arguments = parser.parse_args(argv)
+    records = read_records(arguments.record, arguments.action)
+    if not records:
+        sys.stderr.write('There are no records to replay\n')
+        return 1
+    results = replay(
+        records * max(1, arguments.repeat),
+        shlex.split(arguments.agent),
+        arguments.concurrency,
+    )
+    sys.stdout.write(report(results))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,6 +2,7 @@
 
 from unittest import TestCase
 from mock import patch
+from ocf_agent import constants
 from tests.fixtures.agents import UnitTestAgent
 from tests.fixtures.agents import UnitTestEmptyAgent
 
@@ -44,6 +45,21 @@ class AgentConfiguredBasicPropertiesTest(TestCase):
         self.agent.action = 'status'
         self.assertEqual(self.agent.action, 'monitor')
 
+    @patch(
+        'ocf_agent.modules.environment.Environment.meta_timeout', 30.0)
+    def test_has_deadline_from_meta_timeout(self):
+        self.assertEqual(self.agent.timeout, 30.0)
+        self.assertEqual(
+            self.agent.deadline,
+            self.agent.started + 30.0 - constants.DEADLINE_MARGIN,
+        )
+        self.assertTrue(0 < self.agent.remaining <= 29.0)
+
+    @patch(
+        'ocf_agent.modules.environment.Environment.meta_timeout', None)
+    def test_has_default_timeout(self):
+        self.assertTrue(self.agent.timeout > 0)
+
     @patch('sys.argv', ['test'])
     @patch('ocf_agent.agent.Agent.usage')
     @patch('ocf_agent.modules.exit.Exit.output')
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from tests.fixtures.agents import UnitTestAgent
+from ocf_agent.agent import Agent
+from mock import patch
+
+
+class TestBinariesAgent(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.bin_directory = os.path.join(self.directory, 'bin')
+        self.cache_directory = os.path.join(self.directory, 'cache')
+        os.mkdir(self.bin_directory)
+        self.make_binary('test_binary')
+        self.agent = UnitTestAgent()
+        self.agent.CACHE_DIR = self.cache_directory
+        self.agent.REQUIRES_BINARIES = ['test_binary']
+        self.binaries = self.agent.binaries
+        self.path_patch = patch.dict(
+            'os.environ', {'PATH': self.bin_directory}
+        )
+        self.path_patch.start()
+
+    def tearDown(self):
+        self.path_patch.stop()
+        shutil.rmtree(self.directory)
+        del self.agent
+        del self.binaries
+
+    def make_binary(self, name, mode=0o755):
+        path = os.path.join(self.bin_directory, name)
+        open(path, 'w').close()
+        os.chmod(path, mode)
+        return path
+
+    def test_has_agent(self):
+        self.assertEquals(self.binaries.agent, self.agent)
+        self.assertIsInstance(self.binaries.agent, Agent)
+
+    def test_has_required_binaries(self):
+        self.assertEqual(self.binaries.required, ['test_binary'])
+
+    def test_can_resolve_a_binary(self):
+        self.assertEqual(
+            self.binaries.path('test_binary'),
+            os.path.join(self.bin_directory, 'test_binary'),
+        )
+        self.assertIsNone(self.binaries.path('missing_binary'))
+
+    def test_skips_not_executable_files(self):
+        self.make_binary('not_executable', 0o644)
+        self.assertIsNone(self.binaries.path('not_executable'))
+
+    def test_can_resolve_binaries_in_parallel(self):
+        self.make_binary('other_binary')
+        self.assertEqual(
+            self.binaries.resolve(
+                ['test_binary', 'other_binary', 'missing_binary'],
+                parallel=True,
+            ),
+            {
+                'test_binary': os.path.join(
+                    self.bin_directory, 'test_binary'),
+                'other_binary': os.path.join(
+                    self.bin_directory, 'other_binary'),
+                'missing_binary': None,
+            }
+        )
+
+    def test_saves_and_uses_the_cache(self):
+        self.binaries.path('test_binary')
+        with open(self.binaries.cache_file_path) as cache_file:
+            cache = json.load(cache_file)
+        self.assertEqual(
+            cache['binaries'],
+            {'test_binary': os.path.join(self.bin_directory, 'test_binary')},
+        )
+        other_agent = UnitTestAgent()
+        other_agent.CACHE_DIR = self.cache_directory
+        with patch('ocf_agent.modules.binaries.Binaries.lookup') as mock1:
+            other_agent.binaries.path('test_binary')
+            self.assertFalse(mock1.called)
+
+    def test_cache_is_invalidated_by_directory_change(self):
+        self.assertIsNone(self.binaries.path('new_binary'))
+        self.make_binary('new_binary')
+        stat = os.stat(self.bin_directory)
+        os.utime(self.bin_directory, (stat.st_atime, stat.st_mtime + 10))
+        other_agent = UnitTestAgent()
+        other_agent.CACHE_DIR = self.cache_directory
+        self.assertEqual(
+            other_agent.binaries.path('new_binary'),
+            os.path.join(self.bin_directory, 'new_binary'),
+        )
+
+    @patch('ocf_agent.modules.exit.Exit.output')
+    def test_validate_fails_if_binary_is_missing(self, mock1):
+        self.agent.action = 'start'
+        self.agent.REQUIRES_BINARIES = ['test_binary', 'missing_binary']
+        with self.assertRaises(SystemExit) as context:
+            self.binaries.validate()
+        self.assertEqual(context.exception.code, 5)
+        self.assertIn('missing_binary', mock1.call_args[0][1])
+
+    def test_validate_skips_some_actions(self):
+        self.agent.REQUIRES_BINARIES = ['missing_binary']
+        for action in ['meta-data', 'usage', 'stop']:
+            self.agent.action = action
+            self.binaries.validate()
+
+    def test_process_uses_resolved_paths(self):
+        self.assertEqual(
+            self.agent.process.command(('test_binary', '-v')),
+            [os.path.join(self.bin_directory, 'test_binary'), '-v'],
+        )
+        self.assertEqual(
+            self.agent.process.command(('missing_binary', '-v')),
+            ['missing_binary', '-v'],
+        )
+        self.assertEqual(
+            self.agent.process.command(('test_binary -v',), shell=True),
+            ['test_binary -v'],
+        )
+
+    def test_process_does_not_resolve_undeclared_binaries(self):
+        self.make_binary('other_binary')
+        self.assertEqual(
+            self.agent.process.command(('other_binary', '-v')),
+            ['other_binary', '-v'],
+        )
+        self.assertFalse(os.path.exists(self.binaries.cache_file_path))
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from tests.fixtures.agents import UnitTestAgent
+from ocf_agent.agent import Agent
+from mock import patch
+
+
+class TestBudgetAgent(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.agent = UnitTestAgent()
+        self.agent.LOCK_DIR = self.directory
+        self.agent.MONITOR_RATES = {10: (6, 2)}
+        self.agent.MONITOR_BUDGET_WAIT = 0
+        self.budget = self.agent.budget
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        del self.agent
+        del self.budget
+
+    def test_has_agent(self):
+        self.assertEquals(self.budget.agent, self.agent)
+        self.assertIsInstance(self.budget.agent, Agent)
+
+    def test_has_path(self):
+        self.assertEqual(
+            self.budget.path(10),
+            os.path.join(self.directory, 'ocf_agent-budget-10.json'),
+        )
+
+    def test_has_rate(self):
+        self.assertEqual(self.budget.rate(10), (6.0, 2.0))
+        self.assertEqual(self.budget.rate(20), (0.0, 2.0))
+        self.agent.MONITOR_RATES = {'20': 12}
+        self.assertEqual(self.budget.rate(20), (12.0, 2.0))
+
+    def test_can_take_burst(self):
+        self.assertTrue(self.budget.take(10))
+        self.assertTrue(self.budget.take(10))
+        self.assertFalse(self.budget.take(10))
+        with open(self.budget.path(10), 'r') as bucket_file:
+            self.assertTrue(json.load(bucket_file)['tokens'] < 1)
+
+    def test_tokens_are_refilled(self):
+        self.assertTrue(self.budget.take(10))
+        self.assertTrue(self.budget.take(10))
+        with patch('time.time', return_value=os.stat(
+                self.budget.path(10)).st_mtime + 3600):
+            self.assertEqual(self.budget.refill(10, False), 0)
+
+    def test_can_wait_for_token(self):
+        self.agent.MONITOR_RATES = {10: (600, 1)}
+        self.agent.MONITOR_BUDGET_WAIT = 1
+        self.assertTrue(self.budget.take(10))
+        self.assertTrue(self.budget.take(10))
+
+    def test_zero_rate_is_unlimited(self):
+        self.agent.MONITOR_RATES = {10: 0}
+        for _ in range(5):
+            self.assertTrue(self.budget.take(10))
+        self.assertFalse(os.path.exists(self.budget.path(10)))
+
+    def test_depth_without_rate_is_unlimited(self):
+        for _ in range(5):
+            self.assertTrue(self.budget.take(20))
+        self.assertFalse(os.path.exists(self.budget.path(20)))
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from tests.fixtures.agents import UnitTestAgent
+from ocf_agent.agent import Agent
+from ocf_agent.modules.cache import cached
+from mock import patch
+
+
+class CachedAgent(UnitTestAgent):
+    calls = 0
+
+    @cached(ttl=60)
+    def version(self, binary):
+        self.calls += 1
+        return '%s 1.0' % binary
+
+
+class SourceAgent(UnitTestAgent):
+    source = None
+
+    @cached(source=lambda self: self.source)
+    def config(self):
+        with open(self.source, 'r') as source_file:
+            value = source_file.read()
+        with open(self.source, 'a') as source_file:
+            source_file.write('changed')
+        return value
+
+
+class CreatedSourceAgent(UnitTestAgent):
+    source = None
+    calls = 0
+
+    @cached(source=lambda self: self.source)
+    def config(self):
+        self.calls += 1
+        if not os.path.exists(self.source):
+            open(self.source, 'w').close()
+        return self.calls
+
+
+class TestCacheAgent(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.agent = CachedAgent()
+        self.agent.CACHE_DIR = self.directory
+        self.cache = self.agent.cache
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        del self.agent
+        del self.cache
+
+    def test_has_agent(self):
+        self.assertEquals(self.cache.agent, self.agent)
+        self.assertIsInstance(self.cache.agent, Agent)
+
+    @patch(
+        'ocf_agent.modules.environment.Environment.res_instance',
+        'unit_test_agent')
+    def test_has_directory(self):
+        self.assertEqual(
+            self.cache.directory,
+            os.path.join(
+                self.directory, 'configured_ocf_agent-unit_test_agent',
+            )
+        )
+
+    def test_can_set_and_get_values(self):
+        self.assertIsNone(self.cache.get('key'))
+        self.cache.set('key', {'a': [1, 2]})
+        self.assertEqual(self.cache.get('key'), {'a': [1, 2]})
+        self.assertIn('key', self.cache)
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(self.cache.misses, 1)
+        self.cache.delete('key')
+        self.assertNotIn('key', self.cache)
+
+    def test_entries_expire(self):
+        with patch('time.time', return_value=1000):
+            self.cache.set('key', 'value', ttl=10)
+            self.assertEqual(self.cache.get('key'), 'value')
+        with patch('time.time', return_value=1011):
+            self.assertIsNone(self.cache.get('key'))
+
+    def test_entries_depend_on_source_files(self):
+        source = os.path.join(self.directory, 'service.conf')
+        with open(source, 'w') as source_file:
+            source_file.write('a')
+        self.cache.set('config', 'a', source=source)
+        self.assertEqual(self.cache.get('config'), 'a')
+        with open(source, 'w') as source_file:
+            source_file.write('ab')
+        self.assertIsNone(self.cache.get('config'))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        self.agent.CACHE_SIZE = 450
+        for number in range(3):
+            self.cache.set('key%d' % number, 'x' * 50)
+            path = self.cache.entry_path('key%d' % number)
+            os.utime(path, (number, number))
+        self.cache.get('key0')
+        self.cache.set('key3', 'x' * 50)
+        self.assertIn('key0', self.cache)
+        self.assertNotIn('key1', self.cache)
+        self.assertIn('key3', self.cache)
+
+    def test_can_clear(self):
+        self.cache.set('key', 'value')
+        self.cache.clear()
+        self.assertEqual(self.cache.entries, [])
+
+    def test_memoize_decorator(self):
+        self.assertEqual(self.agent.version('sleep'), 'sleep 1.0')
+        self.assertEqual(self.agent.version('sleep'), 'sleep 1.0')
+        self.assertEqual(self.agent.calls, 1)
+        other_agent = CachedAgent()
+        other_agent.CACHE_DIR = self.directory
+        self.assertEqual(other_agent.version('sleep'), 'sleep 1.0')
+        self.assertEqual(other_agent.calls, 0)
+        self.assertEqual(other_agent.version('ls'), 'ls 1.0')
+        self.assertEqual(other_agent.calls, 1)
+
+    def test_source_is_stamped_before_the_call(self):
+        agent = SourceAgent()
+        agent.CACHE_DIR = self.directory
+        agent.source = os.path.join(self.directory, 'service.conf')
+        with open(agent.source, 'w') as source_file:
+            source_file.write('a')
+        self.assertEqual(agent.config(), 'a')
+        self.assertEqual(agent.config(), 'achanged')
+
+    def test_explicit_source_stamp_is_saved(self):
+        source = os.path.join(self.directory, 'service.conf')
+        with open(source, 'w') as source_file:
+            source_file.write('a')
+        self.cache.set('config', 'a', source=source, stamp=[0, 0, 0])
+        self.assertEqual(self.cache.get('config'), None)
+        self.cache.set('config', 'a', source=source)
+        self.assertEqual(self.cache.get('config'), 'a')
+
+    def test_source_created_during_the_call_is_not_cached(self):
+        agent = CreatedSourceAgent()
+        agent.CACHE_DIR = self.directory
+        agent.source = os.path.join(self.directory, 'service.conf')
+        self.assertEqual(
+            [agent.config(), agent.config(), agent.config()], [1, 2, 2],
+        )
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from tests.fixtures.agents import UnitTestAgent
+from ocf_agent.agent import Agent
+from mock import patch
+
+
+class TestCgroupAgent(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        with open(os.path.join(self.directory, 'cgroup.controllers'), 'w'):
+            pass
+        self.agent = UnitTestAgent()
+        self.agent.CGROUP_ROOT = os.path.join(self.directory, 'ocf_agent')
+        self.agent.PID_DIR = self.directory
+        self.agent.DAEMON_OUTPUT_DIR = self.directory
+        self.cgroup = self.agent.cgroup
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        del self.agent
+        del self.cgroup
+
+    def write(self, name, content):
+        with open(self.cgroup.file_path(name), 'w') as cgroup_file:
+            cgroup_file.write(content)
+
+    def test_has_agent(self):
+        self.assertEquals(self.cgroup.agent, self.agent)
+        self.assertIsInstance(self.cgroup.agent, Agent)
+
+    def test_path(self):
+        self.assertFalse(self.cgroup.enabled)
+        self.assertTrue(self.cgroup.available)
+        self.assertEquals(
+            self.cgroup.path,
+            os.path.join(
+                self.directory, 'ocf_agent',
+                'configured_ocf_agent-configured_ocf_agent',
+            ),
+        )
+
+    def test_create_and_remove(self):
+        self.assertFalse(self.cgroup.exists)
+        self.cgroup.create()
+        self.cgroup.create()
+        self.assertTrue(self.cgroup.exists)
+        with open(os.path.join(
+                self.agent.CGROUP_ROOT, 'cgroup.subtree_control')) as control:
+            self.assertEquals(control.read(), '+cpu +memory')
+        self.assertTrue(self.cgroup.remove())
+        self.assertFalse(self.cgroup.exists)
+        self.assertTrue(self.cgroup.remove())
+
+    def test_pids_and_populated(self):
+        self.cgroup.create()
+        self.assertEquals(self.cgroup.pids, [])
+        self.assertFalse(self.cgroup.populated)
+        self.cgroup.add(100)
+        self.cgroup.add(200)
+        self.assertEquals(self.cgroup.pids, [100, 200])
+        self.assertTrue(self.cgroup.populated)
+        self.write('cgroup.events', 'populated 0\nfrozen 0\n')
+        self.assertFalse(self.cgroup.populated)
+
+    def test_usage(self):
+        self.cgroup.create()
+        self.write('cgroup.procs', '100\n101\n')
+        self.write('memory.current', '1048576\n')
+        self.write(
+            'cpu.stat',
+            'usage_usec 2500000\nuser_usec 2000000\nsystem_usec 500000\n',
+        )
+        self.assertEquals(
+            self.cgroup.usage,
+            {
+                'processes': 2,
+                'memory': 1048576,
+                'memory_peak': None,
+                'cpu_time': 2.5,
+                'cpu_user': 2.0,
+                'cpu_system': 0.5,
+            },
+        )
+
+    def test_kill_uses_cgroup_kill(self):
+        self.cgroup.create()
+        self.write('cgroup.kill', '')
+        self.write('cgroup.procs', '100\n')
+        with patch('os.kill') as mock:
+            self.cgroup.kill()
+        self.assertFalse(mock.called)
+        with open(self.cgroup.file_path('cgroup.kill')) as kill_file:
+            self.assertEquals(kill_file.read(), '1')
+
+    def test_kill_signals_processes(self):
+        self.cgroup.create()
+        self.write('cgroup.procs', '100\n200\n')
+        with patch('os.kill') as mock:
+            self.cgroup.kill()
+        self.assertEquals(
+            [call[0][0] for call in mock.call_args_list], [100, 200]
+        )
+
+    def test_daemon_started_in_cgroup(self):
+        process = self.agent.process.daemonize('sleep', '30', cgroup=True)
+        try:
+            self.assertEquals(self.agent.process.cgroup_members(),
+                              [process.pid])
+            self.assertTrue(self.agent.process.cgroup_is_running())
+            self.assertTrue(self.agent.process.stop_cgroup(timeout=5))
+            self.assertFalse(self.agent.process.is_running(process.pid))
+        finally:
+            self.agent.process.stop(process.pid)
+
+    def test_stop_removes_empty_cgroup(self):
+        self.cgroup.create()
+        self.assertTrue(self.agent.process.stop_cgroup())
+        self.assertFalse(self.cgroup.exists)
+
+    def test_daemon_cgroup_enabled_by_agent(self):
+        self.agent.CGROUP = True
+        process = self.agent.process.daemonize('sleep', '30')
+        try:
+            self.assertEquals(self.cgroup.pids, [process.pid])
+        finally:
+            self.agent.process.stop(process.pid)
+
+    def test_stop_missing_cgroup(self):
+        self.assertTrue(self.agent.process.stop_cgroup())
+
+    @patch('ocf_agent.modules.exit.Exit.error_configuration',
+           side_effect=SystemExit)
+    def test_cgroup_cannot_be_created(self, mock1):
+        with open(self.agent.CGROUP_ROOT, 'w'):
+            pass
+        with self.assertRaises(SystemExit):
+            self.agent.process.daemonize('sleep', '30', cgroup=True)
+        self.assertIn('Could not create the cgroup', mock1.call_args[0][0])
@@ -81,6 +81,13 @@ class AgentEnvTest(TestCase):
     def test_can_get_default_ra_version_minor(self):
         self.assertEqual(self.environment.ra_version_minor, 0)
 
+    @patch('os.environ', {'OCF_RESKEY_CRM_meta_timeout': '20000'})
+    def test_can_get_meta_timeout(self):
+        self.assertEqual(self.environment.meta_timeout, 20.0)
+
+    def test_default_meta_timeout(self):
+        self.assertEqual(self.environment.meta_timeout, None)
+
     @patch('os.environ', {'HA_debug': '1'})
     def test_can_get_ha_debug(self):
         self.assertEqual(self.environment.is_debug, True)
@@ -23,7 +23,14 @@ class TestAgentExit(TestCase):
     def test_can_send_a_string_to_the_log(self, mock1):
         self.exit.output('test event', 'test message', 0)
         mock1.assert_called_once_with(
-            'test event: test message - exit code: 0'
+            'test event: test message - exit code: %d', 0
+        )
+
+    @patch('ocf_agent.modules.log.Log.error')
+    def test_sends_failures_to_the_error_log(self, mock1):
+        self.exit.output('test event', 'test message', 1)
+        mock1.assert_called_once_with(
+            'test event: test message - exit code: %d', 1
         )
 
 
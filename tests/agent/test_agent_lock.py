@@ -1,7 +1,11 @@
 # -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
 from unittest import TestCase
 from tests.fixtures.agents import UnitTestAgent
 from ocf_agent.agent import Agent
+from ocf_agent.modules.lock import FileLock
 from mock import patch
 
 
@@ -49,7 +53,7 @@ class TestLockAgent(TestCase):
             'configured_ocf_agent-unit_test_agent-test.lock',
         )
 
-    @patch('os.mkdir')
+    @patch('os.makedirs')
     @patch('os.path')
     def test_can_make_directory(self, mock1, mock2):
         mock2.return_value = None
@@ -95,3 +99,109 @@ class TestLockAgent(TestCase):
         self.assertTrue(mock2.called)
         self.assertTrue(mock3.called)
         mock3.assert_called_once_with('/path/to/file')
+
+
+class TestFileLock(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'test.mutex')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_can_acquire_and_release(self):
+        lock = FileLock(self.path)
+        self.assertTrue(lock.acquire(0))
+        self.assertTrue(lock.is_locked)
+        self.assertEqual(lock.owner, os.getpid())
+        self.assertTrue(lock.owner_is_alive)
+        lock.release()
+        self.assertFalse(lock.is_locked)
+
+    def test_exclusive_lock_times_out(self):
+        with FileLock(self.path):
+            other = FileLock(self.path)
+            self.assertFalse(other.acquire(0.05))
+            self.assertFalse(other.is_locked)
+            self.assertTrue(other.waited >= 0.05)
+        self.assertTrue(other.acquire(0))
+        other.release()
+
+    def test_shared_locks_can_be_held_together(self):
+        first = FileLock(self.path, shared=True)
+        second = FileLock(self.path, shared=True)
+        self.assertTrue(first.acquire(0))
+        self.assertTrue(second.acquire(0))
+        self.assertFalse(FileLock(self.path).acquire(0))
+        first.release()
+        second.release()
+        self.assertTrue(FileLock(self.path).acquire(0))
+
+    def test_releases_lock_if_owner_is_not_written(self):
+        lock = FileLock(self.path)
+        with patch('os.write', side_effect=OSError(28, 'No space left')):
+            self.assertRaises(OSError, lock.acquire, 0)
+        self.assertFalse(lock.is_locked)
+        other = FileLock(self.path)
+        self.assertTrue(other.acquire(0))
+        other.release()
+
+    def test_unknown_owner(self):
+        lock = FileLock(self.path)
+        self.assertEqual(lock.owner, None)
+        self.assertEqual(lock.owner_is_alive, None)
+
+
+class TestLockAgentLocking(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.agent = UnitTestAgent()
+        self.agent.LOCK_DIR = os.path.join(self.directory, 'nested', 'locks')
+        self.lock = self.agent.lock
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        del self.agent
+        del self.lock
+
+    @patch(
+        'ocf_agent.modules.environment.Environment.res_instance',
+        'unit_test_agent')
+    def test_has_mutex_path(self):
+        self.assertEqual(
+            self.lock.mutex_path('test'),
+            os.path.join(
+                self.agent.LOCK_DIR,
+                'configured_ocf_agent-unit_test_agent-test.mutex',
+            ),
+        )
+
+    def test_can_create_file(self):
+        self.lock.create_file('test')
+        self.assertTrue(self.lock.file_is_present('test'))
+
+    def test_can_hold_lock(self):
+        with self.lock.exclusive('test') as lock:
+            self.assertTrue(lock.is_locked)
+            self.assertTrue(os.path.isfile(self.lock.mutex_path('test')))
+        self.assertFalse(lock.is_locked)
+
+    def test_lock_wait_is_bounded_by_remaining_time(self):
+        with self.lock.exclusive('test'):
+            with patch.object(Agent, 'remaining', 0.05):
+                self.assertEqual(self.lock.acquire('test'), None)
+
+    def test_exits_if_lock_is_not_acquired(self):
+        with self.lock.exclusive('test'):
+            with patch.object(self.agent.exit, 'error_generic') as mock:
+                mock.side_effect = SystemExit
+                with self.assertRaises(SystemExit):
+                    with self.lock.exclusive('test', timeout=0):
+                        pass
+                self.assertTrue(mock.called)
+
+    def test_shared_locks(self):
+        with self.lock.shared('test'):
+            with self.lock.shared('test', timeout=0) as lock:
+                self.assertTrue(lock.is_locked)
+            self.assertEqual(self.lock.acquire('test', timeout=0), None)
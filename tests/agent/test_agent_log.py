@@ -2,12 +2,19 @@
 
 import logging
 import logging.handlers
+import os
+import shutil
 import sys
+import tempfile
 from unittest import TestCase
 from tests.fixtures.agents import UnitTestAgent
 from tests.fixtures.agents import UnitTestEmptyAgent
 from ocf_agent.agent import Agent
+from ocf_agent.log_handlers import BatchFileHandler
+from ocf_agent.log_handlers import QueueHandler
+from mock import call
 from mock import patch
+from mock import PropertyMock
 
 
 class TestLogAgent(TestCase):
@@ -107,3 +114,272 @@ class TestLogAgent(TestCase):
         ]
         for method in methods:
             self.assertTrue(hasattr(self.log, method))
+
+    def test_logger_is_built_once(self):
+        logger = self.log.logger
+        handlers = list(logger.handlers)
+        self.assertIs(self.log.logger, logger)
+        self.assertEqual(self.log.logger.handlers, handlers)
+        self.assertIs(self.log.handler_console, handlers[0])
+        self.assertIs(self.log.formatter_console, self.log.formatter_file)
+
+    def test_logger_is_rebuilt_if_configuration_changes(self):
+        handler = self.log.logger.handlers[0]
+        with patch('ocf_agent.modules.log.Log.level',
+                   new_callable=PropertyMock) as mock1:
+            mock1.return_value = logging.DEBUG
+            self.assertEqual(self.log.logger.level, logging.DEBUG)
+            self.assertIs(self.log.logger.handlers[0], handler)
+        self.agent.LOG_HANDLERS = []
+        self.assertEqual(self.log.logger.handlers, [])
+
+    def test_can_reset_the_logger(self):
+        handler = self.log.logger.handlers[0]
+        with patch.object(handler, 'close') as mock1:
+            self.log.reset()
+            self.assertTrue(mock1.called)
+        self.assertIsNot(self.log.logger.handlers[0], handler)
+
+    def test_file_handler_does_not_open_the_file(self):
+        self.assertIsNone(self.log.handler_file.stream)
+
+    @patch('ocf_agent.modules.environment.Environment.is_debug', False)
+    def test_disabled_levels_do_not_use_the_logger(self):
+        with patch('ocf_agent.modules.log.Log.logger',
+                   new_callable=PropertyMock) as mock1:
+            self.log.debug('test %s', 'message')
+            self.assertFalse(mock1.called)
+            self.log.info('test %s', 'message')
+            mock1.return_value.log.assert_called_once_with(
+                logging.INFO, 'test %s', 'message'
+            )
+
+
+class TestQueuedLogAgent(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.directory_patch = patch(
+            'ocf_agent.constants.LOG_FILE_DIRECTORY', self.directory
+        )
+        self.directory_patch.start()
+        self.agent = UnitTestAgent()
+        self.agent.LOG_QUEUE = True
+        self.agent.LOG_HANDLERS = ['file']
+        self.log = self.agent.log
+
+    def tearDown(self):
+        self.log.reset()
+        self.directory_patch.stop()
+        shutil.rmtree(self.directory)
+        del self.agent
+        del self.log
+
+    def test_logger_uses_the_queue_handler(self):
+        self.assertEqual(self.log.logger.handlers, [self.log.handler_queue])
+        self.assertIsInstance(self.log.handler_queue, QueueHandler)
+        self.assertEqual(self.log.listener.handlers, [self.log.handler_file])
+        self.assertIsInstance(self.log.handler_file, BatchFileHandler)
+
+    @patch('atexit.register')
+    def test_registers_exit_flush_once(self, mock1):
+        self.log.info('first listener')
+        self.log.reset()
+        self.log.info('second listener')
+        self.assertEqual(mock1.call_count, 1)
+
+    def test_can_flush_the_queue(self):
+        for number in range(10):
+            self.log.info('queued message %d', number)
+        self.assertTrue(self.log.flush())
+        with open(self.log.log_file_path) as log_file:
+            lines = log_file.readlines()
+        self.assertEqual(len(lines), 10)
+        self.assertIn('queued message 9', lines[-1])
+
+    def test_reports_dropped_messages(self):
+        self.agent.LOG_QUEUE_SIZE = 1
+        self.agent.LOG_QUEUE_POLICY = 'drop'
+        self.log.handler_queue.dropped = 5
+        self.log.flush()
+        with open(self.log.log_file_path) as log_file:
+            self.assertIn('5 messages were dropped', log_file.read())
+
+    @patch('ocf_agent.modules.exit.Exit.output')
+    @patch('ocf_agent.modules.log.Log.flush')
+    def test_exit_flushes_the_log(self, mock1, mock2):
+        with self.assertRaises(SystemExit):
+            self.agent.exit.success('test')
+        self.assertTrue(mock1.called)
+
+
+class TestRateLimitedLogAgent(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.agent = UnitTestAgent()
+        self.agent.CACHE_DIR = self.directory
+        self.agent.LOG_RATE_WINDOW = 60
+        self.agent.LOG_RATE_LIMITS = {'info': 2}
+        self.log = self.agent.log
+        self.records = []
+        self.emit_patch = patch.object(
+            self.log.handler_console, 'emit',
+            side_effect=self.records.append,
+        )
+        self.emit_patch.start()
+        self.atexit_patch = patch('atexit.register')
+        self.atexit_patch.start()
+
+    def tearDown(self):
+        self.atexit_patch.stop()
+        self.emit_patch.stop()
+        shutil.rmtree(self.directory)
+        del self.agent
+        del self.log
+
+    def messages(self):
+        return [record.getMessage() for record in self.records]
+
+    def test_suppresses_repeated_messages(self):
+        for number in range(5):
+            self.log.info('The agent is running')
+        self.log.info('Other message')
+        self.assertEqual(
+            self.messages(),
+            ['The agent is running'] * 2 + ['Other message'],
+        )
+
+    def test_never_suppresses_warnings_and_errors(self):
+        for number in range(5):
+            self.log.warning('warning')
+            self.log.error('error')
+        self.assertEqual(len(self.records), 10)
+
+    def test_counts_repeats_across_invocations(self):
+        for number in range(3):
+            self.log.info('The agent is running')
+        self.log.flush()
+        self.assertTrue(os.path.isfile(self.log.rate_limit_state_path))
+        other_agent = UnitTestAgent()
+        other_agent.CACHE_DIR = self.directory
+        other_agent.LOG_RATE_WINDOW = 60
+        other_agent.LOG_RATE_LIMITS = {'info': 2}
+        with patch.object(
+                other_agent.log.handler_console, 'emit',
+                side_effect=self.records.append):
+            other_agent.log.info('The agent is running')
+        self.assertEqual(len(self.records), 2)
+
+    def test_reports_repeats_in_the_next_window(self):
+        with patch('time.time', return_value=1000):
+            for number in range(4):
+                self.log.info('The agent is running')
+        with patch('time.time', return_value=1100):
+            self.log.info('The agent is running')
+        self.assertEqual(
+            self.messages()[-1],
+            'The agent is running (message repeated 2 times)',
+        )
+
+    def test_does_not_report_repeats_on_flush(self):
+        for number in range(5):
+            self.log.info('The agent is running')
+        self.log.flush()
+        self.assertEqual(self.messages(), ['The agent is running'] * 2)
+
+    def test_reports_repeats_on_flush_after_the_window(self):
+        with patch('time.time', return_value=1000):
+            for number in range(4):
+                self.log.info('Process %d is running', number)
+            self.log.flush()
+        with patch('time.time', return_value=1100):
+            self.log.flush()
+            self.log.flush()
+        self.assertEqual(
+            self.messages(),
+            [
+                'Process 0 is running',
+                'Process 1 is running',
+                'Process 0 is running (message repeated 2 times)',
+            ],
+        )
+
+    def test_reports_repeats_saved_by_other_invocation(self):
+        with patch('time.time', return_value=1000):
+            for number in range(4):
+                self.log.info('The agent is running')
+            self.log.flush()
+        other_agent = UnitTestAgent()
+        other_agent.CACHE_DIR = self.directory
+        other_agent.LOG_RATE_WINDOW = 60
+        other_agent.LOG_RATE_LIMITS = {'info': 2}
+        other_agent.log.rate_limiter
+        with patch('time.time', return_value=1100):
+            with patch.object(
+                    other_agent.log.handler_console, 'emit',
+                    side_effect=self.records.append):
+                other_agent.log.flush()
+        self.assertEqual(
+            self.messages()[-1],
+            'The agent is running (message repeated 2 times)',
+        )
+
+    @patch('atexit.register')
+    def test_registers_exit_flush_with_the_rate_limiter(self, mock1):
+        self.log.info('The agent is running')
+        self.assertEqual(mock1.call_args_list, [call(self.log.flush)])
+
+    def test_counts_messages_by_template(self):
+        for pid in range(5):
+            self.log.info('Process %d is running', pid)
+        self.assertEqual(
+            self.messages(),
+            ['Process 0 is running', 'Process 1 is running'],
+        )
+
+    def test_counts_exit_messages_separately(self):
+        self.agent.LOG_RATE_LIMITS = {'info': 1}
+        self.agent.exit.output('success', 'The agent is running', 0)
+        self.agent.exit.output('success', 'Process started with pid 42', 0)
+        self.agent.exit.output('success', 'Used 100% of the memory', 0)
+        self.assertEqual(
+            self.messages(),
+            [
+                'success: The agent is running - exit code: 0',
+                'success: Process started with pid 42 - exit code: 0',
+                'success: Used 100% of the memory - exit code: 0',
+            ],
+        )
+
+    def test_merges_counters_of_concurrent_invocations(self):
+        self.agent.LOCK_DIR = self.directory
+        other_agent = UnitTestAgent()
+        other_agent.CACHE_DIR = self.directory
+        other_agent.LOCK_DIR = self.directory
+        other_agent.LOG_RATE_WINDOW = 60
+        other_agent.LOG_RATE_LIMITS = {'info': 2}
+        record = logging.makeLogRecord({
+            'msg': 'The agent is running',
+            'levelno': logging.INFO,
+            'levelname': 'INFO',
+        })
+        with patch('time.time', return_value=1000):
+            self.log.info('The agent is running')
+            self.log.rate_limiter.save()
+            self.assertTrue(other_agent.log.rate_limiter.filter(record))
+            for number in range(3):
+                self.log.info('The agent is running')
+            self.log.flush()
+            other_agent.log.rate_limiter.save()
+        with patch('time.time', return_value=1100):
+            self.log.rate_limiter._state = None
+            self.log.info('The agent is running')
+        self.assertEqual(
+            self.messages()[-1],
+            'The agent is running (message repeated 2 times)',
+        )
+
+    def test_is_disabled_by_default(self):
+        self.agent.LOG_RATE_WINDOW = 0
+        for number in range(5):
+            self.log.info('The agent is running')
+        self.assertEqual(len(self.records), 5)
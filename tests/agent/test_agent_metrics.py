@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from tests.fixtures.agents import UnitTestAgent
+from ocf_agent.agent import Agent
+from mock import patch
+
+STAT = (
+    '%d (my (service)) S 1 %d %d 0 -1 4194560 100 0 0 0 '
+    '%d %d 0 0 20 0 %d 0 12345 1000000 %d 0 0 0 0 0 0 0 0 0 0 0 0 0 17 '
+    '0 0 0 0 0 0\n'
+)
+IO = """\
+rchar: 100
+wchar: 200
+syscr: 1
+syscw: 2
+read_bytes: %d
+write_bytes: %d
+cancelled_write_bytes: 0
+"""
+
+
+class TestMetricsAgent(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.root = os.path.join(self.directory, 'proc')
+        self.agent = UnitTestAgent()
+        self.agent.LOCK_DIR = self.directory
+        self.metrics = self.agent.metrics
+        self.metrics.root = self.root
+        self.patches = [
+            patch('os.sysconf', side_effect=lambda name: {
+                'SC_CLK_TCK': 100, 'SC_PAGE_SIZE': 4096,
+            }[name]),
+        ]
+        for patcher in self.patches:
+            patcher.start()
+        self.make_process(100, utime=150, stime=50, threads=4, rss=256,
+                          read=1000, write=2000, fds=3)
+
+    def tearDown(self):
+        for patcher in self.patches:
+            patcher.stop()
+        shutil.rmtree(self.directory)
+        del self.agent
+        del self.metrics
+
+    def make_process(self, pid, utime, stime, threads, rss, read, write, fds):
+        directory = os.path.join(self.root, str(pid))
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
+        os.makedirs(os.path.join(directory, 'fd'))
+        with open(os.path.join(directory, 'stat'), 'w') as stat:
+            stat.write(STAT % (pid, pid, pid, utime, stime, threads, rss))
+        with open(os.path.join(directory, 'io'), 'w') as io:
+            io.write(IO % (read, write))
+        for number in range(fds):
+            open(os.path.join(directory, 'fd', str(number)), 'w').close()
+
+    def test_has_agent(self):
+        self.assertEquals(self.metrics.agent, self.agent)
+        self.assertIsInstance(self.metrics.agent, Agent)
+
+    def test_can_read_process(self):
+        self.assertEquals(
+            self.metrics.read_process(100),
+            {
+                'cpu_time': 2.0,
+                'threads': 4,
+                'rss': 256 * 4096,
+                'read_bytes': 1000,
+                'write_bytes': 2000,
+                'fds': 3,
+            },
+        )
+        self.assertEquals(self.metrics.read_process(200), None)
+
+    def test_unreadable_io_is_none(self):
+        os.remove(os.path.join(self.root, '100', 'io'))
+        counters = self.metrics.read_process(100)
+        self.assertEquals(counters['read_bytes'], None)
+        self.assertEquals(counters['cpu_time'], 2.0)
+
+    @patch('ocf_agent.modules.process.Process.descendants',
+           return_value=[101, 102])
+    def test_can_sample_tree(self, mock1):
+        self.make_process(101, utime=100, stime=0, threads=1, rss=100,
+                          read=0, write=10, fds=2)
+        sample = self.metrics.sample(100)
+        self.assertEquals(sample['processes'], 1)
+        self.assertFalse(mock1.called)
+        sample = self.metrics.sample(100, tree=True)
+        mock1.assert_called_with(100)
+        self.assertEquals(sample['processes'], 2)
+        self.assertEquals(sample['cpu_time'], 3.0)
+        self.assertEquals(sample['rss'], 356 * 4096)
+        self.assertEquals(sample['fds'], 5)
+        self.assertEquals(sample['write_bytes'], 2010)
+
+    def test_rates(self):
+        previous = {'pid': 100, 'time': 10.0, 'cpu_time': 1.0, 'rss': 1000,
+                    'read_bytes': 0, 'write_bytes': None}
+        sample = {'pid': 100, 'time': 12.0, 'cpu_time': 2.0, 'rss': 3000,
+                  'read_bytes': 100, 'write_bytes': 100}
+        self.assertEquals(
+            self.metrics.rates(sample, previous),
+            {'cpu_percent': 50.0, 'rss_rate': 1000.0,
+             'read_rate': 50.0, 'write_rate': None},
+        )
+        previous['pid'] = 200
+        self.assertEquals(
+            self.metrics.rates(sample, previous)['cpu_percent'], None
+        )
+        self.assertEquals(
+            self.metrics.rates(sample, None)['cpu_percent'], None
+        )
+
+    def test_decreased_counters_have_no_rate(self):
+        previous = {'pid': 100, 'time': 10.0, 'cpu_time': 5.0, 'rss': 3000,
+                    'read_bytes': 500, 'write_bytes': 100}
+        sample = {'pid': 100, 'time': 12.0, 'cpu_time': 2.0, 'rss': 1000,
+                  'read_bytes': 100, 'write_bytes': 100}
+        self.assertEquals(
+            self.metrics.rates(sample, previous),
+            {'cpu_percent': None, 'rss_rate': -1000.0,
+             'read_rate': None, 'write_rate': 0.0},
+        )
+
+    @patch('ocf_agent.modules.lock.Lock.acquire', return_value=None)
+    def test_collect_does_not_exit_if_state_is_locked(self, mock1):
+        self.assertEquals(self.metrics.collect(100)['pid'], 100)
+
+    def test_collect_saves_sample_and_calculates_rates(self):
+        with patch('time.time', return_value=1000.0):
+            metrics = self.metrics.collect(100)
+        self.assertEquals(metrics['cpu_percent'], None)
+        self.assertEquals(self.agent.state.get('metrics')['cpu_time'], 2.0)
+        self.make_process(100, utime=250, stime=50, threads=4, rss=256,
+                          read=3000, write=2000, fds=3)
+        with patch('time.time', return_value=1010.0):
+            metrics = self.metrics.collect(100)
+        self.assertEquals(metrics['cpu_percent'], 10.0)
+        self.assertEquals(metrics['read_rate'], 200.0)
+        self.assertEquals(metrics['rss_rate'], 0.0)
+
+    def test_collect_missing_process(self):
+        self.assertEquals(self.metrics.collect(200), None)
+
+    def test_collect_uses_pid_file(self):
+        with patch('ocf_agent.modules.pid.Pid.read_file', return_value=100):
+            self.assertEquals(self.metrics.collect()['pid'], 100)
+
+    @patch('ocf_agent.modules.log.Log.info')
+    def test_collect_logs_pid_read_as_string(self, mock1):
+        self.assertEquals(self.metrics.collect('100')['pid'], 100)
+        message = mock1.call_args[0][0] % mock1.call_args[0][1:]
+        self.assertTrue(message.startswith('Resource usage of pid 100: '))
+
+    def test_writes_metrics_file(self):
+        self.assertEquals(self.metrics.file_path, None)
+        self.agent.METRICS_DIR = self.directory
+        self.metrics.collect(100)
+        with open(self.metrics.file_path, 'r') as metrics_file:
+            lines = metrics_file.read().splitlines()
+        self.assertIn(
+            'ocf_agent_fds{agent="configured_ocf_agent",'
+            'instance="configured_ocf_agent"} 3',
+            lines,
+        )
+        self.assertFalse(any('cpu_percent' in line for line in lines))
+
+    @patch('ocf_agent.modules.exit.Exit.error_generic', side_effect=SystemExit)
+    def test_limits(self, mock1):
+        self.agent.METRICS_LIMITS = {'fds': 10, 'rss': 1024}
+        with self.assertRaises(SystemExit):
+            self.metrics.collect(100)
+        self.assertEquals(
+            mock1.call_args[0][0],
+            'Resource usage limits exceeded: rss 1048576 > 1024',
+        )
+
+    def test_can_sample_real_process(self):
+        self.metrics.root = '/proc'
+        self.patches[0].stop()
+        self.patches = []
+        sample = self.metrics.sample(os.getpid())
+        self.assertTrue(sample['rss'] > 0)
+        self.assertTrue(sample['threads'] >= 1)
+        self.assertTrue(sample['fds'] >= 3)
@@ -1,4 +1,8 @@
 # -*- coding: utf-8 -*-
+import os
+import shutil
+import sys
+import tempfile
 from unittest import TestCase
 from tests.fixtures.agents import UnitTestAgent
 from ocf_agent.agent import Agent
@@ -49,7 +53,7 @@ class TestPidAgent(TestCase):
             'configured_ocf_agent-unit_test_agent-test.pid',
         )
 
-    @patch('os.mkdir')
+    @patch('os.makedirs')
     @patch('os.path')
     def test_can_make_directory(self, mock1, mock2):
         mock2.return_value = None
@@ -109,3 +113,78 @@ class TestPidAgent(TestCase):
     #     self.assertTrue(mock2.called)
     #     mock3.assert_called_once_with('/path/to/file', 'r')
     #     self.assertEqual(pid, 1)
+
+
+class TestPidRecord(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.agent = UnitTestAgent()
+        self.agent.PID_DIR = os.path.join(self.directory, 'run')
+        self.pid = self.agent.pid
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        del self.agent
+        del self.pid
+
+    def test_can_parse_service_pid_file(self):
+        self.assertEqual(
+            self.pid.parse('123\n'),
+            {'pid': 123, 'starttime': None, 'exe': None},
+        )
+        self.assertEqual(self.pid.parse(''), None)
+        self.assertEqual(self.pid.parse('none\n'), None)
+
+    def test_can_create_file_with_identity(self):
+        self.pid.create(os.getpid())
+        with open(self.pid.path, 'r') as pid_file:
+            lines = pid_file.read().splitlines()
+        self.assertEqual(lines[0], str(os.getpid()))
+        self.pid.records.clear()
+        record = self.pid.record
+        identity = self.agent.process.identity(os.getpid())
+        self.assertEqual(record['pid'], os.getpid())
+        self.assertEqual(record['starttime'], identity['starttime'])
+        self.assertEqual(
+            record['exe'],
+            os.path.realpath(sys.executable),
+        )
+        self.assertTrue(self.pid.is_running)
+
+    def test_record_is_read_once(self):
+        self.pid.create(os.getpid())
+        self.pid.records.clear()
+        self.assertEqual(self.pid.number, os.getpid())
+        with patch('ocf_agent.modules.pid.open', create=True) as mock:
+            self.assertEqual(self.pid.number, os.getpid())
+            self.assertFalse(mock.called)
+
+    def test_missing_record_is_read_again(self):
+        self.assertEqual(self.pid.number, None)
+        self.pid.make_directory()
+        with open(self.pid.path, 'w') as pid_file:
+            pid_file.write('%d\n' % os.getpid())
+        self.assertEqual(self.pid.number, os.getpid())
+
+    def test_record_is_invalidated(self):
+        self.pid.create(os.getpid())
+        self.assertEqual(self.pid.number, os.getpid())
+        self.pid.remove()
+        self.assertEqual(self.pid.number, None)
+        self.assertFalse(self.pid.is_running)
+        self.pid.create(os.getppid())
+        self.assertEqual(self.pid.number, os.getppid())
+
+    def test_reused_pid_is_not_running(self):
+        self.pid.make_directory()
+        with open(self.pid.path, 'w') as pid_file:
+            pid_file.write('%d\nstarttime=1\n' % os.getpid())
+        self.assertFalse(self.pid.is_running)
+        self.pid.records.clear()
+        with open(self.pid.path, 'w') as pid_file:
+            pid_file.write('%d\nexe=/bin/false\n' % os.getpid())
+        self.assertFalse(self.pid.is_running)
+        self.pid.records.clear()
+        with open(self.pid.path, 'w') as pid_file:
+            pid_file.write('%d\n' % os.getpid())
+        self.assertTrue(self.pid.is_running)
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+from tests.fixtures.agents import UnitTestAgent
+from ocf_agent.agent import Agent
+from mock import patch
+
+CPU_PRESSURE = """\
+some avg10=12.50 avg60=8.00 avg300=2.00 total=1000
+full avg10=1.00 avg60=0.50 avg300=0.10 total=100
+"""
+
+
+class TestPressureAgent(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.pressure_dir = os.path.join(self.directory, 'pressure')
+        os.mkdir(self.pressure_dir)
+        with open(os.path.join(self.pressure_dir, 'cpu'), 'w') as cpu:
+            cpu.write(CPU_PRESSURE)
+        self.loadavg = os.path.join(self.directory, 'loadavg')
+        with open(self.loadavg, 'w') as loadavg:
+            loadavg.write('4.00 2.00 1.00 2/71 7409\n')
+        self.agent = UnitTestAgent()
+        self.agent.CACHE_DIR = os.path.join(self.directory, 'cache')
+        self.pressure = self.agent.pressure
+        self.patches = [
+            patch('ocf_agent.constants.PRESSURE_DIR', self.pressure_dir),
+            patch('ocf_agent.constants.LOADAVG_FILE', self.loadavg),
+            patch('multiprocessing.cpu_count', return_value=2),
+        ]
+        for patcher in self.patches:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in self.patches:
+            patcher.stop()
+        shutil.rmtree(self.directory)
+        del self.agent
+        del self.pressure
+
+    def test_has_agent(self):
+        self.assertEquals(self.pressure.agent, self.agent)
+        self.assertIsInstance(self.pressure.agent, Agent)
+
+    def test_can_read_pressure(self):
+        self.assertEqual(self.pressure.read_pressure('cpu'), 12.5)
+        self.assertEqual(self.pressure.read_pressure('io'), None)
+
+    def test_can_read_load(self):
+        self.assertEqual(self.pressure.read_load(), 2.0)
+
+    def test_readings_are_shared(self):
+        readings = self.pressure.readings
+        self.assertEqual(readings['cpu'], 12.5)
+        self.assertEqual(readings['memory'], None)
+        self.assertEqual(readings['load'], 2.0)
+        self.assertNotIn('time', readings)
+        with open(self.pressure.cache_file_path, 'r') as cache_file:
+            self.assertEqual(json.load(cache_file)['readings'], readings)
+        other = UnitTestAgent()
+        other.CACHE_DIR = self.agent.CACHE_DIR
+        with patch('ocf_agent.modules.pressure.Pressure.read') as mock:
+            self.assertEqual(other.pressure.readings, readings)
+            self.assertFalse(mock.called)
+
+    def test_outdated_readings_are_read_again(self):
+        readings = dict(self.pressure.readings, load=100.0)
+        with open(self.pressure.cache_file_path, 'w') as cache_file:
+            json.dump(
+                {'time': time.time() - 60, 'readings': readings}, cache_file
+            )
+        other = UnitTestAgent()
+        other.CACHE_DIR = self.agent.CACHE_DIR
+        self.assertEqual(other.pressure.readings['load'], 2.0)
+
+    def test_can_compare_limits(self):
+        self.assertEqual(
+            self.pressure.exceeded({'cpu': 10, 'io': 1, 'load': 4}),
+            [('cpu', 12.5, 10)],
+        )
+        self.assertEqual(self.pressure.exceeded({'cpu': 20}), [])
+        self.assertEqual(self.pressure.exceeded({'time': 0}), [])
+
+    def test_pressure_limits_without_pressure(self):
+        os.remove(os.path.join(self.pressure_dir, 'cpu'))
+        self.assertEqual(
+            self.pressure.exceeded({'cpu': 10, 'load': 1}),
+            [('load', 2.0, 1)],
+        )
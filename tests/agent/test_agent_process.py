@@ -0,0 +1,807 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from unittest import TestCase
+from mock import patch
+from tests.fixtures.agents import UnitTestAgent
+from ocf_agent.agent import Agent
+from ocf_agent import constants
+from ocf_agent.modules.lock import FileLock
+from ocf_agent.modules.process import ProcessSnapshot
+
+IGNORE_TERM = (
+    'import signal, sys, time; '
+    'signal.signal(signal.SIGTERM, signal.SIG_IGN); '
+    'sys.stdout.write("ready\\n"); sys.stdout.flush(); '
+    'time.sleep(30)'
+)
+
+
+class TestProcessAgent(TestCase):
+    def setUp(self):
+        self.agent = UnitTestAgent()
+        self.process = self.agent.process
+
+    def tearDown(self):
+        del self.agent
+        del self.process
+
+    def test_has_agent(self):
+        self.assertEquals(self.process.agent, self.agent)
+        self.assertIsInstance(self.process.agent, Agent)
+
+    def test_can_get_identity(self):
+        identity = self.process.identity(os.getpid())
+        self.assertEqual(identity['pid'], os.getpid())
+        self.assertEqual(identity['status'], 'running')
+        self.assertTrue(identity['starttime'] > 0)
+        self.assertEqual(self.process.identity(None), None)
+
+    def test_can_check_running_process(self):
+        identity = self.process.identity(os.getpid())
+        self.assertTrue(self.process.is_running(os.getpid()))
+        self.assertTrue(
+            self.process.is_running(
+                os.getpid(),
+                starttime=identity['starttime'],
+                exe=identity['exe'],
+            )
+        )
+        self.assertFalse(
+            self.process.is_running(
+                os.getpid(),
+                starttime=identity['starttime'] + 1,
+            )
+        )
+        self.assertFalse(self.process.is_running(None))
+
+    def test_zombie_is_not_running(self):
+        child = subprocess.Popen(['true'])
+        for _ in range(100):
+            identity = self.process.identity(child.pid)
+            if identity['status'] == 'zombie':
+                break
+            time.sleep(0.01)
+        self.assertFalse(self.process.is_running(child.pid))
+        child.wait()
+        self.assertFalse(self.process.is_running(child.pid))
+
+
+class TestProcessStop(TestCase):
+    def setUp(self):
+        self.agent = UnitTestAgent()
+        self.process = self.agent.process
+
+    def tearDown(self):
+        del self.agent
+        del self.process
+
+    def test_can_get_signal_number(self):
+        self.assertEqual(self.process.signal_number('SIGTERM'), 15)
+        self.assertEqual(self.process.signal_number('kill'), 9)
+        self.assertEqual(self.process.signal_number(2), 2)
+
+    def test_stop_does_not_wait_for_interval(self):
+        child = subprocess.Popen(['sleep', '30'])
+        started = time.time()
+        self.assertTrue(self.process.stop(child.pid, timeout=10))
+        self.assertTrue(time.time() - started < 0.5)
+        self.assertFalse(self.process.is_running(child.pid))
+        self.assertFalse(os.path.exists('/proc/%d' % child.pid))
+
+    def test_stop_escalates_signals(self):
+        child = subprocess.Popen(
+            [sys.executable, '-c', IGNORE_TERM],
+            stdout=subprocess.PIPE,
+        )
+        child.stdout.readline()
+        started = time.time()
+        with patch.object(self.agent.log, 'info') as mock:
+            self.assertTrue(
+                self.process.stop(
+                    child.pid,
+                    [('SIGTERM', 0.1), ('SIGKILL', 1.0)],
+                    timeout=6,
+                )
+            )
+        self.assertTrue(time.time() - started < 2)
+        self.assertEqual(mock.call_count, 2)
+        self.assertEqual(mock.call_args_list[0][0][2], 0)
+        child.wait()
+        child.stdout.close()
+
+    @patch('ocf_agent.modules.process.Process.watch', return_value=None)
+    def test_stop_without_pid_descriptor(self, mock1):
+        child = subprocess.Popen(['sleep', '30'])
+        self.assertTrue(self.process.ensure_terminate(child.pid))
+        self.assertTrue(mock1.called)
+        self.assertNotEqual(child.poll(), None)
+
+    def test_stop_not_running_process(self):
+        self.assertTrue(self.process.ensure_kill(None))
+
+
+class TestProcessTreeStop(TestCase):
+    def setUp(self):
+        self.agent = UnitTestAgent()
+        self.process = self.agent.process
+
+    def tearDown(self):
+        del self.agent
+        del self.process
+
+    def start_tree(self, **kwargs):
+        process = self.process.daemonize(
+            'sh', '-c', 'sleep 30 & sleep 30 & wait', output=False, **kwargs
+        )
+        for _ in range(200):
+            if len(self.process.descendants(process.pid)) == 2:
+                break
+            time.sleep(0.01)
+        return process
+
+    def test_can_get_descendants(self):
+        process = self.start_tree()
+        descendants = self.process.descendants(process.pid)
+        self.assertEqual(len(descendants), 2)
+        self.assertTrue(self.process.stop_tree(process.pid, timeout=5))
+
+    def test_can_stop_tree(self):
+        process = self.start_tree()
+        descendants = self.process.descendants(process.pid)
+        started = time.time()
+        self.assertTrue(self.process.stop_tree(process.pid, timeout=5))
+        self.assertTrue(time.time() - started < 1)
+        for pid in [process.pid] + descendants:
+            self.assertFalse(self.process.is_running(pid))
+
+    def test_logs_rescanned_processes(self):
+        process = self.start_tree()
+        descendants = self.process.descendants(process.pid)
+        with patch.object(self.agent.log, 'info') as mock:
+            self.assertTrue(
+                self.process.stop_processes(
+                    [process.pid], timeout=5,
+                    rescan=lambda running: descendants,
+                )
+            )
+        self.assertEqual(
+            mock.call_args_list[0][0][1],
+            ', '.join(str(pid) for pid in sorted(
+                [process.pid] + descendants
+            )),
+        )
+
+    def test_can_stop_group(self):
+        process = self.start_tree(session=True)
+        self.assertEqual(os.getpgid(process.pid), process.pid)
+        descendants = self.process.descendants(process.pid)
+        self.assertTrue(self.process.group_is_running(process.pid))
+        self.assertTrue(self.process.stop_group(process.pid, timeout=5))
+        for pid in [process.pid] + descendants:
+            self.assertFalse(self.process.is_running(pid))
+
+    @patch('ocf_agent.modules.process.Process.stop_tree', return_value=True)
+    def test_own_group_is_not_signalled(self, mock1):
+        child = subprocess.Popen(['sleep', '30'])
+        self.assertTrue(self.process.stop_group(child.pid))
+        self.assertTrue(mock1.called)
+        child.kill()
+        child.wait()
+
+
+class TestProcessSearch(TestCase):
+    def setUp(self):
+        self.agent = UnitTestAgent()
+        self.process = self.agent.process
+        self.child = subprocess.Popen(['sleep', '30.5'])
+        for _ in range(200):
+            if self.process.get(self.child.pid)['name'] == 'sleep':
+                break
+            time.sleep(0.01)
+
+    def tearDown(self):
+        self.child.kill()
+        self.child.wait()
+        del self.agent
+        del self.process
+
+    def test_entries_have_requested_attributes(self):
+        entry = next(self.process.entries(['pid', 'name']))
+        self.assertEqual(sorted(entry), ['name', 'pid'])
+        entry = next(self.process.entries())
+        self.assertEqual(
+            sorted(entry),
+            ['cmdline', 'exe', 'name', 'pgid', 'pid', 'ppid', 'starttime',
+             'status', 'uid'],
+        )
+
+    def test_can_search_exact(self):
+        found = list(self.process.search(name='sleep', ppid=os.getpid()))
+        self.assertEqual([entry['pid'] for entry in found], [self.child.pid])
+        self.assertEqual(
+            list(self.process.search(name='slee', ppid=os.getpid())), [],
+        )
+
+    def test_can_search_prefix(self):
+        found = self.process.find_first(
+            cmdline='sleep 30.', prefix=True, uid=os.getuid(),
+        )
+        self.assertEqual(found['pid'], self.child.pid)
+
+    def test_can_search_regex(self):
+        found = self.process.find_first(
+            name=re.compile('^sl'), cmdline=re.compile(r'30\.5$'),
+        )
+        self.assertEqual(found['pid'], self.child.pid)
+        self.assertEqual(found['cmdline'], ['sleep', '30.5'])
+
+    def test_search_is_lazy(self):
+        with patch(
+            'ocf_agent.modules.process.Process.entries',
+            return_value=iter([{'pid': 1, 'ppid': 0, 'name': 'a'},
+                               {'pid': 2, 'ppid': 0, 'name': 'a'}]),
+        ) as mock:
+            self.assertEqual(self.process.find_first(name='a')['pid'], 1)
+            mock.assert_called_once_with(['pid', 'ppid', 'name'])
+
+    def test_can_find(self):
+        found = self.process.find('30.5')
+        self.assertIn(self.child.pid, [entry['pid'] for entry in found])
+
+
+class TestProcessSnapshot(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.agent = UnitTestAgent()
+        self.agent.CACHE_DIR = self.directory
+        self.process = self.agent.process
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        del self.agent
+        del self.process
+
+    def test_snapshot_is_reused(self):
+        snapshot = self.process.snapshot
+        self.assertIs(self.process.snapshot, snapshot)
+        self.assertTrue(snapshot.is_running(os.getpid()))
+        self.assertTrue(os.getpid() in snapshot)
+        self.assertEqual(snapshot.get(os.getpid())['ppid'], os.getppid())
+        self.process.refresh()
+        self.assertIsNot(self.process.snapshot, snapshot)
+
+    def test_dead_processes_are_not_running(self):
+        snapshot = ProcessSnapshot([
+            {'pid': 10, 'status': 'sleeping'},
+            {'pid': 11, 'status': 'zombie'},
+            {'pid': 12, 'status': 'dead'},
+        ], time.time())
+        self.assertTrue(snapshot.is_running(10))
+        self.assertFalse(snapshot.is_running(11))
+        self.assertFalse(12 in snapshot)
+
+    def test_snapshot_is_not_shared_by_default(self):
+        self.assertNotEqual(self.process.snapshot, None)
+        self.assertFalse(os.path.exists(self.process.snapshot_path))
+
+    def test_can_search_snapshot(self):
+        child = subprocess.Popen(['sleep', '30'])
+        for _ in range(200):
+            if self.process.get(child.pid)['name'] == 'sleep':
+                break
+            time.sleep(0.01)
+        try:
+            snapshot = self.process.snapshot
+            self.assertEqual(
+                [entry['pid'] for entry in snapshot.children(os.getpid())],
+                [child.pid],
+            )
+            self.assertEqual(
+                snapshot.find_first(name='sleep', ppid=os.getpid())['pid'],
+                child.pid,
+            )
+            self.assertEqual(
+                snapshot.find_first(cmdline=re.compile('^sleep 30'))['pid'],
+                child.pid,
+            )
+            self.assertIn(
+                child.pid,
+                [entry['pid'] for entry in
+                 snapshot.descendants(os.getppid())],
+            )
+        finally:
+            child.kill()
+            child.wait()
+
+    def test_snapshot_is_shared(self):
+        self.agent.PROCESS_SNAPSHOT_TTL = 5
+        snapshot = self.process.snapshot
+        self.assertTrue(os.path.exists(self.process.snapshot_path))
+        other = UnitTestAgent()
+        other.CACHE_DIR = self.directory
+        other.PROCESS_SNAPSHOT_TTL = 5
+        with patch('ocf_agent.modules.process.Process.entries') as mock:
+            shared = other.process.snapshot
+            self.assertFalse(mock.called)
+        self.assertEqual(shared.time, snapshot.time)
+        self.assertEqual(
+            shared.get(os.getpid())['name'],
+            snapshot.get(os.getpid())['name'],
+        )
+
+    def test_outdated_snapshot_is_not_shared(self):
+        self.agent.PROCESS_SNAPSHOT_TTL = 0.01
+        snapshot = self.process.snapshot
+        time.sleep(0.02)
+        self.process.refresh()
+        self.assertNotEqual(self.process.snapshot.time, snapshot.time)
+
+
+NOTIFY_READY = (
+    'import os, socket, time; '
+    'notify = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM); '
+    'notify.sendto(("STATUS=up\\nMAINPID=%d\\nREADY=1" % os.getpid())'
+    '.encode(), os.environ["NOTIFY_SOCKET"]); '
+    'time.sleep(30)'
+)
+
+
+class TestProcessDaemon(TestCase):
+    def setUp(self):
+        self.agent = UnitTestAgent()
+        self.agent.PID_DIR = tempfile.mkdtemp()
+        self.agent.DAEMON_OUTPUT_DIR = self.agent.PID_DIR
+        self.process = self.agent.process
+        self.started = []
+
+    def tearDown(self):
+        for process in self.started:
+            self.process.stop_group(process.pid, timeout=5)
+        shutil.rmtree(self.agent.PID_DIR)
+        del self.agent
+        del self.process
+
+    def daemonize(self, *args, **kwargs):
+        started = time.time()
+        process = self.process.daemonize(*args, **kwargs)
+        self.started.append(process)
+        return process, time.time() - started
+
+    def remember(self, function):
+        def _remember_(process, *args, **kwargs):
+            function(process, *args, **kwargs)
+            self.started.append(process)
+        return _remember_
+
+    def test_daemon_has_own_session(self):
+        process, spent = self.daemonize('sleep', '30')
+        self.assertEqual(os.getsid(process.pid), process.pid)
+        self.assertEqual(process.main_pid, process.pid)
+
+    @patch('ocf_agent.modules.process.NEW_SESSION_ARGUMENT', False)
+    def test_daemon_session_without_popen_argument(self):
+        with patch('subprocess.Popen.__init__', autospec=True,
+                   side_effect=self.remember(subprocess.Popen.__init__)) \
+                as mock1:
+            self.process.daemonize('sleep', '30')
+        self.assertNotIn('start_new_session', mock1.call_args[1])
+        process = self.started[0]
+        self.assertEqual(os.getsid(process.pid), process.pid)
+
+    def test_ready_by_notification(self):
+        process, spent = self.daemonize(
+            sys.executable, '-c', NOTIFY_READY,
+            ready='notify', timeout=10,
+        )
+        self.assertTrue(spent < 5)
+        self.assertTrue(self.process.is_running(process.pid))
+        self.assertEqual(process.main_pid, process.pid)
+
+    def test_ready_by_descriptor(self):
+        process, spent = self.daemonize(
+            'sh', '-c', 'sleep 0.1; echo >&5; sleep 30',
+            ready='fd', ready_fd=5, timeout=10,
+        )
+        self.assertTrue(spent < 5)
+        self.assertTrue(self.process.is_running(process.pid))
+
+    def test_ready_descriptor_taken_by_the_agent(self):
+        taken = os.open(os.devnull, os.O_RDONLY)
+        try:
+            process, spent = self.daemonize(
+                sys.executable, '-c',
+                'import os, time; os.write(%d, b"\\n"); time.sleep(30)' %
+                taken,
+                ready='fd', ready_fd=taken, timeout=10,
+            )
+        finally:
+            os.close(taken)
+        self.assertTrue(spent < 5)
+        self.assertTrue(self.process.is_running(process.pid))
+
+    def test_daemon_does_not_inherit_locks(self):
+        lock = FileLock(os.path.join(self.agent.PID_DIR, 'held.lock'))
+        self.assertTrue(lock.acquire(0))
+        try:
+            process, spent = self.daemonize(
+                'sh', '-c', 'echo >&3; sleep 30', ready='fd', timeout=10,
+            )
+            directory = '/proc/%d/fd' % process.pid
+            targets = [
+                os.readlink(os.path.join(directory, name))
+                for name in os.listdir(directory)
+            ]
+            self.assertNotIn(lock.path, targets)
+        finally:
+            lock.release()
+
+    def test_ready_by_probe(self):
+        calls = []
+
+        def probe(process):
+            calls.append(process.pid)
+            return len(calls) == 3
+
+        process, spent = self.daemonize(
+            'sleep', '30', ready=probe, timeout=10,
+        )
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(calls[0], process.pid)
+
+    def test_writes_pid_record(self):
+        process, spent = self.daemonize(
+            'sleep', '30', pid_file=True,
+        )
+        self.agent.pid.records.clear()
+        self.assertEqual(self.agent.pid.number, process.pid)
+        self.assertTrue(self.agent.pid.is_running)
+
+    @patch('ocf_agent.modules.exit.Exit.error_generic', side_effect=SystemExit)
+    def test_fails_fast_if_daemon_exits(self, mock1):
+        started = time.time()
+        with self.assertRaises(SystemExit):
+            self.process.daemonize(
+                'sh', '-c', 'echo broken config >&2; exit 3',
+                ready='fd', timeout=10, output=True,
+            )
+        self.assertTrue(time.time() - started < 5)
+        message = mock1.call_args[0][0]
+        self.assertIn('exited with code 3', message)
+        self.assertIn('broken config', message)
+
+    @patch('ocf_agent.modules.exit.Exit.error_generic', side_effect=SystemExit)
+    def test_reports_early_stderr_without_output_file(self, mock1):
+        with self.assertRaises(SystemExit):
+            self.process.daemonize(
+                'sh', '-c', 'echo broken config >&2; exit 3',
+                ready='fd', timeout=10,
+            )
+        message = mock1.call_args[0][0]
+        self.assertIn('exited with code 3', message)
+        self.assertIn('broken config', message)
+
+    def test_truncates_early_stderr_when_ready(self):
+        process, started = self.daemonize(
+            'sh', '-c', 'echo starting >&2; echo >&3; sleep 30',
+            ready='fd', timeout=10,
+        )
+        stderr = '/proc/%d/fd/2' % process.pid
+        self.assertTrue(os.readlink(stderr).endswith('(deleted)'))
+        self.assertEqual(os.stat(stderr).st_size, 0)
+
+    @patch('ocf_agent.modules.exit.Exit.error_generic', side_effect=SystemExit)
+    def test_stops_daemon_not_ready_in_time(self, mock1):
+        with patch('subprocess.Popen.__init__', autospec=True,
+                   side_effect=self.remember(subprocess.Popen.__init__)):
+            with self.assertRaises(SystemExit):
+                self.process.daemonize(
+                    'sleep', '30', ready='fd', timeout=0.2,
+                )
+        self.assertIn('has not become ready', mock1.call_args[0][0])
+        self.assertFalse(self.process.is_running(self.started[0].pid))
+
+    @patch('ocf_agent.modules.exit.Exit.error_configuration',
+           side_effect=SystemExit)
+    def test_unknown_readiness(self, mock1):
+        with self.assertRaises(SystemExit):
+            self.process.daemonize('sleep', '30', ready='unknown')
+
+
+class TestProcessOutput(TestCase):
+    def setUp(self):
+        self.agent = UnitTestAgent()
+        self.directory = tempfile.mkdtemp()
+        self.agent.DAEMON_OUTPUT_DIR = self.directory
+        self.agent.LOCK_DIR = self.directory
+        self.agent.PID_DIR = self.directory
+        self.agent.DAEMON_OUTPUT_SIZE = 100
+        self.agent.DAEMON_OUTPUT_ROTATIONS = 2
+        self.process = self.agent.process
+        self.path = self.process.output_path
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        del self.agent
+        del self.process
+
+    def write(self, path, content):
+        with open(path, 'wb') as output_file:
+            output_file.write(content)
+
+    def read(self, path):
+        with open(path, 'rb') as output_file:
+            return output_file.read()
+
+    def test_output_path(self):
+        self.assertEqual(os.path.dirname(self.path), self.directory)
+        self.assertTrue(self.path.endswith('.out'))
+
+    def test_small_file_is_not_rotated(self):
+        self.write(self.path, b'x' * 100)
+        self.assertFalse(self.process.rotate_output())
+        self.assertFalse(os.path.exists(self.path + '.1'))
+
+    def test_missing_file_is_not_rotated(self):
+        self.assertFalse(self.process.rotate_output())
+
+    def test_rotation(self):
+        self.write(self.path, b'a' * 101)
+        self.assertTrue(self.process.rotate_output())
+        self.write(self.path, self.read(self.path) + b'b' * 101)
+        self.assertTrue(self.process.rotate_output())
+        self.write(self.path, self.read(self.path) + b'c' * 101)
+        self.assertTrue(self.process.rotate_output())
+        self.assertEqual(self.read(self.path), b'')
+        self.assertEqual(self.read(self.path + '.1'), b'c' * 101)
+        self.assertEqual(self.read(self.path + '.2'), b'b' * 101)
+        self.assertFalse(os.path.exists(self.path + '.3'))
+
+    def test_daemon_appends_to_output_file(self):
+        self.write(self.path, b'previous\n')
+        process = self.process.daemonize(
+            'sh', '-c', 'echo out; echo err >&2', output=True,
+        )
+        process.wait()
+        self.assertEqual(self.read(self.path), b'previous\nout\nerr\n')
+
+    def test_daemon_output_is_never_hidden(self):
+        for output, target in ((True, self.path), (False, os.devnull)):
+            process = self.process.daemonize('sleep', '30', output=output)
+            try:
+                for descriptor in (1, 2):
+                    self.assertEqual(
+                        os.readlink(
+                            '/proc/%d/fd/%d' % (process.pid, descriptor)
+                        ),
+                        target,
+                    )
+            finally:
+                self.process.stop_group(process.pid, timeout=5)
+
+    def test_monitor_rotates_output_of_running_daemon(self):
+        self.agent.DAEMON_OUTPUT = True
+        process = self.process.daemonize(
+            'sh', '-c', 'while true; do echo line; sleep 0.01; done',
+        )
+        try:
+            for _ in range(500):
+                if os.path.getsize(self.path) > 100:
+                    break
+                time.sleep(0.01)
+            self.agent.handlers.get('monitor').call()
+            self.assertTrue(os.path.isfile(self.path + '.1'))
+            self.assertIsNone(process.poll())
+            time.sleep(0.05)
+            self.assertTrue(self.read(self.path).startswith(b'line\n'))
+        finally:
+            self.process.stop_group(process.pid, timeout=5)
+
+    def test_output_is_disabled_by_default(self):
+        self.assertFalse(self.process.output)
+        process = self.process.daemonize('sleep', '30')
+        try:
+            self.assertEqual(
+                os.readlink('/proc/%d/fd/1' % process.pid), os.devnull,
+            )
+        finally:
+            self.process.stop_group(process.pid, timeout=5)
+        self.assertFalse(os.path.exists(self.path))
+
+    @patch('ocf_agent.modules.log.Log.warning')
+    def test_output_falls_back_to_devnull(self, mock1):
+        blocker = os.path.join(self.directory, 'file')
+        self.write(blocker, b'')
+        self.agent.DAEMON_OUTPUT_DIR = os.path.join(blocker, 'output')
+        process = self.process.daemonize('sleep', '30', output=True)
+        try:
+            self.assertEqual(
+                os.readlink('/proc/%d/fd/1' % process.pid), os.devnull,
+            )
+        finally:
+            self.process.stop_group(process.pid, timeout=5)
+        self.assertTrue(mock1.called)
+
+    @patch('ocf_agent.modules.exit.Exit.error_generic', side_effect=SystemExit)
+    def test_startup_failure_reports_new_output(self, mock1):
+        self.write(self.path, b'old failure\n')
+        with self.assertRaises(SystemExit):
+            self.process.daemonize(
+                'sh', '-c', 'echo broken config >&2; exit 3',
+                ready='fd', timeout=10, output=True,
+            )
+        message = mock1.call_args[0][0]
+        self.assertIn('broken config', message)
+        self.assertNotIn('old failure', message)
+
+    def test_tail_is_bounded(self):
+        self.write(self.path, b'x' * 10000 + b'end')
+        tail = self.process.output_tail()
+        self.assertEqual(len(tail), constants.DAEMON_STDERR_TAIL)
+        self.assertTrue(tail.endswith('end'))
+        self.assertEqual(self.process.output_tail(20000), tail)
+
+
+class TestProcessCommands(TestCase):
+    def setUp(self):
+        self.agent = UnitTestAgent()
+        self.process = self.agent.process
+
+    def tearDown(self):
+        del self.agent
+        del self.process
+
+    def test_minimal_environment(self):
+        variables = {
+            'PATH': '/bin', 'OCF_RESKEY_name': 'value', 'SECRET': 'value',
+        }
+        with patch.dict(os.environ, variables, clear=True):
+            self.assertEquals(
+                self.process.environment({'EXTRA': '1'}),
+                {'PATH': '/bin', 'OCF_RESKEY_name': 'value', 'EXTRA': '1'},
+            )
+            stdout = self.process.sub('env')['stdout']
+        self.assertIn(b'OCF_RESKEY_name=value', stdout)
+        self.assertNotIn(b'SECRET', stdout)
+
+    def test_environment_default_path(self):
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertEquals(
+                self.process.environment()['PATH'],
+                constants.COMMAND_DEFAULT_PATH,
+            )
+
+    def test_whole_environment(self):
+        self.agent.COMMAND_ENVIRONMENT = None
+        with patch.dict(os.environ, {'SECRET': 'value'}):
+            self.assertIsNone(self.process.environment())
+            self.assertEquals(
+                self.process.environment({'EXTRA': '1'})['SECRET'], 'value'
+            )
+
+    def test_sub(self):
+        result = self.process.sub('sh', '-c', 'echo out; echo err >&2; exit 2')
+        self.assertEquals(result['stdout'], b'out\n')
+        self.assertEquals(result['stderr'], b'err\n')
+        self.assertEquals(result['code'], 2)
+        self.assertFalse(result['timeout'])
+
+    def test_run_shell(self):
+        self.assertEquals(self.process.run_shell('exit 3'), 3)
+        self.assertEquals(
+            self.process.sub_shell('echo $((1 + 1))')['stdout'], b'2\n'
+        )
+
+    def test_sub_is_killed_after_timeout(self):
+        started = time.time()
+        result = self.process.sub('sleep', '30', timeout=0.2)
+        self.assertTrue(time.time() - started < 5)
+        self.assertTrue(result['timeout'])
+
+    def test_default_timeout_is_remaining_time(self):
+        with patch('ocf_agent.agent.Agent.remaining', 0.2):
+            result = self.process.sub('sleep', '30')
+        self.assertTrue(result['timeout'])
+
+    def test_stream(self):
+        lines = list(self.process.stream('sh', '-c', 'echo a; echo b >&2'))
+        self.assertEquals(lines, ['a'])
+        lines = list(
+            self.process.stream(
+                'sh', '-c', 'echo b >&2', include_stderr=True,
+            )
+        )
+        self.assertEquals(lines, ['b'])
+
+    def test_stream_passes_stderr_target(self):
+        lines = list(
+            self.process.stream(
+                'sh', '-c', 'echo a; echo b >&2', stderr=subprocess.STDOUT,
+            )
+        )
+        self.assertEquals(lines, ['a', 'b'])
+
+    def test_callback_can_stop_command(self):
+        seen = []
+
+        def callback(stream, line):
+            seen.append(line)
+            return line == 'ready'
+
+        started = time.time()
+        result = self.process.execute(
+            'sh', '-c', 'echo starting; echo ready; sleep 30',
+            callback=callback,
+        )
+        self.assertTrue(time.time() - started < 5)
+        self.assertEquals(seen, ['starting', 'ready'])
+        self.assertFalse(result['timeout'])
+
+    def test_batch_keeps_submission_order(self):
+        results = self.process.batch(
+            [['sh', '-c', 'sleep 0.2; echo first'], 'echo second'],
+        )
+        self.assertEquals(
+            [result['stdout'] for result in results],
+            [b'first\n', b'second\n'],
+        )
+        for result in results:
+            self.assertEquals(result['code'], 0)
+            self.assertTrue(result['duration'] > 0)
+
+    def test_batch_fail_fast(self):
+        results = self.process.batch(
+            ['exit 2', ['sleep', '30'], ['sleep', '30']],
+            parallel=2, fail_fast=True,
+        )
+        self.assertEquals(results[0]['code'], 2)
+        self.assertTrue(results[1]['cancelled'])
+        self.assertTrue(results[2]['cancelled'])
+        self.assertEquals(results[2]['code'], None)
+
+    def test_batch_minimal_environment(self):
+        variables = {'PATH': '/usr/bin:/bin', 'SECRET': 'value'}
+        with patch.dict(os.environ, variables, clear=True):
+            results = self.process.batch([['env'], 'env'])
+        for result in results:
+            self.assertIn(b'PATH=', result['stdout'])
+            self.assertNotIn(b'SECRET', result['stdout'])
+
+    def test_batch_parallelism(self):
+        self.agent.COMMAND_PARALLEL = 1
+        self.assertEquals(self.process.parallel, 1)
+        started = time.time()
+        self.process.batch([['sleep', '0.2'], ['sleep', '0.2']])
+        self.assertTrue(time.time() - started >= 0.4)
+
+    def test_match(self):
+        found = self.process.match(
+            r'port (\d+)', 'sh', '-c', 'echo listening on port 80; sleep 30',
+        )
+        self.assertEquals(found.group(1), '80')
+        self.assertEquals(
+            self.process.match('missing', 'echo', 'nothing'), None
+        )
+
+
+class TestProcessTreeStopPsutil(TestProcessTreeStop):
+    def setUp(self):
+        super(TestProcessTreeStopPsutil, self).setUp()
+        self.agent.PROCESS_BACKEND = 'psutil'
+
+
+class TestProcessSearchPsutil(TestProcessSearch):
+    def setUp(self):
+        self.agent = UnitTestAgent()
+        self.agent.PROCESS_BACKEND = 'psutil'
+        self.process = self.agent.process
+        self.child = subprocess.Popen(['sleep', '30.5'])
+        for _ in range(200):
+            if self.process.get(self.child.pid)['name'] == 'sleep':
+                break
+            time.sleep(0.01)
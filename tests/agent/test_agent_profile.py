@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+import os
+import resource
+import shutil
+import tempfile
+from unittest import TestCase
+from tests.fixtures.agents import UnitTestAgent
+from ocf_agent.agent import Agent
+from ocf_agent.parameter import StringParameter
+from mock import patch
+
+
+class ProfileTestAgent(UnitTestAgent):
+    class OCFParameter_nice(StringParameter):
+        SHORTDESC = "Nice value"
+
+    class OCFParameter_cpu_affinity(StringParameter):
+        SHORTDESC = "CPU list"
+
+
+class TestProfileAgent(TestCase):
+    def setUp(self):
+        self.agent = ProfileTestAgent()
+        self.agent.DAEMON_OUTPUT_DIR = tempfile.mkdtemp()
+        self.profile = self.agent.profile
+        self.environ = patch.dict('os.environ', {}, clear=False)
+        self.environ.start()
+
+    def tearDown(self):
+        self.environ.stop()
+        shutil.rmtree(self.agent.DAEMON_OUTPUT_DIR)
+        del self.agent
+        del self.profile
+
+    def test_has_agent(self):
+        self.assertEquals(self.profile.agent, self.agent)
+        self.assertIsInstance(self.profile.agent, Agent)
+
+    def test_settings_from_constant_and_parameters(self):
+        self.assertEquals(self.profile.settings, {})
+        self.agent.RESOURCE_PROFILE = {'nice': 5, 'limit_core': 0}
+        os.environ['OCF_RESKEY_nice'] = '10'
+        self.assertEquals(
+            self.profile.settings, {'nice': '10', 'limit_core': 0}
+        )
+
+    def test_parse_cpus(self):
+        self.assertEquals(self.profile.parse_cpus('0-2,5'), set([0, 1, 2, 5]))
+        self.assertEquals(self.profile.parse_cpus([1, 3]), set([1, 3]))
+        with self.assertRaises(ValueError):
+            self.profile.parse_cpus(',')
+        with self.assertRaises(ValueError):
+            self.profile.parse_cpus('a-b')
+
+    def test_parse(self):
+        profile = self.profile.parse({
+            'cpu_affinity': '0',
+            'nice': '10',
+            'ionice_class': 'idle',
+            'oom_score_adj': '500',
+            'limit_nofile': '1024:2048',
+            'limit_core': 'unlimited',
+        })
+        self.assertEquals(profile['cpu_affinity'], set([0]))
+        self.assertEquals(profile['nice'], 10)
+        self.assertEquals(profile['ionice'], (3 << 13) | 4)
+        self.assertEquals(profile['oom_score_adj'], 500)
+        self.assertEquals(
+            profile['rlimits'],
+            [
+                (resource.RLIMIT_NOFILE, 1024, 2048),
+                (resource.RLIMIT_CORE, resource.RLIM_INFINITY,
+                 resource.getrlimit(resource.RLIMIT_CORE)[1]),
+            ],
+        )
+
+    def test_parse_errors(self):
+        for settings in (
+            {'nice': '40'},
+            {'nice': 'high'},
+            {'oom_score_adj': '-2000'},
+            {'ionice_class': 'fast'},
+            {'ionice_level': '9'},
+            {'ionice_class': 'none', 'ionice_level': '3'},
+            {'limit_nofile': '2048:1024'},
+            {'limit_nofile': '-1'},
+            {'unknown': '1'},
+        ):
+            with self.assertRaises(ValueError):
+                self.profile.parse(settings)
+
+    def test_parse_class_none(self):
+        self.assertEquals(
+            self.profile.parse({'ionice_class': 'none'})['ionice'], 0
+        )
+
+    def test_check_missing_cpu(self):
+        with self.assertRaises(ValueError):
+            self.profile.check({'cpu_affinity': set([100000])})
+
+    @patch('ocf_agent.modules.exit.Exit.error_configuration',
+           side_effect=SystemExit)
+    def test_validate(self, mock1):
+        self.agent.action = 'monitor'
+        os.environ['OCF_RESKEY_nice'] = '100'
+        self.profile.validate()
+        self.assertFalse(mock1.called)
+        self.agent.action = 'validate-all'
+        with self.assertRaises(SystemExit):
+            self.profile.validate()
+        self.assertIn('nice should be from', mock1.call_args[0][0])
+
+    def test_empty_profile(self):
+        self.assertEquals(self.profile.prepare(), None)
+
+    def test_applied_to_command(self):
+        result = self.agent.process.sub(
+            'sh', '-c', 'ulimit -n; cat /proc/self/stat',
+            profile={'limit_nofile': 100, 'nice': 7},
+        )
+        lines = result['stdout'].decode().splitlines()
+        self.assertEquals(lines[0], '100')
+        fields = lines[1][lines[1].rfind(')') + 2:].split()
+        self.assertEquals(int(fields[16]), 7)
+
+    @patch('ocf_agent.modules.exit.Exit.error_generic',
+           side_effect=SystemExit)
+    def test_failed_profile_is_reported(self, mock1):
+        def apply_profile():
+            raise OSError(22, 'Invalid argument')
+
+        with patch.object(self.profile, 'prepare', return_value=apply_profile):
+            with self.assertRaises(SystemExit):
+                self.agent.process.sub('true', profile=True)
+            self.assertIn('Could not start the command',
+                          mock1.call_args[0][0])
+            with self.assertRaises(SystemExit):
+                self.agent.process.daemonize('sleep', '30')
+            self.assertIn("Could not start the daemon 'sleep'",
+                          mock1.call_args[0][0])
+
+    def test_applied_to_daemon(self):
+        self.agent.RESOURCE_PROFILE = {
+            'cpu_affinity': sorted(os.sched_getaffinity(0))[:1],
+            'oom_score_adj': 300,
+            'ionice_class': 'best-effort',
+            'ionice_level': 6,
+        }
+        process = self.agent.process.daemonize('sleep', '30')
+        try:
+            with open('/proc/%d/oom_score_adj' % process.pid) as score:
+                self.assertEquals(score.read().strip(), '300')
+            self.assertEquals(
+                os.sched_getaffinity(process.pid),
+                set(self.agent.RESOURCE_PROFILE['cpu_affinity']),
+            )
+        finally:
+            self.agent.process.stop(process.pid)
+
+    def test_daemon_without_profile(self):
+        self.agent.RESOURCE_PROFILE = {'oom_score_adj': 300}
+        process = self.agent.process.daemonize('sleep', '30', profile=False)
+        try:
+            with open('/proc/%d/oom_score_adj' % process.pid) as score:
+                self.assertNotEqual(score.read().strip(), '300')
+        finally:
+            self.agent.process.stop(process.pid)
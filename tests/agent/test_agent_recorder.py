@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from tests.fixtures.agents import UnitTestAgent
+from ocf_agent.agent import Agent
+from mock import patch
+
+
+class TestRecorderAgent(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'agent.record')
+        self.agent = UnitTestAgent()
+        self.recorder = self.agent.recorder
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        del self.agent
+        del self.recorder
+
+    def read_records(self):
+        with open(self.path) as record_file:
+            return [json.loads(line) for line in record_file]
+
+    def test_has_agent(self):
+        self.assertEquals(self.recorder.agent, self.agent)
+        self.assertIsInstance(self.recorder.agent, Agent)
+
+    def test_is_disabled_by_default(self):
+        with patch.dict('os.environ', {}, clear=True):
+            self.assertFalse(self.recorder.enabled)
+            self.recorder.record(0)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_can_record_an_invocation(self):
+        environment = {
+            'OCF_AGENT_RECORD': self.path,
+            'OCF_RESKEY_CRM_meta_timeout': '20000',
+            'HA_debug': '0',
+            'HOME': '/root',
+        }
+        with patch.dict('os.environ', environment, clear=True):
+            with patch('sys.argv', ['agent', 'monitor']):
+                self.agent.action = 'monitor'
+                self.recorder.start()
+                self.recorder.record(7)
+                self.recorder.record(0)
+        records = self.read_records()
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[0]['action'], 'monitor')
+        self.assertEqual(records[0]['argv'], ['agent', 'monitor'])
+        self.assertEqual(records[0]['code'], 7)
+        self.assertEqual(records[0]['agent'], 'configured_ocf_agent')
+        self.assertEqual(
+            records[0]['env'],
+            {'OCF_RESKEY_CRM_meta_timeout': '20000', 'HA_debug': '0'},
+        )
+        self.assertGreaterEqual(records[0]['duration'], 0)
+
+    @patch('sys.argv', ['agent', 'start'])
+    def test_records_the_exit_code_of_the_call(self):
+        with patch.dict('os.environ', {'OCF_AGENT_RECORD': self.path}):
+            with patch('ocf_agent.modules.exit.Exit.output'):
+                with patch.object(
+                        self.agent, 'handler_start',
+                        side_effect=lambda: self.agent.exit.not_running('')):
+                    with self.assertRaises(SystemExit):
+                        self.agent.call()
+        records = self.read_records()
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]['action'], 'start')
+        self.assertEqual(records[0]['code'], 7)
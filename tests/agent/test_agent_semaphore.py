@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from tests.fixtures.agents import UnitTestAgent
+from ocf_agent.agent import Agent
+from ocf_agent.handler import Handler
+from ocf_agent.modules.lock import FileLock
+from ocf_agent import constants
+from mock import patch
+
+
+class TestSemaphoreAgent(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.agent = UnitTestAgent()
+        self.agent.LOCK_DIR = self.directory
+        self.semaphore = self.agent.semaphore
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        del self.agent
+        del self.semaphore
+
+    def test_has_agent(self):
+        self.assertEquals(self.semaphore.agent, self.agent)
+        self.assertIsInstance(self.semaphore.agent, Agent)
+
+    def test_has_directory(self):
+        self.assertEqual(
+            self.semaphore.directory('heavy'),
+            os.path.join(self.directory, 'ocf_agent-semaphore-heavy'),
+        )
+
+    def test_has_limit(self):
+        self.assertEqual(self.semaphore.limit('heavy'), 4)
+        self.agent.CONCURRENCY_LIMITS = {'heavy': 2}
+        self.assertEqual(self.semaphore.limit('heavy'), 2)
+
+    def test_tickets_are_ordered(self):
+        first = self.semaphore.take_ticket('heavy')
+        second = self.semaphore.take_ticket('heavy')
+        self.assertEqual(
+            self.semaphore.queue('heavy'),
+            [first.path, second.path],
+        )
+        self.assertEqual(self.semaphore.position('heavy', first), 0)
+        self.assertEqual(self.semaphore.position('heavy', second), 1)
+        self.semaphore.release(first)
+        self.assertEqual(self.semaphore.position('heavy', second), 0)
+        self.semaphore.release(second)
+        self.assertEqual(self.semaphore.queue('heavy'), [])
+
+    def test_dead_tickets_are_removed(self):
+        dead = self.semaphore.take_ticket('heavy')
+        dead.release()
+        ticket = self.semaphore.take_ticket('heavy')
+        self.assertEqual(self.semaphore.position('heavy', ticket), 0)
+        self.assertFalse(os.path.exists(dead.path))
+        self.semaphore.release(ticket)
+
+    def test_missing_ticket_is_dead_and_not_recreated(self):
+        path = os.path.join(self.directory, 'missing.ticket')
+        self.assertFalse(self.semaphore.is_alive(path))
+        self.assertFalse(os.path.exists(path))
+
+    def test_ticket_which_cannot_be_opened_is_alive(self):
+        ticket = self.semaphore.take_ticket('heavy')
+        with patch('os.open', side_effect=OSError(13, 'Permission denied')):
+            self.assertTrue(self.semaphore.is_alive(ticket.path))
+        self.assertTrue(os.path.exists(ticket.path))
+        self.semaphore.release(ticket)
+
+    def test_failed_rename_leaves_no_ticket(self):
+        rename = os.rename
+
+        def rename_counter(source, destination):
+            if destination.endswith(constants.SEMAPHORE_TICKET_SUFFIX):
+                raise OSError('rename failed')
+            rename(source, destination)
+
+        with patch('os.rename', side_effect=rename_counter):
+            with self.assertRaises(OSError):
+                self.semaphore.take_ticket('heavy')
+        self.assertEqual(
+            sorted(os.listdir(self.semaphore.directory('heavy'))),
+            [constants.SEMAPHORE_COUNTER_FILE,
+             constants.SEMAPHORE_MUTEX_FILE],
+        )
+
+    def test_unlocked_ticket_is_not_taken(self):
+        def acquire(lock, timeout=None):
+            return not lock.path.endswith(constants.SEMAPHORE_TEMP_SUFFIX)
+
+        with patch.object(FileLock, 'acquire', autospec=True,
+                          side_effect=acquire):
+            self.assertIsNone(self.semaphore.take_ticket('heavy'))
+        self.assertEqual(self.semaphore.queue('heavy'), [])
+
+    def test_admits_up_to_limit(self):
+        first = self.semaphore.acquire('heavy', 2, 0)
+        second = self.semaphore.acquire('heavy', 2, 0)
+        self.assertNotEqual(first, None)
+        self.assertNotEqual(second, None)
+        self.assertEqual(self.semaphore.acquire('heavy', 2, 0.05), None)
+        self.assertEqual(len(self.semaphore.queue('heavy')), 2)
+        self.semaphore.release(first)
+        third = self.semaphore.acquire('heavy', 2, 0)
+        self.assertNotEqual(third, None)
+        self.semaphore.release(second)
+        self.semaphore.release(third)
+
+    def test_exits_if_not_admitted(self):
+        with self.semaphore.acquired('heavy', 1):
+            with patch.object(self.agent.exit, 'error_generic') as mock:
+                mock.side_effect = SystemExit
+                with self.assertRaises(SystemExit):
+                    with self.semaphore.acquired('heavy', 1, 0):
+                        pass
+                self.assertTrue(mock.called)
+        self.assertEqual(self.semaphore.queue('heavy'), [])
+
+
+class HeavyHandler(Handler):
+    CONCURRENCY_CLASS = 'heavy'
+    CONCURRENCY_LIMIT = '1'
+    ACTION = 'start'
+
+
+class TestSemaphoreHandler(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.agent = UnitTestAgent()
+        self.agent.LOCK_DIR = self.directory
+        self.handler = HeavyHandler(self.agent.handlers)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        del self.agent
+        del self.handler
+
+    def test_has_concurrency_class(self):
+        self.assertEqual(self.handler.concurrency_class, 'heavy')
+        self.assertEqual(self.handler.concurrency_limit, 1)
+
+    @patch('tests.fixtures.agents.UnitTestAgent.handler_start')
+    def test_call_holds_ticket(self, mock1):
+        queue = self.agent.semaphore.queue
+        mock1.side_effect = lambda: self.assertEqual(len(queue('heavy')), 1)
+        self.handler.call()
+        self.assertTrue(mock1.called)
+        self.assertEqual(queue('heavy'), [])
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from tests.fixtures.agents import UnitTestAgent
+from ocf_agent.agent import Agent
+from mock import patch
+
+
+class TestStateAgent(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.agent = UnitTestAgent()
+        self.agent.LOCK_DIR = self.directory
+        self.state = self.agent.state
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        del self.agent
+        del self.state
+
+    def other_state(self):
+        agent = UnitTestAgent()
+        agent.LOCK_DIR = self.directory
+        return agent.state
+
+    def test_has_agent(self):
+        self.assertEquals(self.state.agent, self.agent)
+        self.assertIsInstance(self.state.agent, Agent)
+
+    @patch(
+        'ocf_agent.modules.environment.Environment.res_instance',
+        'unit_test_agent')
+    def test_has_path(self):
+        self.assertEqual(
+            self.state.path,
+            os.path.join(
+                self.directory,
+                'configured_ocf_agent-unit_test_agent.state',
+            )
+        )
+
+    def test_is_empty_by_default(self):
+        self.assertEqual(self.state.data, {})
+        self.assertIsNone(self.state.get('role'))
+        self.assertEqual(self.state.get('role', 'slave'), 'slave')
+
+    def test_can_set_and_get_values(self):
+        self.state.set('role', 'master')
+        self.state.update({'started': 1, 'digest': 'abc'})
+        self.assertEqual(self.state.get('role'), 'master')
+        self.assertIn('started', self.state)
+        with open(self.state.path) as state_file:
+            self.assertEqual(
+                json.load(state_file),
+                {'role': 'master', 'started': 1, 'digest': 'abc'},
+            )
+        self.assertEqual(self.other_state().data, self.state.data)
+
+    def test_reads_the_file_once(self):
+        self.state.set('role', 'master')
+        state = self.other_state()
+        with patch('ocf_agent.modules.state.State.read_file',
+                   return_value={'role': 'master'}) as mock1:
+            state.get('role')
+            state.get('role')
+            self.assertIn('role', state)
+            self.assertEqual(mock1.call_count, 1)
+
+    def test_keeps_changes_of_other_processes(self):
+        self.assertEqual(self.state.data, {})
+        self.other_state().set('started', 1)
+        self.state.set('role', 'master')
+        self.assertEqual(self.state.data, {'started': 1, 'role': 'master'})
+
+    def test_save_does_not_exit_if_locked(self):
+        self.assertTrue(self.state.save('role', 'master'))
+        self.assertEqual(self.other_state().get('role'), 'master')
+        with self.agent.lock.exclusive('state'):
+            self.assertFalse(self.other_state().save('role', 'slave', 0))
+        self.assertEqual(self.other_state().get('role'), 'master')
+
+    def test_can_compare_and_set(self):
+        self.assertTrue(self.state.compare_and_set('role', None, 'slave'))
+        self.assertFalse(self.state.compare_and_set('role', None, 'master'))
+        self.assertTrue(
+            self.state.compare_and_set('role', 'slave', 'master')
+        )
+        self.assertEqual(self.state.get('role'), 'master')
+
+    def test_can_delete_and_clear(self):
+        self.state.update({'role': 'master', 'started': 1})
+        self.state.delete('role')
+        self.assertEqual(self.state.data, {'started': 1})
+        self.state.clear()
+        self.assertEqual(self.state.data, {})
+        self.assertEqual(self.other_state().data, {})
@@ -1,7 +1,12 @@
 # -*- coding: utf-8 -*-
 
+import shutil
+import tempfile
+import time
 from unittest import TestCase
+from mock import patch
 from tests.fixtures.agents import UnitTestAgent
+from ocf_agent import constants
 
 
 class HandlerMonitorBasicTest(TestCase):
@@ -78,3 +83,117 @@ class HandlerMonitorConfiguredTest(TestCase):
 
     def test_has_role(self):
         self.assertEquals(self.handler.role, 'Master')
+
+
+class HandlerMonitorBudgetTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.agent = UnitTestAgent()
+        self.agent.LOCK_DIR = self.directory
+        self.handlers = self.agent.handlers
+        self.handler = self.handlers.get('monitor', 10)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        del self.handler
+        del self.agent
+        del self.handlers
+
+    def test_has_shallow_handler(self):
+        self.assertEquals(self.handler.shallow.depth, 0)
+        self.assertEquals(self.handler.shallow.shallow, None)
+
+    @patch('tests.fixtures.agents.UnitTestAgent.handler_monitor_long')
+    def test_saves_deep_result(self, mock1):
+        mock1.side_effect = lambda: self.agent.exit.not_running('')
+        with self.assertRaises(SystemExit):
+            self.handler.call()
+        code, checked = self.agent.state.get(self.handler.result_key)
+        self.assertEquals(code, constants.OCF_NOT_RUNNING)
+
+    @patch('tests.fixtures.agents.UnitTestAgent.handler_monitor_long')
+    def test_does_not_save_failed_result(self, mock1):
+        mock1.side_effect = RuntimeError('broken check')
+        with self.assertRaises(RuntimeError):
+            self.handler.call()
+        self.assertIsNone(self.agent.state.get(self.handler.result_key))
+
+    @patch('ocf_agent.modules.lock.Lock.acquire', return_value=None)
+    @patch('tests.fixtures.agents.UnitTestAgent.handler_monitor_long')
+    def test_locked_state_keeps_exit_code(self, mock1, mock2):
+        mock1.side_effect = lambda: self.agent.exit.not_running('')
+        with self.assertRaises(SystemExit) as context:
+            self.handler.call()
+        self.assertEquals(context.exception.code, constants.OCF_NOT_RUNNING)
+
+    @patch('ocf_agent.modules.budget.Budget.take', return_value=False)
+    @patch('tests.fixtures.agents.UnitTestAgent.handler_monitor')
+    @patch('tests.fixtures.agents.UnitTestAgent.handler_monitor_long')
+    def test_degrades_to_shallow_handler(self, mock1, mock2, mock3):
+        self.handler.call()
+        self.assertFalse(mock1.called)
+        self.assertTrue(mock2.called)
+
+    @patch('ocf_agent.modules.budget.Budget.take', return_value=False)
+    @patch('ocf_agent.handler.MonitorHandler.shallow', None)
+    @patch('tests.fixtures.agents.UnitTestAgent.handler_monitor_long')
+    def test_degrades_to_recent_result(self, mock1, mock2):
+        self.agent.state.set(
+            self.handler.result_key,
+            [constants.OCF_RUNNING_MASTER, time.time()],
+        )
+        with self.assertRaises(SystemExit) as context:
+            self.handler.call()
+        self.assertEquals(
+            context.exception.code, constants.OCF_RUNNING_MASTER,
+        )
+        self.assertFalse(mock1.called)
+
+    @patch('ocf_agent.modules.budget.Budget.take', return_value=False)
+    @patch('ocf_agent.handler.MonitorHandler.shallow', None)
+    @patch('tests.fixtures.agents.UnitTestAgent.handler_monitor_long')
+    def test_does_not_reuse_recent_failure(self, mock1, mock2):
+        self.agent.state.set(
+            self.handler.result_key,
+            [constants.OCF_NOT_RUNNING, time.time()],
+        )
+        self.handler.call()
+        self.assertTrue(mock1.called)
+
+    @patch('ocf_agent.modules.budget.Budget.take', return_value=False)
+    @patch('ocf_agent.handler.MonitorHandler.shallow', None)
+    @patch('tests.fixtures.agents.UnitTestAgent.handler_monitor_long')
+    def test_runs_without_recent_result(self, mock1, mock2):
+        self.agent.state.set(
+            self.handler.result_key,
+            [constants.OCF_SUCCESS, time.time() - 3600],
+        )
+        self.handler.call()
+        self.assertTrue(mock1.called)
+
+    @patch('ocf_agent.modules.pressure.Pressure.exceeded')
+    @patch('ocf_agent.modules.budget.Budget.take', return_value=True)
+    @patch('tests.fixtures.agents.UnitTestAgent.handler_monitor')
+    @patch('tests.fixtures.agents.UnitTestAgent.handler_monitor_long')
+    def test_degrades_if_overloaded(self, mock1, mock2, mock3, mock4):
+        mock4.return_value = [('cpu', 50.0, 20)]
+        self.agent.PRESSURE_LIMITS = {'cpu': 20}
+        self.assertEquals(
+            self.handler.overload,
+            'the node is overloaded: cpu 50.00 > 20.00',
+        )
+        self.handler.call()
+        self.assertFalse(mock1.called)
+        self.assertTrue(mock2.called)
+        self.assertFalse(mock3.called)
+
+    @patch('ocf_agent.modules.pressure.Pressure.exceeded')
+    @patch('ocf_agent.modules.budget.Budget.take', return_value=True)
+    @patch('tests.fixtures.agents.UnitTestAgent.handler_monitor_long')
+    def test_critical_monitor_is_not_degraded(self, mock1, mock2, mock3):
+        mock3.return_value = [('cpu', 50.0, 20)]
+        self.agent.PRESSURE_LIMITS = {'cpu': 20}
+        self.handler.CRITICAL = True
+        self.assertEquals(self.handler.overload, None)
+        self.handler.call()
+        self.assertTrue(mock1.called)
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+import os
+import subprocess
+import tempfile
+import time
+from unittest import TestCase
+from mock import Mock
+from mock import patch
+from ocf_agent.commands import Command
+from ocf_agent.commands import CommandBatch
+from ocf_agent.commands import CommandPoller
+from ocf_agent.commands import OutputBuffer
+
+
+class TestOutputBuffer(TestCase):
+    def test_keeps_small_output(self):
+        output = OutputBuffer(head=4, tail=4)
+        output.append(b'abc')
+        output.append(b'def')
+        self.assertEquals(output.value, b'abcdef')
+        self.assertEquals(output.dropped, 0)
+
+    def test_keeps_head_and_tail(self):
+        output = OutputBuffer(head=4, tail=4)
+        for chunk in (b'0123', b'4567', b'89ab', b'cdef'):
+            output.append(chunk)
+        self.assertEquals(output.size, 16)
+        self.assertEquals(output.dropped, 8)
+        self.assertEquals(bytes(output.head), b'0123')
+        self.assertEquals(bytes(output.tail), b'cdef')
+        self.assertEquals(
+            output.value, b'0123\n... 8 bytes dropped ...\ncdef'
+        )
+
+    def test_keeps_only_head(self):
+        output = OutputBuffer(head=2, tail=0)
+        output.append(b'abcdef')
+        self.assertEquals(output.dropped, 4)
+        self.assertTrue(output.value.startswith(b'ab\n'))
+
+
+class TestCommand(TestCase):
+    def test_reads_lines(self):
+        command = Command(
+            ['sh', '-c', 'echo one; echo two >&2; printf three'],
+        ).start()
+        lines = list(command.lines())
+        self.assertEquals(
+            sorted(lines),
+            [('stderr', 'two'), ('stdout', 'one'), ('stdout', 'three')],
+        )
+        result = command.result
+        self.assertEquals(result['stdout'], b'one\nthree')
+        self.assertEquals(result['stderr'], b'two\n')
+        self.assertEquals(result['code'], 0)
+        self.assertFalse(result['timeout'])
+
+    def test_runs_in_own_group(self):
+        command = Command(['sh', '-c', 'ps -o pgid= -p $$']).start()
+        list(command.lines())
+        self.assertEquals(
+            int(command.result['stdout']), command.process.pid
+        )
+        self.assertNotEqual(command.process.pid, os.getpgrp())
+
+    def test_runs_in_own_group_with_preexec(self):
+        command = Command(
+            ['sh', '-c', 'umask; ps -o pgid= -p $$'],
+            preexec_fn=lambda: os.umask(0o077),
+        ).start()
+        list(command.lines())
+        mask, group = command.result['stdout'].split()
+        self.assertEquals(mask, b'0077')
+        self.assertEquals(int(group), command.process.pid)
+
+    def test_honours_output_arguments(self):
+        command = Command(
+            ['sh', '-c', 'echo out; echo err >&2'], stderr=subprocess.STDOUT,
+        ).start()
+        list(command.lines())
+        self.assertEquals(command.result['stdout'], b'out\nerr\n')
+        self.assertEquals(command.result['stderr'], b'')
+        with tempfile.TemporaryFile() as output_file:
+            command = Command(
+                ['sh', '-c', 'echo out'], stdout=output_file,
+            ).start()
+            list(command.lines())
+            output_file.seek(0)
+            self.assertEquals(output_file.read(), b'out\n')
+        self.assertEquals(command.result['stdout'], b'')
+        self.assertEquals(command.result['code'], 0)
+
+    def test_kills_group_after_deadline(self):
+        command = Command(
+            ['sh', '-c', 'echo started; sleep 30 & sleep 30'], timeout=0.3,
+        ).start()
+        started = time.time()
+        lines = list(command.lines())
+        self.assertTrue(time.time() - started < 5)
+        self.assertEquals(lines, [('stdout', 'started')])
+        self.assertTrue(command.result['timeout'])
+        self.assertEquals(command.result['code'], -9)
+
+    def test_does_not_wait_for_children_holding_pipes(self):
+        command = Command(
+            ['sh', '-c', 'echo done; sleep 30 &'], timeout=10,
+        ).start()
+        started = time.time()
+        lines = list(command.lines())
+        self.assertTrue(time.time() - started < 5)
+        self.assertEquals(lines, [('stdout', 'done')])
+        self.assertEquals(command.result['code'], 0)
+        command.kill()
+
+    def test_terminated_if_not_iterated(self):
+        command = Command(
+            ['sh', '-c', 'while true; do echo line; sleep 0.01; done'],
+        ).start()
+        lines = command.lines()
+        self.assertEquals(next(lines), ('stdout', 'line'))
+        lines.close()
+        self.assertFalse(command.running)
+        self.assertTrue(command.terminated)
+        self.assertNotEqual(command.result['code'], None)
+
+    def test_bounded_output(self):
+        command = Command(
+            ['sh', '-c', 'yes | head -c 100000'], head=10, tail=10,
+        ).start()
+        count = len(list(command.lines()))
+        self.assertEquals(count, 50000)
+        self.assertEquals(command.output['stdout'].size, 100000)
+        self.assertEquals(len(command.output['stdout'].head), 10)
+        self.assertEquals(len(command.output['stdout'].tail), 10)
+
+    @patch('ocf_agent.commands.os.pidfd_open', side_effect=OSError,
+           create=True)
+    def test_works_without_pid_descriptor(self, mock1):
+        command = Command(['sh', '-c', 'echo done; sleep 0.1']).start()
+        self.assertEquals(command.watched, None)
+        self.assertEquals(list(command.lines()), [('stdout', 'done')])
+        self.assertEquals(command.result['code'], 0)
+
+
+class TestCommandPoller(TestCase):
+    def test_forgets_pipes_closed_by_the_final_drain(self):
+        poller = CommandPoller()
+        command = Command(['sh', '-c', 'echo out; echo err >&2']).start()
+        command.process.wait()
+        pipes = list(command.descriptors)
+        poll = poller.poller.poll
+        poller.poller = Mock(wraps=poller.poller)
+        poller.poller.poll.side_effect = lambda *args: [
+            (descriptor, event) for descriptor, event in poll(*args)
+            if descriptor not in pipes
+        ]
+        poller.add(command)
+        events = []
+        while poller.commands:
+            events.extend(poller.poll())
+        self.assertEquals(
+            sorted((stream, line) for _, stream, line in events),
+            [('stderr', 'err'), ('stdout', 'out')],
+        )
+        self.assertEquals(poller.owners, {})
+        other = Command(['sh', '-c', 'echo next']).start()
+        poller.poller.poll.side_effect = poll
+        poller.add(other)
+        events = []
+        while poller.commands:
+            events.extend(poller.poll())
+        self.assertEquals(
+            [(stream, line) for _, stream, line in events],
+            [('stdout', 'next')],
+        )
+
+
+class TestCommandBatch(TestCase):
+    def test_runs_commands_concurrently(self):
+        commands = [Command(['sleep', '0.3']) for _ in range(4)]
+        batch = CommandBatch(commands, parallel=4)
+        started = time.time()
+        self.assertEquals(batch.run(), commands)
+        self.assertTrue(time.time() - started < 1)
+        for command in commands:
+            self.assertEquals(command.result['code'], 0)
+
+    def test_limits_parallelism(self):
+        commands = [Command(['sleep', '0.2']) for _ in range(4)]
+        batch = CommandBatch(commands, parallel=2)
+        started = time.time()
+        batch.run()
+        self.assertTrue(time.time() - started >= 0.4)
+        self.assertTrue(
+            commands[2].started >= min(commands[0].finished,
+                                       commands[1].finished)
+        )
+
+    def test_shares_deadline(self):
+        commands = [Command(['sleep', '30']), Command(['sleep', '30'])]
+        batch = CommandBatch(commands, parallel=1, timeout=0.3)
+        started = time.time()
+        batch.run()
+        self.assertTrue(time.time() - started < 5)
+        for command in commands:
+            self.assertTrue(command.result['timeout'])
+
+    def test_fail_fast_cancels_others(self):
+        commands = [
+            Command(['sleep', '30']),
+            Command(['sh', '-c', 'exit 1']),
+            Command(['sleep', '30']),
+        ]
+        batch = CommandBatch(commands, parallel=2, fail_fast=True)
+        started = time.time()
+        batch.run()
+        self.assertTrue(time.time() - started < 5)
+        self.assertIs(batch.failed, commands[1])
+        self.assertTrue(commands[0].cancelled)
+        self.assertNotEqual(commands[0].result['code'], None)
+        self.assertTrue(commands[2].cancelled)
+        self.assertEquals(commands[2].process, None)
+
+    def test_command_which_cannot_start(self):
+        commands = [Command(['/nonexistent/binary']), Command(['true'])]
+        CommandBatch(commands, parallel=2).run()
+        self.assertTrue(commands[0].failed)
+        self.assertNotEqual(commands[0].error, None)
+        self.assertEquals(commands[1].result['code'], 0)
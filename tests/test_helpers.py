@@ -1,5 +1,8 @@
 # -*- coding: utf-8 -*-
 
+import os
+import shutil
+import tempfile
 from ocf_agent import helpers
 from unittest import TestCase
 from mock import patch
@@ -83,3 +86,18 @@ class HelpersTest(TestCase):
         self.assertIn('A = one', self.documented_method.__doc__)
         self.assertIn('B = 2', self.documented_method.__doc__)
         self.assertIn('C\_', self.documented_method.__doc__)
+
+    def test_atomic_write_retries_partial_writes(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'file')
+        write = os.write
+
+        def partial_write(descriptor, data):
+            return write(descriptor, data[:3])
+
+        try:
+            with patch('os.write', side_effect=partial_write):
+                helpers.atomic_write(path, 'partial content')
+            self.assertEqual(helpers.read_file(path), 'partial content')
+        finally:
+            shutil.rmtree(directory)
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+import logging
+from ocf_agent.log_handlers import QueueHandler
+from ocf_agent.log_handlers import QueueListener
+from unittest import TestCase
+from mock import Mock
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+class LogHandlersTest(TestCase):
+    def record(self, message, *args):
+        return logging.LogRecord(
+            'test', logging.INFO, __file__, 0, message, args, None
+        )
+
+    def queued_messages(self, records):
+        messages = []
+        while not records.empty():
+            messages.append(records.get_nowait().msg)
+        return messages
+
+    def test_queue_handler_prepares_records(self):
+        records = queue.Queue()
+        handler = QueueHandler(records)
+        handler.emit(self.record('message %s', 1))
+        record = records.get_nowait()
+        self.assertEqual(record.msg, 'message 1')
+        self.assertIsNone(record.args)
+
+    def test_queue_handler_can_drop_the_oldest_records(self):
+        records = queue.Queue(2)
+        handler = QueueHandler(records, 'oldest')
+        for number in range(3):
+            handler.emit(self.record('message %d', number))
+        self.assertEqual(handler.dropped, 1)
+        self.assertEqual(
+            self.queued_messages(records), ['message 1', 'message 2']
+        )
+
+    def test_queue_handler_can_drop_the_new_records(self):
+        records = queue.Queue(2)
+        handler = QueueHandler(records, 'drop')
+        for number in range(3):
+            handler.emit(self.record('message %d', number))
+        self.assertEqual(handler.dropped, 1)
+        self.assertEqual(
+            self.queued_messages(records), ['message 0', 'message 1']
+        )
+
+    def test_listener_writes_and_flushes_records(self):
+        records = queue.Queue()
+        handler = Mock()
+        handler.level = logging.INFO
+        listener = QueueListener(records, [handler])
+        for number in range(3):
+            records.put(self.record('message %d', number))
+        listener.start()
+        self.assertTrue(listener.stop(5))
+        self.assertEqual(handler.handle.call_count, 3)
+        self.assertTrue(handler.flush.called)
+        self.assertIsNone(listener.thread)
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import subprocess
+import tempfile
+from unittest import TestCase
+from mock import patch
+from tests.fixtures.agents import UnitTestAgent
+from ocf_agent.process_backends import ProcBackend
+from ocf_agent.process_backends import PsutilBackend
+from ocf_agent.process_backends import default_backend
+
+STAT = (
+    '4242 (my (odd) name) S 1 4242 4242 0 -1 4194560 100 0 0 0 1 2 0 0 '
+    '20 0 1 0 123456 1000 100 18446744073709551615 1 1 0 0 0 0 0 0 0 '
+    '0 0 0 17 0 0 0 0 0 0\n'
+)
+STATUS = 'Name:\tname\nUid:\t1000\t1001\t1001\t1001\nGid:\t0\t0\t0\t0\n'
+
+
+class TestProcBackend(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        process = os.path.join(self.directory, '4242')
+        os.mkdir(process)
+        with open(os.path.join(process, 'stat'), 'w') as stat:
+            stat.write(STAT)
+        with open(os.path.join(process, 'status'), 'w') as status:
+            status.write(STATUS)
+        with open(os.path.join(process, 'cmdline'), 'w') as cmdline:
+            cmdline.write('/usr/bin/odd\0--flag\0')
+        os.symlink('/usr/bin/odd (deleted)', os.path.join(process, 'exe'))
+        os.mkdir(os.path.join(self.directory, 'self'))
+        self.backend = ProcBackend(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_can_list_pids(self):
+        self.assertEqual(self.backend.pids(), [4242])
+
+    def test_can_read_entry(self):
+        self.assertEqual(
+            self.backend.entry(4242),
+            {
+                'pid': 4242,
+                'ppid': 1,
+                'pgid': 4242,
+                'name': 'my (odd) name',
+                'exe': '/usr/bin/odd',
+                'cmdline': ['/usr/bin/odd', '--flag'],
+                'uid': 1000,
+                'status': 'sleeping',
+                'starttime': 123456,
+            },
+        )
+
+    def test_reads_undecodable_cmdline(self):
+        path = os.path.join(self.directory, '4242', 'cmdline')
+        with open(path, 'wb') as cmdline:
+            cmdline.write(b'sleep\0\xff\xfe\0')
+        arguments = self.backend.entry(4242, ['cmdline'])['cmdline']
+        self.assertEqual(arguments[0], 'sleep')
+        self.assertEqual(len(arguments), 2)
+
+    def test_reads_only_requested_files(self):
+        with patch.object(self.backend, 'read_exe') as mock:
+            self.assertEqual(
+                self.backend.entry(4242, ['ppid']),
+                {'pid': 4242, 'ppid': 1},
+            )
+            self.assertFalse(mock.called)
+
+    def test_missing_process(self):
+        self.assertEqual(self.backend.entry(1), None)
+        self.assertFalse(self.backend.exists(1))
+        self.assertTrue(self.backend.exists(4242))
+
+    def test_can_get_descendants(self):
+        self.assertEqual(self.backend.descendants(1), [4242])
+
+
+class TestBackendsAgree(TestCase):
+    def setUp(self):
+        self.backends = [ProcBackend(), PsutilBackend()]
+
+    def test_default_backend(self):
+        self.assertEqual(default_backend(), 'proc')
+
+    def test_own_process(self):
+        proc, psutil = [
+            backend.entry(os.getpid()) for backend in self.backends
+        ]
+        for attribute in ['pid', 'ppid', 'pgid', 'name', 'exe', 'cmdline',
+                          'uid', 'status']:
+            self.assertEqual(proc[attribute], psutil[attribute], attribute)
+        self.assertTrue(abs(proc['starttime'] - psutil['starttime']) <= 1)
+
+    def test_can_wait(self):
+        for backend in self.backends:
+            child = subprocess.Popen(['sleep', '30'])
+            self.assertEqual(backend.wait([child.pid], 0.05), [child.pid])
+            child.kill()
+            self.assertEqual(backend.wait([child.pid], 5), [])
+            self.assertFalse(backend.exists(child.pid))
+            self.assertNotEqual(child.poll(), None)
+
+    def test_descendants(self):
+        child = subprocess.Popen(['sleep', '30'])
+        try:
+            for backend in self.backends:
+                self.assertIn(child.pid, backend.descendants(os.getpid()))
+        finally:
+            child.kill()
+            child.wait()
+
+
+class TestProcessBackendSelection(TestCase):
+    def setUp(self):
+        self.agent = UnitTestAgent()
+
+    def tearDown(self):
+        del self.agent
+
+    def test_default_is_proc(self):
+        self.assertIsInstance(self.agent.process.backend, ProcBackend)
+
+    def test_can_select_psutil(self):
+        self.agent.PROCESS_BACKEND = 'psutil'
+        self.assertIsInstance(self.agent.process.backend, PsutilBackend)
+
+    @patch('ocf_agent.modules.exit.Exit.output')
+    def test_unknown_backend(self, mock1):
+        self.agent.PROCESS_BACKEND = 'unknown'
+        with self.assertRaises(SystemExit):
+            self.agent.process.backend
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+from ocf_agent import replay
+from unittest import TestCase
+
+
+class ReplayTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'agent.record')
+        records = [
+            {'action': 'monitor', 'argv': ['agent', 'monitor'],
+             'env': {'OCF_RESKEY_code': '0'}, 'code': 0},
+            {'action': 'start', 'argv': ['agent', 'start'],
+             'env': {'OCF_RESKEY_code': '7'}, 'code': 0},
+        ]
+        with open(self.path, 'w') as record_file:
+            for record in records:
+                record_file.write(json.dumps(record) + '\n')
+            record_file.write('not a record\n')
+        self.command = [
+            sys.executable, '-c',
+            'import os, sys; '
+            'sys.exit(int(os.environ["OCF_RESKEY_code"]))',
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_can_read_records(self):
+        self.assertEqual(len(replay.read_records(self.path)), 2)
+        records = replay.read_records(self.path, 'start')
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]['action'], 'start')
+
+    def test_can_replay_records(self):
+        records = replay.read_records(self.path)
+        for concurrency in [1, 2]:
+            results = replay.replay(records, self.command, concurrency)
+            self.assertEqual(
+                [(record['action'], code) for record, code, _ in results],
+                [('monitor', 0), ('start', 7)],
+            )
+
+    def test_percentile(self):
+        values = [5, 1, 4, 2, 3]
+        self.assertEqual(replay.percentile(values, 50), 3)
+        self.assertEqual(replay.percentile(values, 100), 5)
+        self.assertEqual(replay.percentile(values, 0), 1)
+        self.assertIsNone(replay.percentile([], 50))
+
+    def test_report(self):
+        results = [
+            ({'action': 'monitor', 'code': 0}, 0, 0.01),
+            ({'action': 'monitor', 'code': 0}, 1, 0.02),
+        ]
+        text = replay.report(results, [50])
+        self.assertIn('monitor: count=2', text)
+        self.assertIn('p50=10.0ms', text)
+        self.assertIn('max=20.0ms', text)
+        self.assertIn('code_mismatches=1', text)